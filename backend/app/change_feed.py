@@ -0,0 +1,233 @@
+"""
+Change feed over the catalog tables.
+
+A background thread polls ``product`` by ``date_modify``, ``product_image`` by
+``image_id`` (the table has no timestamp) and ``product_image_features`` by
+``created_at``, each from its own high-water mark, and hands the resulting
+upsert/delete events to subscribers. In-process structures derived from those
+tables can then follow the database in O(changes) instead of rebuilding.
+
+Deletes and image edits leave no timestamp behind, so every
+FEED_RECONCILE_SECONDS the feed also diffs the key sets of the three tables
+(an id-only scan) against what it has seen and emits what changed.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app import models
+
+FEED_POLL_SECONDS = 5
+FEED_RECONCILE_SECONDS = 300
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+
+class ChangeEvent(NamedTuple):
+    """
+    One changed row. ``row`` is the ORM object for product and product_image
+    upserts, None otherwise; it is only valid during the subscriber call.
+    """
+    table: str
+    kind: str
+    key: int
+    row: object = None
+
+
+Subscriber = Callable[[List[ChangeEvent], Session], None]
+
+
+class HighWater:
+    """
+    A ``>=`` high-water mark that remembers which keys it already emitted at
+    the mark itself, so rows sharing the last timestamp are not re-emitted
+    on every poll. Rows must be fed in ascending timestamp order.
+    """
+
+    def __init__(self):
+        self.value = None
+        self._keys_at_value: Set[int] = set()
+
+    def is_new(self, key: int, value) -> bool:
+        if value is None:
+            return False
+        if self.value is None or value > self.value:
+            return True
+        return value == self.value and key not in self._keys_at_value
+
+    def advance(self, key: int, value):
+        if value is None:
+            return
+        if self.value is None or value > self.value:
+            self.value = value
+            self._keys_at_value = {key}
+        elif value == self.value:
+            self._keys_at_value.add(key)
+
+
+class CatalogChangeFeed:
+    """Polls the catalog tables and dispatches change events to subscribers"""
+
+    def __init__(self, poll_seconds: float = FEED_POLL_SECONDS, reconcile_seconds: float = FEED_RECONCILE_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.reconcile_seconds = reconcile_seconds
+        self.primed = False
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+        self._product_mark = HighWater()
+        self._feature_mark = HighWater()
+        self._image_high_water = 0
+        self._product_ids: Set[int] = set()
+        # image_id -> (product_id, image_path, image_sort), to spot edited image rows
+        self._images: Dict[int, Tuple[int, Optional[str], Optional[int]]] = {}
+        self._feature_ids: Set[int] = set()
+        self._reconciled_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, callback: Subscriber):
+        """Register ``callback(events, db)``, called with each non-empty batch of changes"""
+        self._subscribers.append(callback)
+
+    def prime(self, db: Session):
+        """Record the current state as the starting point without emitting events"""
+        with self._lock:
+            self._product_ids = set()
+            for product_id, date_modify in db.query(models.Product.product_id, models.Product.date_modify):
+                self._product_ids.add(product_id)
+                self._product_mark.advance(product_id, date_modify)
+            self._images = {row.image_id: self._image_signature(row) for row in self._image_rows(db)}
+            self._image_high_water = max(self._images, default=0)
+            self._feature_ids = set()
+            for image_id, created_at in db.query(models.ProductImageFeatures.image_id, models.ProductImageFeatures.created_at):
+                self._feature_ids.add(image_id)
+                self._feature_mark.advance(image_id, created_at)
+            self._reconciled_at = time.monotonic()
+            self.primed = True
+        print(f"Change feed primed with {len(self._product_ids)} products and {len(self._images)} images")
+
+    def poll(self, db: Session) -> List[ChangeEvent]:
+        """Collect changes since the last poll and dispatch them"""
+        if not self.primed:
+            self.prime(db)
+            return []
+        with self._lock:
+            events = self._product_changes(db) + self._image_changes(db) + self._feature_changes(db)
+            if time.monotonic() - self._reconciled_at >= self.reconcile_seconds:
+                events += self._reconcile(db)
+                self._reconciled_at = time.monotonic()
+        if events:
+            self._dispatch(events, db)
+        return events
+
+    def start(self, session_factory: Callable[[], Session]):
+        """Poll every ``poll_seconds`` on a daemon thread until ``stop``"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(session_factory,), name="catalog-change-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds + 5)
+            self._thread = None
+
+    def _run(self, session_factory: Callable[[], Session]):
+        while True:
+            db = session_factory()
+            try:
+                self.poll(db)
+            except Exception as e:
+                print(f"Change feed poll failed: {e}")
+            finally:
+                db.close()
+            if self._stop.wait(self.poll_seconds):
+                return
+
+    def _dispatch(self, events: List[ChangeEvent], db: Session):
+        for callback in self._subscribers:
+            try:
+                callback(events, db)
+            except Exception as e:
+                print(f"Change feed subscriber {getattr(callback, '__name__', callback)} failed: {e}")
+
+    def _product_changes(self, db: Session) -> List[ChangeEvent]:
+        if self._product_mark.value is None:
+            query = db.query(models.Product).filter(models.Product.date_modify.isnot(None))
+        else:
+            # >= so rows committed later within the high-water second are not missed
+            query = db.query(models.Product).filter(models.Product.date_modify >= self._product_mark.value)
+        events = []
+        for product in query.order_by(models.Product.date_modify):
+            if not self._product_mark.is_new(product.product_id, product.date_modify):
+                continue
+            self._product_mark.advance(product.product_id, product.date_modify)
+            self._product_ids.add(product.product_id)
+            events.append(ChangeEvent("product", UPSERT, product.product_id, product))
+        return events
+
+    def _image_changes(self, db: Session) -> List[ChangeEvent]:
+        events = []
+        for image in db.query(models.ProductImage).filter(models.ProductImage.image_id > self._image_high_water):
+            self._images[image.image_id] = self._image_signature(image)
+            self._image_high_water = max(self._image_high_water, image.image_id)
+            events.append(ChangeEvent("product_image", UPSERT, image.image_id, image))
+        return events
+
+    def _feature_changes(self, db: Session) -> List[ChangeEvent]:
+        query = db.query(models.ProductImageFeatures.image_id, models.ProductImageFeatures.created_at)
+        if self._feature_mark.value is not None:
+            query = query.filter(models.ProductImageFeatures.created_at >= self._feature_mark.value)
+        events = []
+        for image_id, created_at in query.order_by(models.ProductImageFeatures.created_at):
+            if image_id in self._feature_ids and not self._feature_mark.is_new(image_id, created_at):
+                continue
+            self._feature_mark.advance(image_id, created_at)
+            self._feature_ids.add(image_id)
+            events.append(ChangeEvent("product_image_features", UPSERT, image_id))
+        return events
+
+    def _reconcile(self, db: Session) -> List[ChangeEvent]:
+        """Diff the key sets to find deletes and edited image rows"""
+        events = []
+        product_ids = {product_id for (product_id,) in db.query(models.Product.product_id)}
+        for product_id in self._product_ids - product_ids:
+            events.append(ChangeEvent("product", DELETE, product_id))
+        self._product_ids = product_ids
+
+        images = {row.image_id: (row, self._image_signature(row)) for row in self._image_rows(db)}
+        for image_id in set(self._images) - set(images):
+            events.append(ChangeEvent("product_image", DELETE, image_id))
+        edited = [image_id for image_id, (_, signature) in images.items() if self._images.get(image_id) != signature]
+        if edited:
+            for image in db.query(models.ProductImage).filter(models.ProductImage.image_id.in_(edited)):
+                events.append(ChangeEvent("product_image", UPSERT, image.image_id, image))
+        self._images = {image_id: signature for image_id, (_, signature) in images.items()}
+        self._image_high_water = max(self._image_high_water, max(self._images, default=0))
+
+        feature_ids = {image_id for (image_id,) in db.query(models.ProductImageFeatures.image_id)}
+        for image_id in self._feature_ids - feature_ids:
+            events.append(ChangeEvent("product_image_features", DELETE, image_id))
+        self._feature_ids = feature_ids
+        return events
+
+    @staticmethod
+    def _image_rows(db: Session):
+        return db.query(
+            models.ProductImage.image_id,
+            models.ProductImage.product_id,
+            models.ProductImage.image_path,
+            models.ProductImage.image_sort
+        )
+
+    @staticmethod
+    def _image_signature(row) -> Tuple[int, Optional[str], Optional[int]]:
+        return (row.product_id, row.image_path, row.image_sort)
+
+
+catalog_change_feed = CatalogChangeFeed()
@@ -0,0 +1,194 @@
+"""
+Rule-based intent router in front of the chat NL-to-SQL translation.
+
+Many chat messages are plainly structured and need no model call:
+
+- a SKU expression in the logical search language ("DEL12345",
+  "DEL12345 OR HPE67890 in Dell"), recognized with the query parser when every
+  bare term looks like a SKU and every IN target is a known manufacturer;
+- a brand and/or category with an optional price bound ("dell servers under
+  $500", "hp laptops between 200 and 800"), recognized against the catalog's
+  known manufacturers and categories when no unexplained words remain.
+
+Both build the SQLAlchemy statement directly; the category/brand filters go
+through the index-aware planner. Everything else is ambiguous and goes to the
+translation cache and OpenAI. ChatRouteStats records how each message was
+answered and how long producing its SQL took.
+"""
+import re
+import threading
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.metrics import metrics
+from app.query_parser import And, FieldMatch, Not, Or, Scoped, Sku, compile_logical_query, normalize_query
+from app.query_planner import contains_predicate, distinct_values
+
+# Rows returned for a routed message, matching the LIMIT the LLM is told to use
+CHAT_RESULT_LIMIT = 50
+
+# A bare term is taken for a SKU only if it is this long and holds a digit
+SKU_PATTERN = re.compile(r"^(?=.*\d)[A-Z0-9][A-Z0-9_-]{3,}$")
+
+PRICE = r"\$?\s?(\d[\d,]*(?:\.\d{1,2})?)\s?(?:dollars|usd|bucks)?"
+PRICE_RANGE_PATTERN = re.compile(rf"\b(?:between|from)\s+{PRICE}\s+(?:and|to|-)\s+{PRICE}")
+MAX_PRICE_PATTERN = re.compile(rf"(?:\b(?:under|below|less than|cheaper than|up to|at most|max(?:imum)?)|<=?)\s*{PRICE}")
+MIN_PRICE_PATTERN = re.compile(rf"(?:\b(?:over|above|more than|at least|min(?:imum)?)|>=?)\s*{PRICE}")
+
+# Words that carry no filter of their own in a structured request
+FILLER_WORDS = frozenset({
+    "a", "an", "the", "all", "any", "some", "me", "i", "we", "show", "find", "get", "search", "list",
+    "give", "want", "need", "looking", "look", "for", "please", "products", "product", "items", "item",
+    "from", "by", "made", "of", "in", "with", "and", "brand", "manufacturer", "category", "priced",
+    "price", "costing", "cost", "that", "are", "is", "which", "what", "do", "you", "have",
+})
+
+FAST_PATH = "fast_path"
+TRANSLATION_CACHE = "translation_cache"
+LLM = "llm"
+FALLBACK = "fallback"
+
+
+class IntentMatch(NamedTuple):
+    intent: str
+    statement: object
+
+
+def is_sku_plan(node, manufacturers) -> bool:
+    """True when every term of a parsed logical query is SKU-shaped and every IN target a known manufacturer"""
+    if isinstance(node, Sku):
+        return bool(SKU_PATTERN.match(node.value))
+    if isinstance(node, (And, Or)):
+        return all(is_sku_plan(child, manufacturers) for child in node.children)
+    if isinstance(node, Not):
+        return is_sku_plan(node.child, manufacturers)
+    if isinstance(node, Scoped):
+        return is_sku_plan(node.operand, manufacturers) and all(value.lower() in manufacturers for value in node.values)
+    return isinstance(node, FieldMatch)
+
+
+def parse_price(value: str) -> Decimal:
+    return Decimal(value.replace(",", ""))
+
+
+def extract_price_bounds(message: str) -> Tuple[Optional[Decimal], Optional[Decimal], str]:
+    """(min_price, max_price, message with the price phrases removed)"""
+    min_price = max_price = None
+    match = PRICE_RANGE_PATTERN.search(message)
+    if match:
+        low, high = sorted((parse_price(match.group(1)), parse_price(match.group(2))))
+        return low, high, message[:match.start()] + " " + message[match.end():]
+    match = MAX_PRICE_PATTERN.search(message)
+    if match:
+        max_price = parse_price(match.group(1))
+        message = message[:match.start()] + " " + message[match.end():]
+    match = MIN_PRICE_PATTERN.search(message)
+    if match:
+        min_price = parse_price(match.group(1))
+        message = message[:match.start()] + " " + message[match.end():]
+    return min_price, max_price, message
+
+
+def take_known_value(message: str, values: List[str]) -> Tuple[Optional[str], str]:
+    """Longest known value named in ``message`` (singular or plural), and the message without it"""
+    for value in sorted(values, key=len, reverse=True):
+        if value.endswith("y"):
+            pattern = rf"{re.escape(value[:-1])}(?:y|ies)"
+        else:
+            pattern = rf"{re.escape(value)}(?:s|es)?"
+        match = re.search(rf"(?<![\w-]){pattern}(?![\w-])", message)
+        if match:
+            return value, message[:match.start()] + " " + message[match.end():]
+    return None, message
+
+
+class IntentRouter:
+    """Turn structured chat messages into product statements without a model call"""
+
+    def route(self, message: str, db: Session) -> Optional[IntentMatch]:
+        distinct_values.ensure_loaded(db)
+        manufacturers = distinct_values.known_values("c_manufacturer")
+        return self.sku_intent(message, manufacturers) or self.filter_intent(message, db, manufacturers)
+
+    def sku_intent(self, message: str, manufacturers: List[str]) -> Optional[IntentMatch]:
+        plan = compile_logical_query(normalize_query(message))
+        if "clause" not in plan or not is_sku_plan(plan["ast"], set(manufacturers)):
+            return None
+        return IntentMatch("sku", product_statement(plan["clause"]))
+
+    def filter_intent(self, message: str, db: Session, manufacturers: List[str]) -> Optional[IntentMatch]:
+        remaining = " ".join(message.lower().split()).rstrip("?!. ")
+        min_price, max_price, remaining = extract_price_bounds(remaining)
+        manufacturer, remaining = take_known_value(remaining, manufacturers)
+        category, remaining = take_known_value(remaining, distinct_values.known_values("c_category"))
+        if manufacturer is None and category is None and min_price is None and max_price is None:
+            return None
+        # Anything left that is not filler ("featured", "cheapest", "gaming") needs the model
+        if any(word not in FILLER_WORDS for word in re.findall(r"[\w$%-]+", remaining)):
+            return None
+
+        conditions = []
+        if manufacturer is not None:
+            conditions.append(contains_predicate(models.Product.c_manufacturer, manufacturer, db))
+        if category is not None:
+            conditions.append(contains_predicate(models.Product.c_category, category, db))
+        if min_price is not None:
+            conditions.append(models.Product.price >= min_price)
+        if max_price is not None:
+            conditions.append(models.Product.price <= max_price)
+        return IntentMatch("filter", product_statement(and_(*conditions)))
+
+
+def product_statement(clause):
+    """SELECT * FROM product WHERE clause LIMIT CHAT_RESULT_LIMIT, like the LLM's queries"""
+    return select(models.Product.__table__).where(clause).limit(CHAT_RESULT_LIMIT)
+
+
+def render_statement(statement, db: Session) -> str:
+    """SQL text of a routed statement, shown to the user as the generated query"""
+    return str(statement.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}))
+
+
+intent_router = IntentRouter()
+
+
+class ChatRouteStats:
+    """How chat messages got their SQL, and how long that took per route"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, List[float]] = {}
+
+    def record(self, route: str, seconds: float):
+        with self._lock:
+            totals = self._routes.setdefault(route, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+        metrics.record_chat_route(route, seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            routes = {route: (count, seconds) for route, (count, seconds) in self._routes.items()}
+        total = sum(count for count, _ in routes.values())
+        mean = {route: seconds / count for route, (count, seconds) in routes.items() if count}
+        fast_count = routes.get(FAST_PATH, (0, 0.0))[0]
+        saved = None
+        if fast_count and LLM in mean:
+            # Each fast-path message would otherwise have waited for a model call
+            saved = round(fast_count * (mean[LLM] - mean[FAST_PATH]), 3)
+        return {
+            "messages": total,
+            "fast_path_share": round(fast_count / total, 4) if total else 0.0,
+            "estimated_seconds_saved": saved,
+            "routes": {
+                route: {"count": count, "mean_ms": round(mean[route] * 1000, 2) if count else None}
+                for route, (count, _) in routes.items()
+            },
+        }
+
+
+chat_route_stats = ChatRouteStats()
@@ -0,0 +1,251 @@
+"""
+Columnar in-memory snapshot of the product table for structured search filters.
+
+/products/search without search text filters on category, manufacturer and type
+(case-insensitive substring, like ILIKE '%x%'), a price range and the listing
+gate. The snapshot keeps those columns as NumPy arrays: the string columns are
+dictionary-encoded, so a substring filter is evaluated once per distinct value
+and then applied to the rows with ``np.isin``; prices are integer cents so the
+comparisons match DECIMAL(15,2) exactly. A filter is a handful of boolean masks
+over the arrays instead of a table scan.
+
+The snapshot follows ``product.date_modify`` from its own high-water mark, is
+told about API writes directly, and is rebuilt in full every
+SNAPSHOT_REBUILD_SECONDS to drop rows deleted behind the API's back.
+"""
+import threading
+import time
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import models
+from app.search_index import is_listed
+
+SNAPSHOT_REFRESH_SECONDS = 10
+SNAPSHOT_REBUILD_SECONDS = 600
+
+# String columns answered from the snapshot, keyed by their /products/search parameter
+FILTER_COLUMNS = {
+    "category": "c_category",
+    "manufacturer": "c_manufacturer",
+    "type": "c_type",
+}
+
+SNAPSHOT_FIELDS = (
+    "product_id",
+    "inactive",
+    "show_in_store",
+    "if_sellable",
+    "price",
+    "date_modify",
+) + tuple(FILTER_COLUMNS.values())
+
+
+def to_cents(price: Optional[Decimal], rounding=ROUND_FLOOR) -> Optional[int]:
+    """Exact integer cents of a DECIMAL(15,2) price, or None"""
+    if price is None:
+        return None
+    return int((Decimal(str(price)) * 100).to_integral_value(rounding=rounding))
+
+
+class ColumnDictionary:
+    """Dictionary encoding of one string column; NULL and '' share code 0"""
+
+    def __init__(self):
+        self.values: List[str] = [""]
+        self._codes: Dict[str, int] = {"": 0}
+
+    def encode(self, value: Optional[str]) -> int:
+        key = (value or "").lower()
+        code = self._codes.get(key)
+        if code is None:
+            code = self._codes[key] = len(self.values)
+            self.values.append(key)
+        return code
+
+    def codes_containing(self, needle: str) -> np.ndarray:
+        """Codes whose value contains ``needle`` case-insensitively"""
+        needle = needle.lower()
+        return np.array([code for code, value in enumerate(self.values) if needle in value], dtype=np.int32)
+
+
+class CatalogSnapshot:
+    """Listing gate, price and dictionary-encoded filter columns of every product"""
+
+    def __init__(self, rebuild_seconds: float = SNAPSHOT_REBUILD_SECONDS, refresh_seconds: float = SNAPSHOT_REFRESH_SECONDS):
+        self.rebuild_seconds = rebuild_seconds
+        self.refresh_seconds = refresh_seconds
+        self.high_water: Optional[int] = None
+        self._lock = threading.RLock()
+        # Serializes refreshes so concurrent cold requests run one build
+        self._refresh_lock = threading.Lock()
+        self._built_at: Optional[float] = None
+        self._refreshed_at: Optional[float] = None
+        self._reset()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _reset(self):
+        self._ids = np.empty(0, dtype=np.int64)
+        self._positions: Dict[int, int] = {}
+        self._listed = np.empty(0, dtype=bool)
+        self._has_price = np.empty(0, dtype=bool)
+        self._price_cents = np.empty(0, dtype=np.int64)
+        self._codes = {field: np.empty(0, dtype=np.int32) for field in FILTER_COLUMNS.values()}
+        self._dictionaries = {field: ColumnDictionary() for field in FILTER_COLUMNS.values()}
+        self._ids_sorted = True
+
+    def build(self, db: Session):
+        """Load every product from the database and rebuild the arrays"""
+        columns = [getattr(models.Product, field) for field in SNAPSHOT_FIELDS]
+        rows = db.query(*columns).order_by(models.Product.product_id).yield_per(10000)
+        high_water = db.query(func.max(models.Product.date_modify)).scalar()
+        with self._lock:
+            self._reset()
+            self._append(rows)
+            self.high_water = high_water
+            self._built_at = self._refreshed_at = time.monotonic()
+        print(f"Catalog snapshot built with {len(self._ids)} products")
+
+    def refresh(self, db: Session):
+        """Rebuild when stale, otherwise fold in products modified since the high-water mark"""
+        if self._fresh(time.monotonic()):
+            return
+        with self._refresh_lock:
+            # Another request may have refreshed while this one waited
+            now = time.monotonic()
+            if self._fresh(now):
+                return
+            if self._built_at is None or now - self._built_at >= self.rebuild_seconds:
+                self.build(db)
+                return
+            if self.high_water is None:
+                self._refreshed_at = now
+                return
+            columns = [getattr(models.Product, field) for field in SNAPSHOT_FIELDS]
+            # >= so rows committed later within the high-water second are not missed
+            changed = db.query(*columns).filter(models.Product.date_modify >= self.high_water).all()
+            with self._lock:
+                self._upsert_rows(changed)
+                for row in changed:
+                    if row.date_modify > self.high_water:
+                        self.high_water = row.date_modify
+                self._refreshed_at = now
+
+    def _fresh(self, now: float) -> bool:
+        return (
+            self._built_at is not None
+            and now - self._built_at < self.rebuild_seconds
+            and now - self._refreshed_at < self.refresh_seconds
+        )
+
+    def upsert(self, product):
+        """Apply a created or updated product"""
+        if self._built_at is None:
+            return
+        with self._lock:
+            self._upsert_rows([product])
+
+    def remove(self, product_id: int):
+        """Unlist a deleted product; its row is dropped at the next rebuild"""
+        if self._built_at is None:
+            return
+        with self._lock:
+            position = self._positions.get(product_id)
+            if position is not None:
+                self._listed[position] = False
+
+    def filter_ids(
+        self,
+        db: Session,
+        category: Optional[str] = None,
+        manufacturer: Optional[str] = None,
+        type: Optional[str] = None,
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> Optional[List[int]]:
+        """
+        Ids of listed products passing the /products/search structured filters,
+        in product_id order and sliced to ``[offset:offset + limit]``.
+        Returns None when a filter value holds LIKE wildcards so the caller keeps
+        the SQL path.
+        """
+        needles = {"category": category, "manufacturer": manufacturer, "type": type}
+        if any(value and ("%" in value or "_" in value) for value in needles.values()):
+            return None
+        self.refresh(db)
+
+        with self._lock:
+            mask = self._listed.copy()
+            for parameter, value in needles.items():
+                if value:
+                    field = FILTER_COLUMNS[parameter]
+                    mask &= np.isin(self._codes[field], self._dictionaries[field].codes_containing(value))
+            if min_price is not None:
+                mask &= self._has_price & (self._price_cents >= to_cents(min_price, ROUND_CEILING))
+            if max_price is not None:
+                mask &= self._has_price & (self._price_cents <= to_cents(max_price, ROUND_FLOOR))
+            matched = self._ids[mask]
+            ids_sorted = self._ids_sorted
+
+        depth = None if limit is None else offset + limit
+        if not ids_sorted:
+            if depth is not None and depth < len(matched):
+                matched = np.partition(matched, depth - 1)[:depth]
+            matched = matched[np.argsort(matched, kind="stable")]
+        end = len(matched) if depth is None else depth
+        return matched[offset:end].tolist()
+
+    def _upsert_rows(self, rows):
+        appended = []
+        for row in rows:
+            position = self._positions.get(row.product_id)
+            if position is None:
+                appended.append(row)
+                continue
+            self._listed[position] = is_listed(row)
+            cents = to_cents(row.price)
+            self._has_price[position] = cents is not None
+            self._price_cents[position] = cents or 0
+            for field, dictionary in self._dictionaries.items():
+                self._codes[field][position] = dictionary.encode(getattr(row, field))
+        if appended:
+            self._append(appended)
+
+    def _append(self, rows):
+        ids, listed, has_price, cents = [], [], [], []
+        codes = {field: [] for field in self._dictionaries}
+        for row in rows:
+            ids.append(row.product_id)
+            listed.append(is_listed(row))
+            price = to_cents(row.price)
+            has_price.append(price is not None)
+            cents.append(price or 0)
+            for field, dictionary in self._dictionaries.items():
+                codes[field].append(dictionary.encode(getattr(row, field)))
+        if not ids:
+            return
+
+        start = len(self._ids)
+        new_ids = np.array(ids, dtype=np.int64)
+        if self._ids_sorted:
+            previous = self._ids[-1] if start else None
+            self._ids_sorted = bool(np.all(np.diff(new_ids) > 0)) and (previous is None or new_ids[0] > previous)
+        self._ids = np.concatenate([self._ids, new_ids])
+        self._listed = np.concatenate([self._listed, np.array(listed, dtype=bool)])
+        self._has_price = np.concatenate([self._has_price, np.array(has_price, dtype=bool)])
+        self._price_cents = np.concatenate([self._price_cents, np.array(cents, dtype=np.int64)])
+        for field in self._codes:
+            self._codes[field] = np.concatenate([self._codes[field], np.array(codes[field], dtype=np.int32)])
+        for offset, product_id in enumerate(ids):
+            self._positions[product_id] = start + offset
+
+
+catalog_snapshot = CatalogSnapshot()
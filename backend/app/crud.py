@@ -1,11 +1,12 @@
 from sqlalchemy.orm import Session
 from . import models
+from .query_planner import contains_predicate
 
 def get_products(db: Session, filters: dict):
     query = db.query(models.Product)
     
     for key, value in filters.items():
         if hasattr(models.Product, key) and value:
-            query = query.filter(getattr(models.Product, key).ilike(f"%{value}%"))
+            query = query.filter(contains_predicate(getattr(models.Product, key), value, db))
     
     return query.all()
@@ -1,9 +1,10 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
-from typing import List, Dict
+from typing import Dict, Iterable, List, Optional
 import numpy as np
 
 load_dotenv()
@@ -14,12 +15,29 @@ DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("MYSQL_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME")
 
-DATABASE_URL = f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# DATABASE_URL / ASYNC_DATABASE_URL override the MySQL defaults, e.g. with
+# sqlite:///catalog.db and sqlite+aiosqlite:///catalog.db for local runs
+DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
 
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 Base = declarative_base()
 
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=int(os.getenv("ASYNC_DB_POOL_SIZE", "20")),
+    max_overflow=int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "20")),
+    pool_pre_ping=True
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     """Database dependency for FastAPI"""
     db = SessionLocal()
@@ -28,11 +46,16 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """Async database dependency for FastAPI"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 class DatabaseManager:
     """Manages database connections and operations for image search"""
     
-    def __init__(self):
-        self.session = None
+    def __init__(self, session=None):
+        self.session = session
     
     def connect(self) -> bool:
         """Establish database session"""
@@ -75,10 +98,11 @@ class DatabaseManager:
         except Exception as e:
             return False
 
-    def get_products_with_images(self) -> List[Dict]:
-        """Get all products with their images"""
+    def get_products_with_images(self, image_ids: Optional[Iterable[int]] = None) -> List[Dict]:
+        """Get all products with their images, or only the given images"""
         try:
-            query = text("""
+            image_filter = "AND pi.image_id IN :image_ids" if image_ids is not None else ""
+            query = text(f"""
                 SELECT 
                     p.product_id,
                     p.name as product_name,
@@ -112,9 +136,14 @@ class DatabaseManager:
                 AND p.inactive = 0
                 AND p.show_in_store = 1
                 AND p.if_sellable = 1
+                {image_filter}
                 ORDER BY p.product_id, pi.image_sort
             """)
-            result = self.session.execute(query)
+            params = {}
+            if image_ids is not None:
+                query = query.bindparams(bindparam("image_ids", expanding=True))
+                params["image_ids"] = list(image_ids)
+            result = self.session.execute(query, params)
             rows = result.fetchall()
             products = []
             for row in rows:
@@ -173,13 +202,17 @@ class DatabaseManager:
             print(f"Error saving image features for image_id {image_id}: {e}")
             self.session.rollback()
 
-    def get_all_image_features(self):
+    def get_all_image_features(self, image_ids: Optional[Iterable[int]] = None):
         try:
             query = text("""
                 SELECT image_id, features
                 FROM product_image_features
-            """)
-            result = self.session.execute(query)
+            """ + ("WHERE image_id IN :image_ids" if image_ids is not None else ""))
+            params = {}
+            if image_ids is not None:
+                query = query.bindparams(bindparam("image_ids", expanding=True))
+                params["image_ids"] = list(image_ids)
+            result = self.session.execute(query, params)
             rows = result.fetchall()
             features_list = []
             for row in rows:
@@ -0,0 +1,121 @@
+"""
+ETag / conditional GET support for the products router.
+
+Validators are strong ETags derived from the data alone, so every worker and
+every restart issues the same tag for the same catalog: the product's own
+``date_modify`` and images for detail responses, and a short-lived catalog
+fingerprint (row count, max ``date_modify``, max ``product_id``) for collection
+responses. A request whose ``If-None-Match`` matches gets a bodiless 304 before
+the endpoint touches the response data.
+"""
+import hashlib
+import threading
+import time
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import models
+
+FINGERPRINT_TTL_SECONDS = 5
+
+# Seconds a client may reuse a response before revalidating it
+MAX_AGE_SECONDS = {
+    "product": 60,
+    "products": 30,
+    "best-sellers": 300,
+    "facets": 60,
+}
+
+
+class CatalogVersion:
+    """
+    Counter bumped on every catalog write this process sees. It only expires the
+    cached fingerprint early and is never part of an ETag, which must not depend
+    on process-local state.
+    """
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def bump(self):
+        with self._lock:
+            self.value += 1
+
+
+catalog_version = CatalogVersion()
+
+_fingerprint = {"version": None, "expires_at": 0.0, "value": None}
+_fingerprint_lock = threading.Lock()
+
+
+def catalog_fingerprint(db: Session) -> tuple:
+    """
+    Product count, max and sum of date_modify and max product_id, plus image
+    count and max image_id, reused for FINGERPRINT_TTL_SECONDS. The sum moves
+    whenever any row's date_modify does, not only the latest one; the image
+    parts cover the images the list responses embed.
+    """
+    version = catalog_version.value
+    now = time.monotonic()
+    with _fingerprint_lock:
+        if _fingerprint["version"] == version and _fingerprint["expires_at"] > now:
+            return _fingerprint["value"]
+    value = tuple(
+        db.query(
+            func.count(models.Product.product_id),
+            func.max(models.Product.date_modify),
+            func.sum(models.Product.date_modify),
+            func.max(models.Product.product_id),
+            select(func.count(models.ProductImage.image_id)).scalar_subquery(),
+            select(func.max(models.ProductImage.image_id)).scalar_subquery()
+        ).one()
+    )
+    with _fingerprint_lock:
+        _fingerprint.update(version=version, expires_at=now + FINGERPRINT_TTL_SECONDS, value=value)
+    return value
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag over ``parts``, which must identify the data being served"""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def body_etag(body: bytes) -> str:
+    """Strong ETag over a rendered response body"""
+    return f'"{hashlib.sha1(body).hexdigest()[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def cache_headers(etag: str, kind: str) -> dict:
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={MAX_AGE_SECONDS[kind]}, must-revalidate",
+    }
+
+
+def not_modified(request: Request, etag: str, kind: str) -> Optional[Response]:
+    """A 304 response when the client already holds ``etag``, else None"""
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag, kind))
+    return None
+
+
+def with_cache_headers(response: Response, etag: str, kind: str) -> Response:
+    response.headers.update(cache_headers(etag, kind))
+    return response
@@ -0,0 +1,182 @@
+"""
+Resilient async client for the OpenAI chat completions API.
+
+A slow or failing upstream must not stall the API, so every call:
+
+- has a hard deadline of OPENAI_TIMEOUT_SECONDS, retries included;
+- needs one of OPENAI_MAX_CONCURRENCY slots, and gives up after
+  OPENAI_QUEUE_TIMEOUT_SECONDS instead of queuing behind a stuck upstream;
+- goes through a circuit breaker that opens after BREAKER_FAILURE_THRESHOLD
+  consecutive failures. While open, calls are refused at once. After
+  BREAKER_RESET_SECONDS it half-opens: a single probe call is let through,
+  the others are still refused, and the probe's outcome closes or re-opens it.
+
+Refused and failed calls raise ``LLMUnavailable`` so callers can fall back.
+OPENAI_BASE_URL points the client at another OpenAI-compatible server, such as
+the stub in tests/test_llm_client.py.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from openai import AsyncOpenAI
+
+from app.metrics import metrics, track
+
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "10"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_QUEUE_TIMEOUT_SECONDS = float(os.getenv("OPENAI_QUEUE_TIMEOUT_SECONDS", "1"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("OPENAI_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("OPENAI_BREAKER_RESET_SECONDS", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class LLMUnavailable(Exception):
+    """The completion was refused or did not finish; use the fallback"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker"""
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = BREAKER_RESET_SECONDS,
+        clock=time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_started_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        return HALF_OPEN if self.clock() - self._opened_at >= self.reset_seconds else OPEN
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state()
+            if state != HALF_OPEN:
+                return state == CLOSED
+            now = self.clock()
+            # One probe at a time; a probe that never reports back (its caller was
+            # cancelled, say) is replaced after another reset interval
+            if self._probe_started_at is not None and now - self._probe_started_at < self.reset_seconds:
+                return False
+            self._probe_started_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_started_at = None
+            # A failed half-open call re-opens at once; a closed breaker waits for the threshold
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._state(),
+                "consecutive_failures": self._failures,
+                "probe_in_flight": self._probe_started_at is not None,
+            }
+
+
+class ChatCompletionClient:
+    """Deadline, concurrency limit and circuit breaker around AsyncOpenAI"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        timeout: float = OPENAI_TIMEOUT_SECONDS,
+        max_concurrency: int = OPENAI_MAX_CONCURRENCY,
+        queue_timeout: float = OPENAI_QUEUE_TIMEOUT_SECONDS,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[AsyncOpenAI] = None
+        self.in_flight = 0
+
+    def _get_client(self) -> AsyncOpenAI:
+        if self._client is None:
+            # The deadline below bounds the whole call, so the SDK's own retries are off
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout, max_retries=0)
+        return self._client
+
+    async def complete(self, messages: List[Dict[str, str]], **params) -> str:
+        """Content of the first choice, or LLMUnavailable"""
+        if not self.api_key:
+            raise LLMUnavailable("OPENAI_API_KEY is not set")
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            metrics.record_llm_call("saturated")
+            raise LLMUnavailable(f"{self.max_concurrency} LLM calls already in flight")
+        # Only asked once a slot is held: a half-open breaker's single probe must
+        # reach the upstream and record an outcome, not give up in the queue
+        if not self.breaker.allow():
+            self._semaphore.release()
+            metrics.record_llm_call("circuit_open")
+            raise LLMUnavailable("circuit breaker open")
+
+        self.in_flight += 1
+        try:
+            with track("openai_sql_generation"):
+                response = await asyncio.wait_for(
+                    self._get_client().chat.completions.create(messages=messages, **params),
+                    self.timeout
+                )
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            metrics.record_llm_call("timeout")
+            raise LLMUnavailable(f"no completion within {self.timeout} s")
+        except Exception as e:
+            self.breaker.record_failure()
+            metrics.record_llm_call("error")
+            raise LLMUnavailable(str(e)) from e
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+        self.breaker.record_success()
+        metrics.record_llm_call("ok")
+        return response.choices[0].message.content or ""
+
+    def stats(self) -> dict:
+        return {
+            **self.breaker.stats(),
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.timeout,
+        }
+
+
+chat_completion_client = ChatCompletionClient()
@@ -1,7 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import Base, engine, db_manager
-from app.routers import products, llm, voice_search, image_search
+from app.change_feed import catalog_change_feed
+from app.database import Base, SessionLocal, async_engine, engine, db_manager
+from app import slow_queries
+from app.metrics import MetricsMiddleware, instrument_engine
+from app.routers import products, products_async, llm, voice_search, image_search, metrics, admin
 
 app = FastAPI()
 
@@ -12,12 +15,20 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+slow_queries.instrument_engine(engine)
+slow_queries.instrument_engine(async_engine.sync_engine, explain_engine=engine)
 
 Base.metadata.create_all(bind=engine)
 app.include_router(products.router)
+app.include_router(products_async.router)
 app.include_router(llm.router)
 app.include_router(voice_search.router)
 app.include_router(image_search.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
 
 @app.on_event("startup")
 async def startup_event():
@@ -30,10 +41,13 @@ async def startup_event():
     except Exception as e:
         print(f"Error creating product_image_features table: {e}")
     image_search.initialize_image_search()
+    llm.warm_system_prompt(SessionLocal)
+    catalog_change_feed.start(SessionLocal)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up resources on shutdown"""
+    catalog_change_feed.stop()
     image_search.cleanup_image_search()
     db_manager.disconnect()
 
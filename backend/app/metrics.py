@@ -0,0 +1,277 @@
+"""
+In-process request metrics rendered in the Prometheus text format.
+
+``MetricsMiddleware`` times every request, streamed bodies included, and labels
+it with the route template (``/products/{product_id}``, not the raw path).
+SQLAlchemy cursor events count the statements and sum the database time of the
+request in flight through a context variable, so each route gets its own query
+count and DB time. Slow calls outside the database (the OpenAI request, ResNet
+inference, Google ASR) are timed with ``track`` and reported per operation.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+# Seconds; the Prometheus client defaults plus a 30 s bucket for LLM calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250)
+
+# Route label for statements issued outside a request (startup, change feed)
+BACKGROUND_ROUTE = "background"
+
+
+class RequestStats:
+    """Path, statement count and database time of one request"""
+    __slots__ = ("path", "queries", "db_seconds")
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def current_request_path() -> Optional[str]:
+    """Path of the request being served on this context, if any"""
+    stats = _current_request.get()
+    return stats.path if stats is not None else None
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a label tuple"""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        series = self._series.get(labels)
+        if series is None:
+            # One count per bucket, then +Inf count and sum
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            label_text = format_labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{format_labels(self.label_names + ('le',), labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{label_text} {series[-1]}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by a label tuple"""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._series: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1):
+        self._series[labels] = self._series.get(labels, 0) + amount
+
+    def value(self, labels: Tuple[str, ...]) -> float:
+        return self._series.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._series.items()):
+            lines.append(f"{self.name}{format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """Every metric the API exports, behind one lock"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_latency = Histogram(
+            "http_request_duration_seconds", "Request latency by route", ("method", "route"), LATENCY_BUCKETS
+        )
+        self.requests = Counter("http_requests_total", "Requests by route and status code", ("method", "route", "status"))
+        self.request_queries = Histogram(
+            "db_queries_per_request", "SQL statements issued per request", ("method", "route"), QUERY_COUNT_BUCKETS
+        )
+        self.db_queries = Counter("db_queries_total", "SQL statements executed by route", ("route",))
+        self.db_seconds = Counter("db_query_seconds_total", "Time spent executing SQL by route", ("route",))
+        self.operation_latency = Histogram(
+            "operation_duration_seconds", "Latency of slow non-database calls", ("operation", "outcome"), LATENCY_BUCKETS
+        )
+        self.llm_calls = Counter("llm_calls_total", "OpenAI completion calls by outcome", ("outcome",))
+        self.chat_routes = Counter("chat_sql_routes_total", "Chat messages by how their SQL was produced", ("route",))
+        self.chat_route_seconds = Counter(
+            "chat_sql_route_seconds_total", "Time spent producing chat SQL by route", ("route",)
+        )
+        self.translation_lookups = Counter(
+            "sql_translation_cache_lookups_total", "Chat NL-to-SQL cache lookups by tier and outcome", ("tier", "outcome")
+        )
+
+    def record_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        with self._lock:
+            self.request_latency.observe((method, route), seconds)
+            self.requests.inc((method, route, str(status)))
+            self.request_queries.observe((method, route), stats.queries)
+            self.db_queries.inc((route,), stats.queries)
+            self.db_seconds.inc((route,), stats.db_seconds)
+
+    def record_background_query(self, seconds: float):
+        with self._lock:
+            self.db_queries.inc((BACKGROUND_ROUTE,))
+            self.db_seconds.inc((BACKGROUND_ROUTE,), seconds)
+
+    def record_operation(self, operation: str, outcome: str, seconds: float):
+        with self._lock:
+            self.operation_latency.observe((operation, outcome), seconds)
+
+    def record_llm_call(self, outcome: str):
+        with self._lock:
+            self.llm_calls.inc((outcome,))
+
+    def record_chat_route(self, route: str, seconds: float):
+        with self._lock:
+            self.chat_routes.inc((route,))
+            self.chat_route_seconds.inc((route,), seconds)
+
+    def record_translation_lookup(self, tier: str, outcome: str):
+        with self._lock:
+            self.translation_lookups.inc((tier, outcome))
+
+    def render(self) -> str:
+        with self._lock:
+            lines = []
+            for metric in (
+                self.request_latency,
+                self.requests,
+                self.request_queries,
+                self.db_queries,
+                self.db_seconds,
+                self.operation_latency,
+                self.llm_calls,
+                self.chat_routes,
+                self.chat_route_seconds,
+                self.translation_lookups,
+            ):
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+@contextmanager
+def track(operation: str):
+    """Time a block as ``operation``; the outcome label is ``error`` if it raises"""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        metrics.record_operation(operation, outcome, time.perf_counter() - start)
+
+
+def instrument_engine(engine):
+    """Count statements and DB time on ``engine`` (a sync Engine or an AsyncEngine's sync_engine)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        seconds = time.perf_counter() - starts.pop()
+        stats = _current_request.get()
+        if stats is None:
+            metrics.record_background_query(seconds)
+        else:
+            stats.queries += 1
+            stats.db_seconds += seconds
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        starts = connection.info.get("metrics_query_start") if connection is not None else None
+        if starts:
+            starts.pop()
+
+
+def route_label(scope) -> str:
+    """Route template of the matched endpoint, so path parameters do not split series"""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path if path else "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status, statement count and DB time for every request.
+
+    Pure ASGI rather than BaseHTTPMiddleware: a request is recorded when its
+    last body message has been sent (or it raised), so a StreamingResponse's
+    statements and time, which all happen after the endpoint returns, are
+    counted against its route.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope["path"])
+        token = _current_request.set(stats)
+        start = time.perf_counter()
+        status = 500
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            if not recorded:
+                recorded = True
+                metrics.record_request(scope["method"], route_label(scope), status, time.perf_counter() - start, stats)
+
+        async def send_and_record(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            _current_request.reset(token)
+            record()
@@ -24,9 +24,9 @@ class Product(Base):
     product_availability_note = Column(String(255))
     date_added = Column(Integer)
     date_modify = Column(Integer)
-    c_type = Column(String(45))
-    c_category = Column(String(100))
-    c_manufacturer = Column(String(100))
+    c_type = Column(String(45), index=True)
+    c_category = Column(String(100), index=True)
+    c_manufacturer = Column(String(100), index=True)
     c_product_group = Column(String(100))
     internal_notes = Column(String(250))
     receiving_notes = Column(String(200))
@@ -102,6 +102,16 @@ class ChatbotMessage(Base):
     message_type = Column(String(50), nullable=False)
     content = Column(Text, nullable=False)
 
+class SqlTranslation(Base):
+    __tablename__ = "chat_sql_translation"
+
+    message_key = Column(String(64), primary_key=True)
+    message = Column(Text, nullable=False)
+    sql_query = Column(Text, nullable=False)
+    created_at = Column(BigInteger, nullable=False)
+    expires_at = Column(BigInteger, nullable=False, index=True)
+    hits = Column(Integer, nullable=False, default=0)
+
 class OrderProduct(Base):
     __tablename__ = "order_product"
 
@@ -109,7 +119,7 @@ class OrderProduct(Base):
     product_id = Column(Integer, ForeignKey("product.product_id"))
     order_id = Column(Integer, index=True)
     quantity = Column(Integer, default=1)
-    created_at = Column(BigInteger)
+    created_at = Column(BigInteger, index=True)
     
     product = relationship("Product", back_populates="orders")
 
@@ -120,7 +130,7 @@ class ShipmentProduct(Base):
     product_id = Column(Integer, ForeignKey("product.product_id"))
     shipment_id = Column(Integer, index=True)
     quantity = Column(Integer, default=1)
-    created_at = Column(BigInteger)
+    created_at = Column(BigInteger, index=True)
 
     product = relationship("Product")
 
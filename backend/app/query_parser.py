@@ -0,0 +1,251 @@
+"""
+Grammar for the logical product search language used by /products/search,
+/products/advanced-search, the suggestion endpoints and voice search.
+
+    expr      := and_expr (OR and_expr)*
+    and_expr  := unary ((AND | ',') unary)*
+    unary     := NOT unary | scoped
+    scoped    := operand [[NOT] IN target]
+    operand   := '(' expr ')' | FIELD [NOT] IN '(' list ')' | sku_chain
+    sku_chain := SKU ((AND | OR) SKU)*
+    target    := '(' list ')' | WORD+
+    list      := WORD+ (',' WORD+)*
+
+A bare word is a SKU. A run of SKUs joined by AND/OR binds tighter than IN, so
+"SKU1 OR SKU2 IN Dell" means (SKU1 OR SKU2) AND manufacturer = Dell, while
+"SKU1 IN Dell OR SKU2 IN HP" pairs each SKU with its manufacturer. SKUs joined
+by AND become an IN list since a product has exactly one SKU. FIELD is one of
+MANUFACTURER, BRAND, CATEGORY, TYPE or SKU.
+
+Queries that do not fit the grammar (plain phrases such as "dell laptop") are
+returned as a text search. Compiled plans are memoized on the normalized query.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+from typing import List
+
+from sqlalchemy import and_, not_, or_
+
+from app import models
+
+PLAN_CACHE_SIZE = 2048
+
+KEYWORDS = {"AND", "OR", "NOT", "IN"}
+
+FIELD_COLUMNS = {
+    "MANUFACTURER": models.Product.c_manufacturer,
+    "BRAND": models.Product.c_manufacturer,
+    "CATEGORY": models.Product.c_category,
+    "TYPE": models.Product.c_type,
+    "SKU": models.Product.sku_name,
+}
+
+TOKEN_PATTERN = re.compile(r"\s*(?:([(),])|([A-Z0-9_-]+))")
+
+Sku = namedtuple("Sku", "value")
+FieldMatch = namedtuple("FieldMatch", "column negated values")
+Scoped = namedtuple("Scoped", "operand negated values")
+And = namedtuple("And", "children")
+Or = namedtuple("Or", "children")
+Not = namedtuple("Not", "child")
+
+
+class QuerySyntaxError(ValueError):
+    """Raised when a query does not fit the logical search grammar"""
+
+
+def normalize_query(query: str) -> str:
+    """Upper-case and collapse whitespace so equivalent queries share a plan"""
+    return " ".join(query.upper().split())
+
+
+def tokenize(query: str) -> List[str]:
+    tokens = []
+    position = 0
+    while position < len(query):
+        match = TOKEN_PATTERN.match(query, position)
+        if not match:
+            raise QuerySyntaxError(f"Unexpected character {query[position]!r}")
+        tokens.append(match.group(1) or match.group(2))
+        position = match.end()
+    return tokens
+
+
+class Parser:
+    """Recursive-descent parser producing the AST described in the module docstring"""
+
+    def __init__(self, tokens: List[str]):
+        self.tokens = tokens
+        self.position = 0
+
+    def parse(self):
+        if not self.tokens:
+            raise QuerySyntaxError("Empty query")
+        node = self.expr()
+        if self.peek() is not None:
+            raise QuerySyntaxError(f"Unexpected {self.peek()!r}")
+        return node
+
+    def peek(self, offset: int = 0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def take(self, expected: str = None) -> str:
+        token = self.peek()
+        if token is None or (expected is not None and token != expected):
+            raise QuerySyntaxError(f"Expected {expected or 'a term'}, found {token!r}")
+        self.position += 1
+        return token
+
+    def is_word(self, offset: int = 0) -> bool:
+        token = self.peek(offset)
+        return token is not None and token not in KEYWORDS and token not in ("(", ")", ",")
+
+    def at_field_clause(self, offset: int = 0) -> bool:
+        """FIELD IN ( ... ) or FIELD NOT IN ( ... ) starts here"""
+        if self.peek(offset) not in FIELD_COLUMNS:
+            return False
+        if self.peek(offset + 1) == "NOT":
+            offset += 1
+        return self.peek(offset + 1) == "IN" and self.peek(offset + 2) == "("
+
+    def expr(self):
+        children = [self.and_expr()]
+        while self.peek() == "OR":
+            self.take()
+            children.append(self.and_expr())
+        return children[0] if len(children) == 1 else Or(tuple(children))
+
+    def and_expr(self):
+        children = [self.unary()]
+        while self.peek() in ("AND", ","):
+            self.take()
+            children.append(self.unary())
+        return children[0] if len(children) == 1 else And(tuple(children))
+
+    def unary(self):
+        if self.peek() == "NOT":
+            self.take()
+            return Not(self.unary())
+        return self.scoped()
+
+    def scoped(self):
+        operand = self.operand()
+        negated = False
+        if self.peek() == "NOT" and self.peek(1) == "IN":
+            self.take()
+            negated = True
+        if self.peek() == "IN":
+            self.take()
+            return Scoped(operand, negated, self.target())
+        if negated:
+            raise QuerySyntaxError("Expected IN after NOT")
+        return operand
+
+    def operand(self):
+        if self.peek() == "(":
+            self.take()
+            node = self.expr()
+            self.take(")")
+            return node
+        if self.at_field_clause():
+            column = FIELD_COLUMNS[self.take()]
+            negated = self.peek() == "NOT"
+            if negated:
+                self.take()
+            self.take("IN")
+            return FieldMatch(column, negated, self.value_list())
+        return self.sku_chain()
+
+    def sku_chain(self):
+        # AND binds tighter than OR inside a chain, like the outer grammar
+        groups = [[Sku(self.word())]]
+        while self.peek() in ("AND", "OR") and self.is_word(1) and not self.at_field_clause(1):
+            operator = self.take()
+            if operator == "OR":
+                groups.append([])
+            groups[-1].append(Sku(self.word()))
+        terms = [group[0] if len(group) == 1 else And(tuple(group)) for group in groups]
+        return terms[0] if len(terms) == 1 else Or(tuple(terms))
+
+    def target(self):
+        if self.peek() == "(":
+            return self.value_list()
+        return (self.phrase(),)
+
+    def value_list(self):
+        self.take("(")
+        values = [self.phrase()]
+        while self.peek() == ",":
+            self.take()
+            values.append(self.phrase())
+        self.take(")")
+        return tuple(values)
+
+    def word(self) -> str:
+        if not self.is_word():
+            raise QuerySyntaxError(f"Expected a term, found {self.peek()!r}")
+        return self.take()
+
+    def phrase(self) -> str:
+        words = [self.word()]
+        while self.is_word():
+            words.append(self.take())
+        return " ".join(words)
+
+
+def only_skus(node) -> bool:
+    if isinstance(node, Sku):
+        return True
+    if isinstance(node, (And, Or)):
+        return all(only_skus(child) for child in node.children)
+    return False
+
+
+def sku_values(node) -> List[str]:
+    if isinstance(node, Sku):
+        return [node.value]
+    return [value for child in node.children for value in sku_values(child)]
+
+
+def compile_node(node):
+    """Compile an AST node into a SQLAlchemy boolean clause over models.Product"""
+    if isinstance(node, Sku):
+        return models.Product.sku_name == node.value
+    if isinstance(node, (And, Or)) and only_skus(node):
+        return models.Product.sku_name.in_(sku_values(node))
+    if isinstance(node, And):
+        return and_(*[compile_node(child) for child in node.children])
+    if isinstance(node, Or):
+        return or_(*[compile_node(child) for child in node.children])
+    if isinstance(node, Not):
+        return not_(compile_node(node.child))
+    if isinstance(node, FieldMatch):
+        return value_clause(node.column, node.negated, node.values)
+    if isinstance(node, Scoped):
+        return and_(
+            compile_node(node.operand),
+            value_clause(models.Product.c_manufacturer, node.negated, node.values)
+        )
+    raise QuerySyntaxError(f"Unknown node {node!r}")
+
+
+def value_clause(column, negated: bool, values):
+    if len(values) == 1:
+        return column != values[0] if negated else column == values[0]
+    return column.not_in(values) if negated else column.in_(values)
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def compile_logical_query(normalized: str) -> dict:
+    """
+    Return the filter plan for a normalized query: ``{'ast', 'clause'}`` when it
+    fits the grammar, ``{'text_search'}`` otherwise. Plans are shared between
+    callers and must not be mutated.
+    """
+    try:
+        ast = Parser(tokenize(normalized)).parse()
+    except QuerySyntaxError:
+        return {"text_search": normalized}
+    return {"ast": ast, "clause": compile_node(ast)}
@@ -0,0 +1,156 @@
+"""
+Index-aware planning of substring filters on low-cardinality product columns.
+
+Filters such as ``category=server`` used to become ``c_category ILIKE '%server%'``,
+which no B-tree index on c_category can serve (MySQL renders ILIKE as
+``lower(col) LIKE lower(...)``, and the leading wildcard rules out a range scan
+anyway). The planner keeps the distinct values of those columns in memory and
+rewrites the filter into the cheapest predicate that selects the same rows:
+
+- the known values containing the input case-insensitively, as ``col = v`` or
+  ``col IN (...)`` when there are at most MAX_IN_VALUES of them;
+- ``col LIKE 'input%'`` when there are more but every one starts with the input,
+  on dialects whose LIKE is case-insensitive;
+- the original ``ILIKE '%input%'`` otherwise, or when the input holds LIKE
+  wildcards or matches no known value (truly fuzzy input, or a value the
+  planner has not seen yet).
+
+Values are rebuilt every DISTINCT_VALUES_REBUILD_SECONDS and extended by every
+product write the API or the change feed sees. A value that disappeared from
+the table is harmless in an IN list, so deletes are not tracked.
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+
+from app import models
+
+DISTINCT_VALUES_REBUILD_SECONDS = 300
+
+# Columns planned from their distinct values; free-text columns are left to the search indexes
+PLANNED_COLUMNS = (
+    "c_category",
+    "c_manufacturer",
+    "c_type",
+    "c_product_group",
+    "product_type",
+    "product_availability",
+    "w_oem",
+    "w_sku_category",
+    "w_primary_category",
+    "w_subcategory",
+)
+
+# A column with more distinct values than this is not low-cardinality and is not planned
+MAX_DISTINCT_VALUES = 5000
+
+# Longest IN list emitted before preferring a prefix LIKE or the substring scan
+MAX_IN_VALUES = 50
+
+# Dialects whose default collation makes LIKE case-insensitive, so 'x%' matches like ILIKE
+CASE_INSENSITIVE_LIKE_DIALECTS = ("mysql", "mariadb", "sqlite")
+
+LIKE_WILDCARDS = ("%", "_")
+
+
+class DistinctValueCatalog:
+    """Distinct values of PLANNED_COLUMNS, grouped by their lowercase form"""
+
+    def __init__(self, columns=PLANNED_COLUMNS, rebuild_seconds: float = DISTINCT_VALUES_REBUILD_SECONDS):
+        self.columns = tuple(columns)
+        self.rebuild_seconds = rebuild_seconds
+        self.dialect: Optional[str] = None
+        self._lock = threading.RLock()
+        self._values: Dict[str, Dict[str, Set[str]]] = {}
+        self._built_at: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._built_at is not None
+
+    def ensure_loaded(self, db: Session):
+        """Build on first use and whenever the values are older than rebuild_seconds"""
+        if self._built_at is not None and time.monotonic() - self._built_at < self.rebuild_seconds:
+            return
+        with self._lock:
+            if self._built_at is None or time.monotonic() - self._built_at >= self.rebuild_seconds:
+                self.build(db)
+
+    def build(self, db: Session):
+        values = {}
+        for name in self.columns:
+            column = getattr(models.Product, name)
+            rows = (
+                db.query(column)
+                .filter(and_(column.isnot(None), column != ""))
+                .distinct()
+                .limit(MAX_DISTINCT_VALUES + 1)
+                .all()
+            )
+            if len(rows) > MAX_DISTINCT_VALUES:
+                continue
+            variants: Dict[str, Set[str]] = {}
+            for (value,) in rows:
+                variants.setdefault(value.lower(), set()).add(value)
+            values[name] = variants
+        with self._lock:
+            self._values = values
+            self.dialect = db.get_bind().dialect.name
+            self._built_at = time.monotonic()
+
+    def upsert(self, product):
+        """Add the planned column values of a created or updated product"""
+        if self._built_at is None:
+            return
+        with self._lock:
+            for name, variants in self._values.items():
+                value = getattr(product, name, None)
+                if value:
+                    variants.setdefault(value.lower(), set()).add(value)
+
+    def known_values(self, name: str) -> List[str]:
+        """Lowercase distinct values of column ``name``; empty if it is not planned"""
+        with self._lock:
+            return list(self._values.get(name, ()))
+
+    def values_containing(self, name: str, needle: str) -> Optional[List[str]]:
+        """Known values of column ``name`` containing ``needle`` case-insensitively; None if not planned"""
+        with self._lock:
+            variants = self._values.get(name)
+            if variants is None:
+                return None
+            needle = needle.lower()
+            return sorted(value for key, group in variants.items() if needle in key for value in group)
+
+
+distinct_values = DistinctValueCatalog()
+
+
+def contains_predicate(column, value, db: Optional[Session] = None):
+    """
+    Predicate selecting the same rows as ``column.ilike(f"%{value}%")``, served
+    by an index on ``column`` when the known values allow it. Without ``db`` the
+    values are only used if already loaded.
+    """
+    value = str(value)
+    substring_scan = column.ilike(f"%{value}%")
+    if not value or any(wildcard in value for wildcard in LIKE_WILDCARDS):
+        return substring_scan
+    if db is not None and column.key in distinct_values.columns:
+        distinct_values.ensure_loaded(db)
+    matches = distinct_values.values_containing(column.key, value)
+    if not matches:
+        return substring_scan
+    if len(matches) == 1:
+        return column == matches[0]
+    if len(matches) <= MAX_IN_VALUES:
+        return column.in_(matches)
+    prefix = value.lower()
+    if distinct_values.dialect in CASE_INSENSITIVE_LIKE_DIALECTS and all(
+        match.lower().startswith(prefix) for match in matches
+    ):
+        return column.like(f"{value}%")
+    return substring_scan
@@ -0,0 +1,292 @@
+"""
+BM25F relevance ranking for free-text product search.
+
+Each listed product is a document with one field per column in
+RELEVANCE_FIELD_WEIGHTS. Term frequencies are kept per field and combined at
+query time BM25F style: every field's count is length-normalized against that
+field's average length, scaled by the field weight, and the weighted sum goes
+through a single k1 saturation. SKUs and part numbers therefore outrank a
+match in the name, which outranks one in the description.
+
+Query tokens also match longer vocabulary tokens they are a prefix of
+("4567" finds "4567r"), at PREFIX_MATCH_WEIGHT, so partially typed part
+numbers still rank. Only ids and scores are accumulated; callers load rows for
+the requested page alone.
+"""
+import bisect
+import heapq
+import math
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+
+from app import models
+from app.search_index import is_listed, tokenize
+
+# Field weights: identifiers first, then names and taxonomy, then prose
+RELEVANCE_FIELD_WEIGHTS = {
+    "sku_name": 6.0,
+    "w_oem_new_pn": 5.0,
+    "w_oem_repair_pn": 5.0,
+    "w_freedom_new_pn": 5.0,
+    "w_freedom_repair_pn": 5.0,
+    "name": 3.0,
+    "c_manufacturer": 1.5,
+    "w_oem": 1.5,
+    "c_category": 1.0,
+    "c_type": 1.0,
+    "w_sku_category": 1.0,
+    "w_primary_category": 1.0,
+    "w_subcategory": 1.0,
+    "tag": 1.0,
+    "description": 0.5,
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Score multiplier for a vocabulary token that only starts with the query token
+PREFIX_MATCH_WEIGHT = 0.5
+# Longest prefix expansion list considered per query token, most frequent first
+MAX_PREFIX_EXPANSIONS = 64
+
+# Operator words of the logical query language carry no relevance signal
+LOGICAL_KEYWORDS = frozenset({"and", "or", "not", "in"})
+
+
+def relevance_terms(search: Optional[str]) -> List[str]:
+    """Distinct query tokens to rank by, with logical operator words dropped"""
+    return [token for token in dict.fromkeys(tokenize(search)) if token not in LOGICAL_KEYWORDS]
+
+
+class ProductRelevanceIndex:
+    """
+    Per-field term frequencies of every listed product, for BM25F top-k ranking.
+
+    Postings map a token to ``{product_id: ((field position, tf), ...)}``; field
+    lengths per product and running length totals per field give the average
+    lengths, so writes keep scores exact without a rebuild. Each product's token
+    list is kept so a write only touches its own postings.
+    """
+
+    def __init__(self, field_weights: Optional[Dict[str, float]] = None, k1: float = BM25_K1, b: float = BM25_B):
+        field_weights = field_weights or RELEVANCE_FIELD_WEIGHTS
+        self.fields = tuple(field_weights)
+        self.weights = tuple(field_weights[field] for field in self.fields)
+        self.k1 = k1
+        self.b = b
+        self.loaded = False
+        self._lock = threading.RLock()
+        self._lengths: Dict[int, Tuple[int, ...]] = {}
+        self._tokens: Dict[int, Tuple[str, ...]] = {}
+        self._length_totals = [0] * len(self.fields)
+        self._postings: Dict[str, Dict[int, Tuple[Tuple[int, int], ...]]] = {}
+        self._sorted_tokens: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def build(self, db: Session):
+        """Load every listed product from the database and rebuild the index"""
+        columns = [getattr(models.Product, field) for field in self.fields]
+        rows = (
+            db.query(models.Product.product_id, *columns)
+            .filter(
+                and_(
+                    models.Product.inactive == 0,
+                    models.Product.show_in_store == 1,
+                    models.Product.if_sellable == 1
+                )
+            )
+            .yield_per(5000)
+        )
+        with self._lock:
+            self._lengths = {}
+            self._tokens = {}
+            self._length_totals = [0] * len(self.fields)
+            self._postings = {}
+            for row in rows:
+                self._add(row[0], row[1:])
+            self._sorted_tokens = sorted(self._postings)
+            self.loaded = True
+        print(f"Relevance index built with {len(self._lengths)} products")
+
+    def ensure_loaded(self, db: Session):
+        """Build the index on first use"""
+        if self.loaded:
+            return
+        with self._lock:
+            if not self.loaded:
+                self.build(db)
+
+    def upsert(self, product):
+        """Re-index a created or updated product, dropping it if it is no longer listed"""
+        if not self.loaded:
+            return
+        with self._lock:
+            self._remove(product.product_id)
+            if is_listed(product):
+                for token in self._add(product.product_id, [getattr(product, field) for field in self.fields]):
+                    bisect.insort(self._sorted_tokens, token)
+
+    def remove(self, product_id: int):
+        """Drop a deleted product from the index"""
+        if not self.loaded:
+            return
+        with self._lock:
+            self._remove(product_id)
+
+    def rank(
+        self,
+        terms: Sequence[str],
+        candidates: Optional[Set[int]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        db: Optional[Session] = None
+    ) -> Optional[List[int]]:
+        """
+        Return product ids ordered by descending BM25F score for ``terms``,
+        sliced to ``[offset:offset + limit]``.
+
+        With ``candidates`` only those ids are ranked, and candidates that no
+        term scores follow the scored ones in product_id order, so the result is
+        a ranking of exactly the candidate set. Only the top ``offset + limit``
+        entries are ever ordered. Returns None when the index is not loaded or
+        there is nothing to rank by, so the caller keeps its own ordering.
+        """
+        if db is not None:
+            self.ensure_loaded(db)
+        if not self.loaded or not terms:
+            return None
+
+        with self._lock:
+            scores = self._scores(terms, candidates)
+
+        depth = None if limit is None else offset + limit
+        by_score = lambda item: (item[1], -item[0])
+        if depth is None:
+            ranked = [pid for pid, _ in sorted(scores.items(), key=by_score, reverse=True)]
+        else:
+            ranked = [pid for pid, _ in heapq.nlargest(depth, scores.items(), key=by_score)]
+
+        if candidates is not None and (depth is None or len(ranked) < depth):
+            unscored = (pid for pid in candidates if pid not in scores)
+            if depth is None:
+                ranked.extend(sorted(unscored))
+            else:
+                ranked.extend(heapq.nsmallest(depth - len(ranked), unscored))
+
+        return ranked[offset:] if depth is None else ranked[offset:depth]
+
+    def iter_ranked(self, terms: Sequence[str], db: Optional[Session] = None) -> Optional[Iterator[int]]:
+        """
+        Every product some term scores, lazily in descending BM25F score order
+        (ties by product_id). Scores come from the terms' postings alone; the
+        order costs one heapify plus a pop per id consumed, so a caller that
+        stops after the first page never sorts the rest. Returns None when the
+        index is not loaded or there is nothing to rank by.
+        """
+        if db is not None:
+            self.ensure_loaded(db)
+        if not self.loaded or not terms:
+            return None
+
+        with self._lock:
+            scores = self._scores(terms, None)
+        heap = [(-score, product_id) for product_id, score in scores.items()]
+        heapq.heapify(heap)
+
+        def ranked():
+            while heap:
+                yield heapq.heappop(heap)[1]
+        return ranked()
+
+    def _scores(self, terms: Sequence[str], candidates: Optional[Set[int]]) -> Dict[int, float]:
+        """Accumulate BM25F scores over the postings of each term's expansions"""
+        document_count = len(self._lengths)
+        if not document_count:
+            return {}
+        average_lengths = [max(total / document_count, 1.0) for total in self._length_totals]
+        k1, b, weights = self.k1, self.b, self.weights
+
+        scores: Dict[int, float] = {}
+        for term in terms:
+            # Each product scores once per query term, through its best expansion
+            best: Dict[int, float] = {}
+            for token, multiplier in self._expansions(term):
+                postings = self._postings[token]
+                idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for product_id, frequencies in postings.items():
+                    if candidates is not None and product_id not in candidates:
+                        continue
+                    lengths = self._lengths[product_id]
+                    tf = 0.0
+                    for position, count in frequencies:
+                        norm = 1 - b + b * lengths[position] / average_lengths[position]
+                        tf += weights[position] * count / norm
+                    score = multiplier * idf * tf * (k1 + 1) / (tf + k1)
+                    if score > best.get(product_id, 0.0):
+                        best[product_id] = score
+            for product_id, score in best.items():
+                scores[product_id] = scores.get(product_id, 0.0) + score
+        return scores
+
+    def _expansions(self, term: str) -> List[Tuple[str, float]]:
+        """The term itself if indexed, plus the most frequent tokens it prefixes"""
+        expansions = []
+        if term in self._postings:
+            expansions.append((term, 1.0))
+        position = bisect.bisect_right(self._sorted_tokens, term)
+        longer = []
+        while position < len(self._sorted_tokens) and self._sorted_tokens[position].startswith(term):
+            longer.append(self._sorted_tokens[position])
+            position += 1
+        if len(longer) > MAX_PREFIX_EXPANSIONS:
+            longer = heapq.nlargest(MAX_PREFIX_EXPANSIONS, longer, key=lambda token: len(self._postings[token]))
+        expansions.extend((token, PREFIX_MATCH_WEIGHT) for token in longer)
+        return expansions
+
+    def _add(self, product_id: int, values: Sequence[Optional[str]]) -> List[str]:
+        """Index one product; returns tokens that are new to the vocabulary"""
+        frequencies: Dict[str, Dict[int, int]] = {}
+        lengths = []
+        for position, value in enumerate(values):
+            tokens = tokenize(value)
+            lengths.append(len(tokens))
+            self._length_totals[position] += len(tokens)
+            for token in tokens:
+                by_field = frequencies.setdefault(token, {})
+                by_field[position] = by_field.get(position, 0) + 1
+        self._lengths[product_id] = tuple(lengths)
+        self._tokens[product_id] = tuple(frequencies)
+
+        new_tokens = []
+        for token, by_field in frequencies.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                new_tokens.append(token)
+            postings[product_id] = tuple(by_field.items())
+        return new_tokens
+
+    def _remove(self, product_id: int):
+        lengths = self._lengths.pop(product_id, None)
+        if lengths is None:
+            return
+        for position, length in enumerate(lengths):
+            self._length_totals[position] -= length
+        for token in self._tokens.pop(product_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[token]
+                position = bisect.bisect_left(self._sorted_tokens, token)
+                if position < len(self._sorted_tokens) and self._sorted_tokens[position] == token:
+                    del self._sorted_tokens[position]
+
+
+product_relevance_index = ProductRelevanceIndex()
@@ -0,0 +1,156 @@
+"""
+In-process cache for rendered product endpoint results.
+
+Entries are keyed by ``(namespace, *normalized parameters)`` where the namespace
+names the endpoint. Each namespace has its own TTL; the cache as a whole is an
+LRU bounded by ``max_entries``. Product writes clear every entry through
+``invalidate`` so results never outlive a catalog change made through the API.
+Writes made behind the API's back (order imports updating ``sales``) are picked
+up when the TTL expires.
+
+``get_or_compute`` and ``get_or_compute_async`` coalesce concurrent misses on the
+same key, so a popular query that expires under load is computed once rather
+than once per waiting request.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.single_flight import AsyncSingleFlight, SingleFlight
+
+RESULT_CACHE_MAX_ENTRIES = 2048
+DEFAULT_TTL_SECONDS = 60
+
+# Seconds an entry of each namespace stays fresh
+NAMESPACE_TTLS = {
+    "search": 60,
+    "advanced-search": 60,
+    "best-sellers": 600,
+    "facets": 300,
+}
+
+MISSING = object()
+
+
+class ResultCache:
+    """Thread-safe LRU cache with per-namespace TTLs and hit/miss counters"""
+
+    def __init__(
+        self,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        ttls: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.ttls = dict(ttls or {})
+        self.clock = clock
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self.evictions = 0
+        self.invalidations = 0
+        self.flights = SingleFlight()
+        self.async_flights = AsyncSingleFlight()
+
+    def _count(self, namespace: str, outcome: str):
+        counters = self._counters.setdefault(namespace, {"hits": 0, "misses": 0, "expired": 0})
+        counters[outcome] += 1
+
+    def get(self, key: Tuple[Hashable, ...], count: bool = True) -> Any:
+        """Return the cached value for ``key`` or MISSING"""
+        namespace = key[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if count:
+                    self._count(namespace, "misses")
+                return MISSING
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                if count:
+                    self._count(namespace, "expired")
+                    self._count(namespace, "misses")
+                return MISSING
+            self._entries.move_to_end(key)
+            if count:
+                self._count(namespace, "hits")
+            return value
+
+    def put(self, key: Tuple[Hashable, ...], value: Any, generation: Optional[int] = None):
+        """
+        Store ``value`` under ``key``. With ``generation`` (the ``invalidations``
+        count when the value started computing) the value is dropped if the
+        catalog changed since, so it cannot outlive the write.
+        """
+        ttl = self.ttls.get(key[0], DEFAULT_TTL_SECONDS)
+        with self._lock:
+            if generation is not None and generation != self.invalidations:
+                return
+            self._entries[key] = (self.clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Tuple[Hashable, ...], compute: Callable[[], Any]) -> Any:
+        """Cached value for ``key``; on a miss, concurrent callers share one ``compute()``"""
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+        generation = self.invalidations
+
+        def fill():
+            # A leader that finished between our miss and joining may have stored it
+            value = self.get(key, count=False)
+            if value is MISSING:
+                value = compute()
+                self.put(key, value, generation)
+            return value
+
+        # Keyed by generation so requests after a write do not join a stale computation
+        return self.flights.do((generation, key), fill)
+
+    async def get_or_compute_async(self, key: Tuple[Hashable, ...], compute: Callable[[], Awaitable[Any]]) -> Any:
+        """``get_or_compute`` for coroutines on the event loop"""
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+        generation = self.invalidations
+
+        async def fill():
+            value = self.get(key, count=False)
+            if value is MISSING:
+                value = await compute()
+                self.put(key, value, generation)
+            return value
+
+        return await self.async_flights.do((generation, key), fill)
+
+    def invalidate(self):
+        """Drop every entry after a catalog write"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            namespaces = {}
+            for namespace, counters in self._counters.items():
+                lookups = counters["hits"] + counters["misses"]
+                namespaces[namespace] = {
+                    **counters,
+                    "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+                }
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "namespaces": namespaces,
+                "single_flight": {"threads": self.flights.stats(), "async": self.async_flights.stats()},
+            }
+
+
+result_cache = ResultCache(ttls=NAMESPACE_TTLS)
@@ -0,0 +1,234 @@
+"""
+In-memory materializations behind /products/best-sellers, /recently-purchased
+and /recently-shipped.
+
+The recent activity rollups keep the latest ``created_at`` per product for the
+last ROLLUP_MAX_DAYS of order_product / shipment_product rows and are extended
+incrementally from the ``created_at`` high-water mark, so a request slices a
+sorted list instead of grouping the whole table.
+
+The best-seller rollup keeps the top seller of each manufacturer. It follows
+``product.date_modify`` from its own high-water mark, is told about API writes
+directly, and is rebuilt in full every BEST_SELLERS_REBUILD_SECONDS to pick up
+``sales`` changes that do not touch ``date_modify``.
+"""
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, text
+from sqlalchemy.orm import Session
+
+from app import models
+from app.search_index import is_listed
+
+ROLLUP_MAX_DAYS = 90
+ROLLUP_REFRESH_SECONDS = 10
+BEST_SELLERS_REBUILD_SECONDS = 600
+
+# Top seller per manufacturer, using a window function. Manufacturers are grouped
+# on LOWER() so every database, and manufacturer_key, agree on what one is
+BEST_SELLERS_QUERY = text("""
+    WITH RankedProducts AS (
+        SELECT
+            p.product_id,
+            p.c_manufacturer,
+            p.sales,
+            ROW_NUMBER() OVER (
+                PARTITION BY LOWER(p.c_manufacturer)
+                ORDER BY p.sales DESC, p.product_id ASC
+            ) as rn
+        FROM product p
+        WHERE p.inactive = 0
+            AND p.show_in_store = 1
+            AND p.if_sellable = 1
+            AND p.sales > 0
+            AND p.c_manufacturer IS NOT NULL
+            AND p.c_manufacturer != ''
+    )
+    SELECT product_id, c_manufacturer, sales FROM RankedProducts WHERE rn = 1
+""")
+
+
+def manufacturer_key(manufacturer: str) -> str:
+    """Best-seller grouping key: "Dell" and "DELL" are one manufacturer"""
+    return manufacturer.lower()
+
+
+class RecentActivityRollup:
+    """Latest ``created_at`` per product for one activity table"""
+
+    def __init__(self, model, retention_days: int = ROLLUP_MAX_DAYS, refresh_seconds: float = ROLLUP_REFRESH_SECONDS):
+        self.model = model
+        self.retention_days = retention_days
+        self.refresh_seconds = refresh_seconds
+        self.high_water: Optional[int] = None
+        self._last_seen: Dict[int, int] = {}
+        # (-created_at, product_id) pairs sorted so a window is a prefix
+        self._ordered: List[Tuple[int, int]] = []
+        self._refreshed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def refresh(self, db: Session, force: bool = False):
+        """Fold in rows created since the high-water mark and drop expired products"""
+        if not force and self._fresh(time.monotonic()):
+            return
+        with self._lock:
+            # Another request may have refreshed while this one waited
+            if not force and self._fresh(time.monotonic()):
+                return
+            cutoff = int(time.time()) - self.retention_days * 24 * 60 * 60
+            # >= so rows committed later within the high-water second are not missed
+            since = cutoff if self.high_water is None else max(self.high_water, cutoff)
+            rows = (
+                db.query(self.model.product_id, func.max(self.model.created_at))
+                .filter(self.model.created_at >= since)
+                .group_by(self.model.product_id)
+                .all()
+            )
+            changed = False
+            for product_id, created_at in rows:
+                if created_at > self._last_seen.get(product_id, -1):
+                    self._last_seen[product_id] = created_at
+                    changed = True
+                if self.high_water is None or created_at > self.high_water:
+                    self.high_water = created_at
+            if self.high_water is None:
+                self.high_water = cutoff
+            for product_id in [pid for pid, seen in self._last_seen.items() if seen < cutoff]:
+                del self._last_seen[product_id]
+                changed = True
+            if changed:
+                self._ordered = sorted((-seen, product_id) for product_id, seen in self._last_seen.items())
+            self._refreshed_at = time.monotonic()
+
+    def _fresh(self, now: float) -> bool:
+        return self._refreshed_at is not None and now - self._refreshed_at < self.refresh_seconds
+
+    def product_ids(self, db: Session, days: int) -> List[int]:
+        """Products with activity in the last ``days`` days, most recent first"""
+        self.refresh(db)
+        since = int(time.time()) - days * 24 * 60 * 60
+        ordered = self._ordered
+        end = bisect.bisect_right(ordered, (-since, float("inf")))
+        return [product_id for _, product_id in ordered[:end]]
+
+
+class BestSellerRollup:
+    """Top seller of each manufacturer among listed products with sales"""
+
+    def __init__(self, rebuild_seconds: float = BEST_SELLERS_REBUILD_SECONDS, refresh_seconds: float = ROLLUP_REFRESH_SECONDS):
+        self.rebuild_seconds = rebuild_seconds
+        self.refresh_seconds = refresh_seconds
+        self.high_water: Optional[int] = None
+        # manufacturer_key -> (sales, product_id) of its leader
+        self._leaders: Dict[str, Tuple[int, int]] = {}
+        self._built_at: Optional[float] = None
+        self._refreshed_at: Optional[float] = None
+        self._lock = threading.Lock()
+        # Serializes refreshes so concurrent cold requests run one build; readers keep using _lock
+        self._refresh_lock = threading.Lock()
+
+    def build(self, db: Session):
+        leaders = {
+            manufacturer_key(manufacturer): (sales, product_id)
+            for product_id, manufacturer, sales in db.execute(BEST_SELLERS_QUERY)
+        }
+        high_water = db.query(func.max(models.Product.date_modify)).scalar()
+        with self._lock:
+            self._leaders = leaders
+            self.high_water = high_water
+            self._built_at = self._refreshed_at = time.monotonic()
+        print(f"Best-seller rollup built with {len(leaders)} manufacturers")
+
+    def refresh(self, db: Session):
+        """Rebuild when stale, otherwise fold in products modified since the high-water mark"""
+        if self._fresh(time.monotonic()):
+            return
+        with self._refresh_lock:
+            # Another request may have refreshed while this one waited
+            now = time.monotonic()
+            if self._fresh(now):
+                return
+            if self._built_at is None or now - self._built_at >= self.rebuild_seconds:
+                self.build(db)
+                return
+            if self.high_water is None:
+                self._refreshed_at = now
+                return
+            changed = (
+                db.query(models.Product)
+                .filter(models.Product.date_modify >= self.high_water)
+                .all()
+            )
+            for product in changed:
+                self.upsert(product, db)
+                if product.date_modify > self.high_water:
+                    self.high_water = product.date_modify
+            self._refreshed_at = now
+
+    def _fresh(self, now: float) -> bool:
+        return (
+            self._built_at is not None
+            and now - self._built_at < self.rebuild_seconds
+            and now - self._refreshed_at < self.refresh_seconds
+        )
+
+    def upsert(self, product, db: Session):
+        """Re-rank a created or updated product"""
+        if self._built_at is None:
+            return
+        with self._lock:
+            stale = [m for m, (_, pid) in self._leaders.items() if pid == product.product_id]
+            manufacturer = manufacturer_key(product.c_manufacturer) if product.c_manufacturer else None
+            if is_listed(product) and (product.sales or 0) > 0 and manufacturer:
+                candidate = (product.sales, product.product_id)
+                leader = self._leaders.get(manufacturer)
+                if leader is None or (-candidate[0], candidate[1]) < (-leader[0], leader[1]):
+                    self._leaders[manufacturer] = candidate
+                    stale = [m for m in stale if m != manufacturer]
+        for manufacturer in stale:
+            self._recompute(db, manufacturer)
+
+    def remove(self, product_id: int, db: Session):
+        """Forget a deleted product, promoting the next seller of its manufacturer"""
+        if self._built_at is None:
+            return
+        with self._lock:
+            stale = [m for m, (_, pid) in self._leaders.items() if pid == product_id]
+        for manufacturer in stale:
+            self._recompute(db, manufacturer)
+
+    def _recompute(self, db: Session, manufacturer: str):
+        row = (
+            db.query(models.Product.sales, models.Product.product_id)
+            .filter(
+                and_(
+                    models.Product.inactive == 0,
+                    models.Product.show_in_store == 1,
+                    models.Product.if_sellable == 1,
+                    models.Product.sales > 0,
+                    func.lower(models.Product.c_manufacturer) == manufacturer
+                )
+            )
+            .order_by(models.Product.sales.desc(), models.Product.product_id)
+            .first()
+        )
+        with self._lock:
+            if row is None:
+                self._leaders.pop(manufacturer, None)
+            else:
+                self._leaders[manufacturer] = (row.sales, row.product_id)
+
+    def product_ids(self, db: Session) -> List[int]:
+        """Leader of each manufacturer, best selling first"""
+        self.refresh(db)
+        with self._lock:
+            leaders = sorted(self._leaders.values(), key=lambda leader: (-leader[0], leader[1]))
+        return [product_id for _, product_id in leaders]
+
+
+recent_purchases = RecentActivityRollup(models.OrderProduct)
+recent_shipments = RecentActivityRollup(models.ShipmentProduct)
+best_seller_rollup = BestSellerRollup()
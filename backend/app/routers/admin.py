@@ -0,0 +1,87 @@
+import hmac
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+
+from app.chat_intents import chat_route_stats
+from app.llm_client import chat_completion_client
+from app.routers.llm import system_prompt_cache
+from app.slow_queries import slow_query_log
+from app.sql_translation_cache import sql_translation_cache
+
+# Key expected in the X-Admin-Key header; the admin endpoints are disabled while it is unset
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+
+def require_admin_key(x_admin_key: Optional[str] = Header(None)):
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if x_admin_key is None or not hmac.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin_key)]
+)
+
+@router.get("/slow-queries", response_model=dict)
+def get_slow_queries(limit: int = Query(50, ge=1, le=1000, description="Number of entries to return, newest first")):
+    """
+    Recent SQL statements slower than the threshold (SLOW_QUERY_THRESHOLD_MS),
+    with the request path that issued them and their EXPLAIN plan. Bound
+    parameter values are redacted unless SLOW_QUERY_LOG_PARAMETERS=1. ``plan`` stays null for a moment while the plan is being captured.
+    """
+    return {
+        "threshold_ms": slow_query_log.threshold_ms,
+        "capacity": slow_query_log.size,
+        "recorded": slow_query_log.recorded,
+        "queries": slow_query_log.entries(limit)
+    }
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+def clear_slow_queries():
+    """
+    Empty the slow query log
+    """
+    slow_query_log.clear()
+
+@router.put("/slow-queries/threshold", response_model=dict)
+def set_slow_query_threshold(ms: float = Query(..., ge=0, description="New threshold in milliseconds")):
+    """
+    Change the slow query threshold until the next restart
+    """
+    slow_query_log.threshold_ms = ms
+    return {"threshold_ms": slow_query_log.threshold_ms}
+
+@router.get("/sql-translations", response_model=dict)
+def get_sql_translation_stats():
+    """
+    Size, TTL and per-tier hit rates of the chat NL-to-SQL translation cache
+    """
+    return sql_translation_cache.stats()
+
+@router.delete("/sql-translations", status_code=status.HTTP_204_NO_CONTENT)
+def clear_sql_translations():
+    """
+    Forget every cached translation and re-introspect the product schema for
+    the chat prompt, e.g. after a migration
+    """
+    system_prompt_cache.invalidate()
+    sql_translation_cache.clear()
+
+@router.get("/llm", response_model=dict)
+def get_llm_client_stats():
+    """
+    Circuit breaker state, in-flight calls and limits of the OpenAI client
+    """
+    return chat_completion_client.stats()
+
+@router.get("/chat-routing", response_model=dict)
+def get_chat_routing_stats():
+    """
+    How chat messages got their SQL (rule-based fast path, translation cache,
+    OpenAI or keyword fallback), the fast-path share and the estimated time saved
+    by not calling OpenAI for fast-path messages
+    """
+    return chat_route_stats.stats()
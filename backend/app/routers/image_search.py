@@ -1,9 +1,17 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
+import hashlib
+import queue
+import threading
 import numpy as np
 from PIL import Image
 import requests
 import math
-from app.database import db_manager
+from app.change_feed import UPSERT, catalog_change_feed
+from app.database import DatabaseManager, db_manager
+from app.metrics import track
+from app.single_flight import AsyncSingleFlight
+from app import models
 import io
 from sklearn.metrics.pairwise import cosine_similarity
 import torch
@@ -15,12 +23,26 @@ router = APIRouter(
 )
 
 product_info = []
+# image_id -> row of product_info / image_features, and product_id -> its image_ids
+image_positions = {}
+product_images = {}
 data_loaded = False
 tfidf_vectorizer = None
 product_features = None
 image_features = None
 model = None
 preprocess = None
+# Identical uploads in flight together share one ResNet pass and similarity scan
+image_match_flights = AsyncSingleFlight()
+# image_features and product_info are published together under this lock and never
+# modified once published, so a match reads a consistent pair without holding it
+image_index_lock = threading.Lock()
+# Change feed batches waiting for the refresh worker, which downloads images and
+# runs ResNet so the feed thread and its other subscribers are never held up
+pending_image_changes = queue.Queue()
+image_refresh_worker = None
+# Share of tombstoned rows at which a refresh compacts the feature matrix
+COMPACT_TOMBSTONE_FRACTION = 0.25
 
 def clean_value(value):
     """Clean a value to make it JSON-compliant"""
@@ -83,7 +105,7 @@ def extract_image_features(image_data):
         input_tensor = preprocess(image)
         input_batch = input_tensor.unsqueeze(0)
         
-        with torch.no_grad():
+        with track("resnet_feature_extraction"), torch.no_grad():
             features = model.forward(input_batch)
             features = features.squeeze().cpu().numpy()
         
@@ -93,13 +115,14 @@ def extract_image_features(image_data):
 
 def find_similar_images(query_features):
     """Find all exact similar images based on feature similarity"""
-    global image_features, product_info
+    with image_index_lock:
+        features, info = image_features, product_info
     
-    if image_features is None or query_features is None:
+    if features is None or query_features is None:
         return []
     
     try:
-        similarities = cosine_similarity([query_features], image_features).flatten()
+        similarities = cosine_similarity([query_features], features).flatten()
         
         sorted_indices = similarities.argsort()[::-1]
         
@@ -109,7 +132,9 @@ def find_similar_images(query_features):
         for idx in sorted_indices:
             similarity_score = similarities[idx]
             if similarity_score > 0.8:
-                product = product_info[idx]
+                product = info[idx]
+                if product is None:
+                    continue
                 product_id = product['product_id']
                 
                 if product_id not in best_scores or similarity_score > best_scores[product_id]:
@@ -119,7 +144,7 @@ def find_similar_images(query_features):
         results = []
         for product_id, best_score in best_scores.items():
             best_idx = best_indices[product_id]
-            product = product_info[best_idx]
+            product = info[best_idx]
             results.append({
                 'score': round(float(best_score), 3),
                 'product_id': product_id,
@@ -135,9 +160,56 @@ def find_similar_images(query_features):
     except Exception as e:
         return []
 
+def match_image(image_data):
+    """Matches for an uploaded image, or None if it cannot be processed"""
+    query_features = extract_image_features(image_data)
+    if query_features is None:
+        return None
+    return find_similar_images(query_features)
+
+def product_entry(product_data):
+    """product_info entry for one row of db_manager.get_products_with_images"""
+    return {
+        "image_id": product_data['image_id'],
+        "product_id": product_data['product_id'],
+        "product_name": product_data['product_name'],
+        "description": product_data['description'],
+        "price": product_data['price'],
+        "category": product_data['category'],
+        "brand": product_data['brand'],
+        "type": product_data['type'],
+        "c_product_group": product_data['c_product_group'],
+        "if_featured": product_data['if_featured'],
+        "if_sellable": product_data['if_sellable'],
+        "show_in_store": product_data['show_in_store'],
+        "status": product_data['status'],
+        "sku_name": product_data['sku_name'],
+        "w_description": product_data['w_description'],
+        "w_oem": product_data['w_oem'],
+        "w_weight": product_data['w_weight'],
+        "w_height": product_data['w_height'],
+        "w_width": product_data['w_width'],
+        "w_depth": product_data['w_depth'],
+        "sales": product_data['sales'],
+        "date_added": product_data['date_added'],
+        "image_path": product_data['image_path'],
+        "image_name": product_data['image_name'],
+        "image_sort": product_data['image_sort']
+    }
+
+def index_positions(entries):
+    """image_positions and product_images for a product_info list"""
+    positions = {}
+    images = {}
+    for position, entry in enumerate(entries):
+        if entry is not None:
+            positions[entry["image_id"]] = position
+            images.setdefault(entry["product_id"], set()).add(entry["image_id"])
+    return positions, images
+
 def load_database_data():
     """Load data from MySQL database and create search index using DB-stored features"""
-    global product_info, data_loaded, image_features
+    global product_info, data_loaded, image_features, image_positions, product_images
     try:
         if not db_manager.connect():
             data_loaded = False
@@ -183,7 +255,7 @@ def load_database_data():
                         })
                         print(f"Fallback: Extracted features for image_id: {image_id}")
         
-        product_info = []
+        entries = []
         image_features_list = []
         seen_product_ids = set()
         
@@ -192,44 +264,19 @@ def load_database_data():
             
             product_data = image_to_product.get(image_id)
             if product_data:
-                product_info.append({
-                    "image_id": image_id,
-                    "product_id": product_data['product_id'],
-                    "product_name": product_data['product_name'],
-                    "description": product_data['description'],
-                    "price": product_data['price'],
-                    "category": product_data['category'],
-                    "brand": product_data['brand'],
-                    "type": product_data['type'],
-                    "c_product_group": product_data['c_product_group'],
-                    "if_featured": product_data['if_featured'],
-                    "if_sellable": product_data['if_sellable'],
-                    "show_in_store": product_data['show_in_store'],
-                    "status": product_data['status'],
-                    "sku_name": product_data['sku_name'],
-                    "w_description": product_data['w_description'],
-                    "w_oem": product_data['w_oem'],
-                    "w_weight": product_data['w_weight'],
-                    "w_height": product_data['w_height'],
-                    "w_width": product_data['w_width'],
-                    "w_depth": product_data['w_depth'],
-                    "sales": product_data['sales'],
-                    "date_added": product_data['date_added'],
-                    "image_path": product_data['image_path'],
-                    "image_name": product_data['image_name'],
-                    "image_sort": product_data['image_sort']
-                })
+                entries.append(product_entry(product_data))
                 image_features_list.append(rec["features"])
                 seen_product_ids.add(product_data['product_id'])  # Debug: track unique products
             else:
                 print(f"Warning: No product data found for image_id: {image_id}")
         
-        if image_features_list:
-            image_features = np.stack(image_features_list)
-            data_loaded = True
-        else:
-            image_features = None
-            data_loaded = False
+        positions, images = index_positions(entries)
+        features = np.stack(image_features_list) if image_features_list else None
+        with image_index_lock:
+            product_info, image_features = entries, features
+            image_positions, product_images = positions, images
+            data_loaded = features is not None
+        if features is None:
             print("No image features loaded")
             
     except Exception as e:
@@ -238,6 +285,113 @@ def load_database_data():
         traceback.print_exc()
         data_loaded = False
 
+def apply_catalog_changes(events, db):
+    """
+    Change feed subscriber: queue the changed products, images and stored
+    features for the refresh worker. Downloading and feature extraction can take
+    seconds, so none of it runs on the feed thread.
+    """
+    global image_refresh_worker
+    if not data_loaded:
+        return
+    # Event rows are only valid during this call, so only the keys are queued
+    pending_image_changes.put([(event.table, event.kind, event.key) for event in events])
+    if image_refresh_worker is None or not image_refresh_worker.is_alive():
+        image_refresh_worker = threading.Thread(target=refresh_images_forever, name="image-feature-refresh", daemon=True)
+        image_refresh_worker.start()
+
+def refresh_images_forever():
+    while True:
+        changes = pending_image_changes.get()
+        # Fold in batches that queued up meanwhile, so a burst costs one pass
+        while True:
+            try:
+                changes.extend(pending_image_changes.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            refresh_images(changes)
+        except Exception as e:
+            print(f"Image feature refresh failed: {e}")
+
+def refresh_images(changes):
+    """
+    Refresh the product_info entries and feature rows of the images whose
+    product, image row or stored features changed, on a session of its own
+    """
+    store = DatabaseManager()
+    if not store.connect():
+        return
+    try:
+        touched = set()
+        for table, kind, key in changes:
+            if table == "product":
+                touched.update(product_images.get(key, ()))
+                if kind == UPSERT:
+                    touched.update(
+                        image_id for (image_id,) in
+                        store.session.query(models.ProductImage.image_id).filter(models.ProductImage.product_id == key)
+                    )
+            else:
+                touched.add(key)
+        if not touched:
+            return
+
+        rows = {row['image_id']: row for row in store.get_products_with_images(image_ids=touched)}
+        features = {rec['image_id']: rec['features'] for rec in store.get_all_image_features(image_ids=rows)} if rows else {}
+        for image_id, row in rows.items():
+            if image_id not in features:
+                image_data = download_image_from_url(row['image_path'])
+                extracted = extract_image_features(image_data) if image_data else None
+                if extracted is not None:
+                    store.save_image_features(image_id, extracted)
+                    features[image_id] = extracted
+        publish_image_changes(touched, rows, features)
+    finally:
+        store.disconnect()
+
+def publish_image_changes(touched, rows, features):
+    """
+    Build the next product_info and feature matrix and swap them in. Published
+    ones are never written, so a changed image's old row is tombstoned (its entry
+    set to None, which matching skips) and the image is appended again. The
+    matrix is compacted once COMPACT_TOMBSTONE_FRACTION of it is tombstones.
+    Only the refresh worker writes image_positions and product_images after the
+    initial load.
+    """
+    global product_info, image_features, image_positions, product_images
+    entries = list(product_info)
+    appended_entries = []
+    appended_features = []
+    for image_id in touched:
+        position = image_positions.pop(image_id, None)
+        if position is not None:
+            product_images.get(entries[position]["product_id"], set()).discard(image_id)
+            entries[position] = None
+        if image_id in rows and image_id in features:
+            appended_entries.append(product_entry(rows[image_id]))
+            appended_features.append(features[image_id])
+
+    matrix = image_features
+    if appended_entries:
+        start = len(entries)
+        matrix = np.vstack([matrix, np.stack(appended_features)])
+        entries.extend(appended_entries)
+        for offset, entry in enumerate(appended_entries):
+            image_positions[entry["image_id"]] = start + offset
+            product_images.setdefault(entry["product_id"], set()).add(entry["image_id"])
+
+    kept = [position for position, entry in enumerate(entries) if entry is not None]
+    if len(entries) - len(kept) > COMPACT_TOMBSTONE_FRACTION * len(entries):
+        entries = [entries[position] for position in kept]
+        matrix = matrix[kept]
+        image_positions, product_images = index_positions(entries)
+
+    with image_index_lock:
+        product_info, image_features = entries, matrix
+
+catalog_change_feed.subscribe(apply_catalog_changes)
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
@@ -255,19 +409,19 @@ async def upload_file(file: UploadFile = File(...)):
     
     try:
         content = await file.read()
+        image_hash = hashlib.sha256(content).hexdigest()
         
-        query_features = extract_image_features(content)
+        results = await image_match_flights.do(image_hash, lambda: run_in_threadpool(match_image, content))
         
-        if query_features is None:
+        if results is None:
             raise HTTPException(status_code=400, detail="Could not process uploaded image")
         
-        results = find_similar_images(query_features)
-        
         products_with_scores = []
+        entries = product_info
         for result in results:
             product_data = None
-            for product in product_info:
-                if product['product_id'] == result['product_id']:
+            for product in entries:
+                if product is not None and product['product_id'] == result['product_id']:
                     product_data = product
                     break
             
@@ -314,7 +468,7 @@ async def upload_file(file: UploadFile = File(...)):
                 })
         
         return {
-            'image_hash': 'generated_hash',
+            'image_hash': image_hash,
             'search_type': 'exact_image_match',
             'threshold': 0.8,
             'products': products_with_scores,
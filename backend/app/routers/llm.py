@@ -1,19 +1,31 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 from sqlalchemy import text, inspect
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional, Dict, Any
-import openai
 import os
 import json
 import re
+import threading
+import time
 from decimal import Decimal
 
-from app.database import get_db
+from app.chat_intents import (
+    FALLBACK, FAST_PATH, LLM, TRANSLATION_CACHE, chat_route_stats, intent_router, render_statement
+)
+from app.database import SessionLocal, get_db
+from app.llm_client import chat_completion_client
 from app.models import Product
 from app.schemas import Product as ProductSchema
+from app.sql_translation_cache import sql_translation_cache
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# Seconds between checks that the product columns behind the cached system prompt are unchanged
+SCHEMA_CHECK_SECONDS = 300
+
+# Products per ``products`` event of /chat/stream
+CHAT_STREAM_CHUNK_SIZE = 10
 
 router = APIRouter()
 
@@ -43,13 +55,8 @@ def get_table_schema(db: Session) -> str:
     
     return schema_info
 
-def generate_sql_with_llm(user_message: str, db: Session) -> str:
-    """Use OpenAI to generate SQL query from user message"""
-    
-    # Get table schema for context
-    schema_info = get_table_schema(db)
-    
-    system_prompt = f"""
+# Chat system prompt; SystemPromptCache fills in {schema_info} once
+SYSTEM_PROMPT_TEMPLATE = """
     You are a SQL query generator for a product database. Generate safe, read-only SELECT queries based on user requests.
     
     {schema_info}
@@ -95,9 +102,70 @@ def generate_sql_with_llm(user_message: str, db: Session) -> str:
     
     Return ONLY the SQL query, no explanation or markdown formatting.
     """
+
+class SystemPromptCache:
+    """
+    The full system prompt, rendered once from the introspected product schema.
+    Every SCHEMA_CHECK_SECONDS a ``LIMIT 0`` select compares the product column
+    names with the ones rendered; the prompt is rebuilt when they differ or
+    after ``invalidate``.
+    """
+
+    def __init__(self, check_seconds: float = SCHEMA_CHECK_SECONDS):
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._prompt: Optional[str] = None
+        self._columns: Optional[tuple] = None
+        self._checked_at = 0.0
+
+    def get(self, db: Session) -> str:
+        if self._prompt is not None and time.monotonic() - self._checked_at < self.check_seconds:
+            return self._prompt
+        with self._lock:
+            if self._prompt is None or time.monotonic() - self._checked_at >= self.check_seconds:
+                self._refresh(db)
+            return self._prompt
+
+    def _refresh(self, db: Session):
+        columns = tuple(db.execute(text(f"SELECT * FROM {Product.__tablename__} LIMIT 0")).keys())
+        if self._prompt is None or columns != self._columns:
+            if self._columns is not None and columns != self._columns:
+                # SQL generated against the old columns may no longer run
+                sql_translation_cache.clear()
+            self._prompt = SYSTEM_PROMPT_TEMPLATE.format(schema_info=get_table_schema(db))
+            self._columns = columns
+        self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        """Re-introspect the schema on the next request"""
+        with self._lock:
+            self._prompt = None
+
+system_prompt_cache = SystemPromptCache()
+
+def warm_system_prompt(session_factory):
+    """Render the system prompt at startup so the first chat request does not introspect"""
+    try:
+        with session_factory() as db:
+            system_prompt_cache.get(db)
+    except Exception as e:
+        print(f"Error rendering chat system prompt: {e}")
+
+async def generate_sql_with_llm(user_message: str, db: Session) -> str:
+    """Use OpenAI to generate SQL query from user message, or reuse a cached translation"""
+    
+    start = time.perf_counter()
+    cached_sql = await run_in_threadpool(sql_translation_cache.get, user_message)
+    if cached_sql is not None:
+        chat_route_stats.record(TRANSLATION_CACHE, time.perf_counter() - start)
+        return cached_sql
+    
+    # Rendered once and reused until the product columns change
+    system_prompt = await run_in_threadpool(system_prompt_cache.get, db)
     
     try:
-        response = openai.ChatCompletion.create(
+        # Raises LLMUnavailable on timeout, saturation or an open breaker, without waiting
+        sql_query = await chat_completion_client.complete(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -106,8 +174,7 @@ def generate_sql_with_llm(user_message: str, db: Session) -> str:
             temperature=0.1,
             max_tokens=300
         )
-        
-        sql_query = response.choices[0].message.content.strip()
+        sql_query = sql_query.strip()
         
         # Clean up the response
         sql_query = sql_query.replace("```sql", "").replace("```", "").strip()
@@ -120,13 +187,33 @@ def generate_sql_with_llm(user_message: str, db: Session) -> str:
         if 'LIMIT' not in sql_query.upper():
             sql_query += ' LIMIT 50'
         
+        # Only validated model output is cached; the keyword fallback below is not
+        await run_in_threadpool(sql_translation_cache.put, user_message, sql_query)
+        chat_route_stats.record(LLM, time.perf_counter() - start)
         return sql_query
         
     except Exception as e:
         print(f"SQL generation error: {e}")
         # Fallback to simple query
+        chat_route_stats.record(FALLBACK, time.perf_counter() - start)
         return generate_fallback_sql(user_message)
 
+async def translate_message(user_message: str, db: Session):
+    """
+    (SQL shown to the user, statement to execute) for a chat message. Structured
+    messages are built directly by the intent router; only the rest go to
+    generate_sql_with_llm.
+    """
+    start = time.perf_counter()
+    match = await run_in_threadpool(intent_router.route, user_message, db)
+    if match is not None:
+        sql_query = render_statement(match.statement, db)
+        chat_route_stats.record(FAST_PATH, time.perf_counter() - start)
+        return sql_query, match.statement
+    
+    sql_query = await generate_sql_with_llm(user_message, db)
+    return sql_query, text(sql_query)
+
 def generate_fallback_sql(user_message: str) -> str:
     """Generate a simple fallback SQL query"""
     # Extract potential keywords
@@ -151,11 +238,26 @@ def extract_keywords_fallback(user_message: str) -> List[str]:
     keywords = [word for word in words if word not in stop_words and len(word) > 2]
     return keywords[:5]
 
-def execute_sql_query(db: Session, sql_query: str) -> List[Dict]:
+def rows_to_dicts(columns, rows) -> List[Dict]:
+    """Convert result rows to dictionaries keyed by column name"""
+    products_data = []
+    for row in rows:
+        product_dict = {}
+        for i, column in enumerate(columns):
+            value = row[i]
+            # Handle Decimal conversion for JSON serialization
+            if isinstance(value, Decimal):
+                value = float(value)
+            product_dict[column] = value
+        products_data.append(product_dict)
+    return products_data
+
+def execute_sql_query(db: Session, sql_query) -> List[Dict]:
     """Execute the generated SQL query safely"""
     try:
         # Execute the query
-        result = db.execute(text(sql_query))
+        # Raw SQL from the model, or a statement built by the intent router
+        result = db.execute(text(sql_query) if isinstance(sql_query, str) else sql_query)
         
         # Get column names
         columns = result.keys()
@@ -163,19 +265,7 @@ def execute_sql_query(db: Session, sql_query: str) -> List[Dict]:
         # Fetch all rows and convert to dict
         rows = result.fetchall()
         
-        # Convert rows to list of dictionaries
-        products_data = []
-        for row in rows:
-            product_dict = {}
-            for i, column in enumerate(columns):
-                value = row[i]
-                # Handle Decimal conversion for JSON serialization
-                if isinstance(value, Decimal):
-                    value = float(value)
-                product_dict[column] = value
-            products_data.append(product_dict)
-        
-        return products_data
+        return rows_to_dicts(columns, rows)
         
     except Exception as e:
         print(f"SQL execution error: {e}")
@@ -234,16 +324,17 @@ def generate_ai_response_from_sql(user_message: str, sql_query: str, products_da
     return response
 
 @router.post("/chat", response_model=ChatResponse)
-def chat_with_bot(request: ChatRequest, db: Session = Depends(get_db)):
+async def chat_with_bot(request: ChatRequest, db: Session = Depends(get_db)):
     """
-    Enhanced chat endpoint with OpenAI-generated SQL queries
+    Enhanced chat endpoint with OpenAI-generated SQL queries.
+    The OpenAI call is awaited on the event loop; database work runs in the threadpool.
     """
     try:
-        # Generate SQL query using OpenAI
-        sql_query = generate_sql_with_llm(request.message, db)
+        # Build structured requests directly, otherwise generate SQL using OpenAI
+        sql_query, statement = await translate_message(request.message, db)
         
         # Execute the SQL query
-        products_data = execute_sql_query(db, sql_query)
+        products_data = await run_in_threadpool(execute_sql_query, db, statement)
         
         # Convert to Product objects for response schema
         products = convert_to_product_objects(products_data)
@@ -263,4 +354,67 @@ def chat_with_bot(request: ChatRequest, db: Session = Depends(get_db)):
         raise
     except Exception as e:
         print(f"Chat error: {e}")
-        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+
+def sse_event(event: str, data) -> str:
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def chat_event_stream(message: str):
+    """
+    Events of /chat/stream. Rows are fetched CHAT_STREAM_CHUNK_SIZE at a time
+    from a streamed result, so the first products go out before the rest are read.
+    """
+    # Not the request's get_db session: that one is closed before a streamed body is sent
+    db = SessionLocal()
+    try:
+        sql_query, statement = await translate_message(message, db)
+        yield sse_event("sql", {"user_message": message, "generated_sql": sql_query})
+
+        try:
+            result = await run_in_threadpool(
+                db.execute, statement.execution_options(stream_results=True)
+            )
+        except Exception as e:
+            print(f"SQL execution error: {e}")
+            yield sse_event("error", {"detail": f"SQL execution failed: {str(e)}"})
+            return
+        columns = list(result.keys())
+
+        products_data = []
+        while True:
+            rows = await run_in_threadpool(result.fetchmany, CHAT_STREAM_CHUNK_SIZE)
+            if not rows:
+                break
+            chunk = rows_to_dicts(columns, rows)
+            products_data.extend(chunk)
+            products = [
+                ProductSchema.model_validate(product).model_dump(mode="json")
+                for product in convert_to_product_objects(chunk)
+            ]
+            yield sse_event("products", products)
+
+        yield sse_event("summary", {
+            "total_count": len(products_data),
+            "ai_response": generate_ai_response_from_sql(message, sql_query, products_data)
+        })
+    except Exception as e:
+        print(f"Chat stream error: {e}")
+        yield sse_event("error", {"detail": f"Search error: {str(e)}"})
+    finally:
+        await run_in_threadpool(db.close)
+
+@router.post("/chat/stream")
+async def chat_with_bot_stream(request: ChatRequest):
+    """
+    Streaming variant of /chat as server-sent events, in order:
+    ``sql`` with the generated query, ``products`` with up to CHAT_STREAM_CHUNK_SIZE
+    products each as rows are fetched, and ``summary`` with the total count and
+    answer text. A failure ends the stream with an ``error`` event.
+    """
+    return StreamingResponse(
+        chat_event_stream(request.message),
+        media_type="text/event-stream",
+        # Disable proxy buffering so each event is delivered as soon as it is written
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,13 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, not_, func, desc
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, noload, selectinload
+from sqlalchemy import or_, and_, not_, func, desc, text
 from typing import List, Optional
 from decimal import Decimal
-import re
 from app import models, schemas
 from app.database import SessionLocal
+from app.change_feed import UPSERT, ChangeEvent, catalog_change_feed
+from app.columnar import catalog_snapshot
+from app.http_cache import (
+    body_etag,
+    cache_headers,
+    catalog_fingerprint,
+    catalog_version,
+    make_etag,
+    not_modified,
+    with_cache_headers,
+)
+from app.query_parser import compile_logical_query, normalize_query
+from app.query_planner import contains_predicate, distinct_values
+from app.relevance import product_relevance_index, relevance_terms
+from app.result_cache import result_cache
+from app.rollups import ROLLUP_MAX_DAYS, best_seller_rollup, recent_purchases, recent_shipments
+from app.search_index import product_prefix_index, product_text_index
+from app.serialization import PRODUCT_COLUMNS, ProductJSONResponse, id_batches, serialize_product_rows
 import time
 from datetime import datetime, timedelta
+from itertools import islice
 
 router = APIRouter(
     prefix="/products",
@@ -25,190 +44,96 @@ def format_timestamp(timestamp: int) -> str:
     """Format Unix timestamp to human-readable date"""
     return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
 
+def index_product_change(db: Session, product=None, product_id: Optional[int] = None):
+    """
+    Apply one created, updated (``product``) or deleted (``product_id``) product
+    to the in-process search structures
+    """
+    if product is not None:
+        product_text_index.upsert(product)
+        product_prefix_index.upsert(product)
+        product_relevance_index.upsert(product)
+        catalog_snapshot.upsert(product)
+        distinct_values.upsert(product)
+        best_seller_rollup.upsert(product, db)
+    elif product_id is not None:
+        product_text_index.remove(product_id)
+        product_prefix_index.remove(product_id)
+        product_relevance_index.remove(product_id)
+        catalog_snapshot.remove(product_id)
+        best_seller_rollup.remove(product_id, db)
+
+def notify_catalog_change(db: Session, product=None, product_id: Optional[int] = None):
+    """
+    Propagate a product write to the in-process search structures and caches
+    """
+    index_product_change(db, product, product_id)
+    result_cache.invalidate()
+    catalog_version.bump()
+
+def apply_catalog_changes(events: List[ChangeEvent], db: Session):
+    """
+    Change feed subscriber: fold product rows changed outside the API into the
+    search structures, and drop cached results when products or images changed
+    """
+    for event in events:
+        if event.table != "product":
+            continue
+        if event.kind == UPSERT:
+            index_product_change(db, product=event.row)
+        else:
+            index_product_change(db, product_id=event.key)
+    if any(event.table in ("product", "product_image") for event in events):
+        result_cache.invalidate()
+        catalog_version.bump()
+
+catalog_change_feed.subscribe(apply_catalog_changes)
+
+def search_cache_key(
+    namespace: str,
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+    manufacturer: Optional[str] = None,
+    type: Optional[str] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None
+) -> tuple:
+    """
+    Result cache key for the /products/search filter parameters. Queries are
+    compared the way they are evaluated: search text through normalize_query,
+    the ILIKE filters case-insensitively.
+    """
+    return (
+        namespace,
+        normalize_query(search) if search else None,
+        category.lower() if category else None,
+        manufacturer.lower() if manufacturer else None,
+        type.lower() if type else None,
+        min_price,
+        max_price
+    )
+
 def parse_logical_query(query: str) -> dict:
     """
-     Parse logical query string and return structured filter conditions.
-    Supports the following logical operators:
+    Parse a logical query string into a filter plan.
+    Supports arbitrary AND / OR / NOT / IN expressions with parentheses, for example:
     - SKU1 only: sku='SKU1'
-    - SKU1 AND SKU2: sku IN ('SKU1','SKU2')
+    - SKU1 AND SKU2 AND SKU3: sku IN ('SKU1','SKU2','SKU3')
     - SKU1 OR SKU2: sku='SKU1' OR sku='SKU2'
     - SKU1 in ManufacturerX: sku='SKU1' AND manufacturer='ManufacturerX'
     - SKU1 not in ManufacturerX: sku='SKU1' AND manufacturer!='ManufacturerX'
-    - SKU1 AND SKU2 in ManufacturerX: sku IN ('SKU1','SKU2') AND manufacturer='ManufacturerX'
     - SKU1 OR SKU2 in ManufacturerX: (sku='SKU1' OR sku='SKU2') AND manufacturer='ManufacturerX'
-    - SKU1 AND SKU2 not in ManufacturerX: sku IN ('SKU1','SKU2') AND manufacturer!='ManufacturerX'
-    - SKU1 OR SKU2 not in ManufacturerX: (sku='SKU1' OR sku='SKU2') AND manufacturer!='ManufacturerX'
     - SKU1 in ManufacturerX OR SKU2 in ManufacturerY: (sku='SKU1' AND manufacturer='X') OR (sku='SKU2' AND manufacturer='Y')
     - SKU1, Manufacturer IN (X,Y): sku='SKU1' AND manufacturer IN ('X','Y')
     - SKU1, Manufacturer NOT IN (X,Y): sku='SKU1' AND manufacturer NOT IN ('X','Y')
     - NOT SKU1: sku!='SKU1'
     - NOT (SKU1 or SKU2): sku NOT IN ('SKU1','SKU2')
-    - NOT (SKU1 AND ManufacturerX): NOT (sku='SKU1' AND manufacturer='ManufacturerX')
+    - NOT (SKU1 in ManufacturerX): NOT (sku='SKU1' AND manufacturer='ManufacturerX')
+    - (SKU1 OR SKU2) AND NOT (SKU3 in X), Category IN (Server): nesting to any depth
+    See app/query_parser.py for the grammar. Plans are memoized on the normalized
+    query, so repeated searches cost a dictionary lookup.
     """
-    
-    result = {
-        'sku_conditions': [],
-        'manufacturer_conditions': [],
-        'logical_operator': 'AND',
-        'negation': False,
-        'negation_type': None
-    }
-    
-    original_query = query.strip()
-    query = query.strip().upper()
-    
-    if query.startswith('NOT '):
-        result['negation'] = True
-        query = query[4:].strip()
-        
-        if query.startswith('(') and query.endswith(')'):
-            query = query[1:-1].strip()
-            
-            if ' OR ' in query and ' AND ' not in query:
-                result['negation_type'] = 'or'
-            elif ' AND ' in query and ' IN ' in query:
-                result['negation_type'] = 'and'
-            elif ' OR ' not in query and ' AND ' not in query:
-                result['negation_type'] = 'simple'
-        else:
-            result['negation_type'] = 'simple'
-    
-    # Pattern 1: SKU1 only (and Pattern 13: NOT SKU1)
-    if re.match(r'^[A-Z0-9_-]+$', query):
-        if result['negation'] and result['negation_type'] == 'simple':
-            result['sku_conditions'] = [{'operator': '!=', 'values': [query]}]
-        else:
-            result['sku_conditions'] = [{'operator': '=', 'values': [query]}]
-        return result
-    
-    # Pattern 2: SKU1 AND SKU2 (handles both regular and negated)
-    if ' AND ' in query and ' IN ' not in query and ' NOT ' not in query:
-        skus = [sku.strip() for sku in query.split(' AND ')]
-        if all(re.match(r'^[A-Z0-9_-]+$', sku) for sku in skus):
-            if result['negation'] and result['negation_type'] == 'and':
-                # NOT (SKU1 AND SKU2) becomes NOT IN (SKU1, SKU2)
-                result['sku_conditions'] = [{'operator': 'NOT_IN', 'values': skus}]
-            else:
-                result['sku_conditions'] = [{'operator': 'IN', 'values': skus}]
-            return result
-    
-    # Pattern 3: SKU1 OR SKU2 (and Pattern 14: NOT (SKU1 OR SKU2))
-    if ' OR ' in query and ' IN ' not in query and ' NOT ' not in query:
-        skus = [sku.strip() for sku in query.split(' OR ')]
-        if all(re.match(r'^[A-Z0-9_-]+$', sku) for sku in skus):
-            if result['negation'] and result['negation_type'] == 'or':
-                # NOT (SKU1 OR SKU2) becomes NOT IN (SKU1, SKU2)
-                result['sku_conditions'] = [{'operator': 'NOT_IN', 'values': skus}]
-            else:
-                result['sku_conditions'] = [{'operator': 'OR', 'values': skus}]
-            return result
-    
-    # Pattern 4: SKU1 in ManufacturerX
-    in_match = re.search(r'^([A-Z0-9_-]+)\s+IN\s+([A-Z0-9\s_-]+)$', query)
-    if in_match:
-        sku = in_match.group(1)
-        manufacturer = in_match.group(2).strip()
-        result['sku_conditions'] = [{'operator': '=', 'values': [sku]}]
-        result['manufacturer_conditions'] = [{'operator': '=', 'values': [manufacturer]}]
-        return result
-    
-    # Pattern 5: SKU1 not in ManufacturerX
-    not_in_match = re.search(r'^([A-Z0-9_-]+)\s+NOT\s+IN\s+([A-Z0-9\s_-]+)$', query)
-    if not_in_match:
-        sku = not_in_match.group(1)
-        manufacturer = not_in_match.group(2).strip()
-        result['sku_conditions'] = [{'operator': '=', 'values': [sku]}]
-        result['manufacturer_conditions'] = [{'operator': '!=', 'values': [manufacturer]}]
-        return result
-    
-    # Pattern 6: SKU1 AND SKU2 in ManufacturerX
-    and_in_match = re.search(r'^([A-Z0-9_-]+)\s+AND\s+([A-Z0-9_-]+)\s+IN\s+([A-Z0-9\s_-]+)$', query)
-    if and_in_match:
-        sku1 = and_in_match.group(1)
-        sku2 = and_in_match.group(2)
-        manufacturer = and_in_match.group(3).strip()
-        result['sku_conditions'] = [{'operator': 'IN', 'values': [sku1, sku2]}]
-        result['manufacturer_conditions'] = [{'operator': '=', 'values': [manufacturer]}]
-        return result
-    
-    # Pattern 7: SKU1 OR SKU2 in ManufacturerX
-    or_in_match = re.search(r'^([A-Z0-9_-]+)\s+OR\s+([A-Z0-9_-]+)\s+IN\s+([A-Z0-9\s_-]+)$', query)
-    if or_in_match:
-        sku1 = or_in_match.group(1)
-        sku2 = or_in_match.group(2)
-        manufacturer = or_in_match.group(3).strip()
-        result['sku_conditions'] = [{'operator': 'OR', 'values': [sku1, sku2]}]
-        result['manufacturer_conditions'] = [{'operator': '=', 'values': [manufacturer]}]
-        return result
-    
-    # Pattern 8: SKU1 AND SKU2 not in ManufacturerX
-    and_not_in_match = re.search(r'^([A-Z0-9_-]+)\s+AND\s+([A-Z0-9_-]+)\s+NOT\s+IN\s+([A-Z0-9\s_-]+)$', query)
-    if and_not_in_match:
-        sku1 = and_not_in_match.group(1)
-        sku2 = and_not_in_match.group(2)
-        manufacturer = and_not_in_match.group(3).strip()
-        result['sku_conditions'] = [{'operator': 'IN', 'values': [sku1, sku2]}]
-        result['manufacturer_conditions'] = [{'operator': '!=', 'values': [manufacturer]}]
-        return result
-    
-    # Pattern 9: SKU1 OR SKU2 not in ManufacturerX
-    or_not_in_match = re.search(r'^([A-Z0-9_-]+)\s+OR\s+([A-Z0-9_-]+)\s+NOT\s+IN\s+([A-Z0-9\s_-]+)$', query)
-    if or_not_in_match:
-        sku1 = or_not_in_match.group(1)
-        sku2 = or_not_in_match.group(2)
-        manufacturer = or_not_in_match.group(3).strip()
-        result['sku_conditions'] = [{'operator': 'OR', 'values': [sku1, sku2]}]
-        result['manufacturer_conditions'] = [{'operator': '!=', 'values': [manufacturer]}]
-        return result
-    
-    # Pattern 10: SKU1 in ManufacturerX OR SKU2 in ManufacturerY
-    complex_or_match = re.search(r'^([A-Z0-9_-]+)\s+IN\s+([A-Z0-9\s_-]+)\s+OR\s+([A-Z0-9_-]+)\s+IN\s+([A-Z0-9\s_-]+)$', query)
-    if complex_or_match:
-        result['logical_operator'] = 'OR'
-        result['sku_conditions'] = [
-            {'operator': '=', 'values': [complex_or_match.group(1)]},
-            {'operator': '=', 'values': [complex_or_match.group(3)]}
-        ]
-        result['manufacturer_conditions'] = [
-            {'operator': '=', 'values': [complex_or_match.group(2).strip()]},
-            {'operator': '=', 'values': [complex_or_match.group(4).strip()]}
-        ]
-        return result
-    
-    # Pattern 11: SKU1, Manufacturer IN (X,Y)
-    in_list_match = re.search(r'^([A-Z0-9_-]+),\s*MANUFACTURER\s+IN\s+\(([A-Z0-9\s,_-]+)\)$', query)
-    if in_list_match:
-        sku = in_list_match.group(1)
-        manufacturers = [m.strip() for m in in_list_match.group(2).split(',')]
-        result['sku_conditions'] = [{'operator': '=', 'values': [sku]}]
-        result['manufacturer_conditions'] = [{'operator': 'IN', 'values': manufacturers}]
-        return result
-    
-    # Pattern 12: SKU1, Manufacturer NOT IN (X,Y)
-    not_in_list_match = re.search(r'^([A-Z0-9_-]+),\s*MANUFACTURER\s+NOT\s+IN\s+\(([A-Z0-9\s,_-]+)\)$', query)
-    if not_in_list_match:
-        sku = not_in_list_match.group(1)
-        manufacturers = [m.strip() for m in not_in_list_match.group(2).split(',')]
-        result['sku_conditions'] = [{'operator': '=', 'values': [sku]}]
-        result['manufacturer_conditions'] = [{'operator': 'NOT_IN', 'values': manufacturers}]
-        return result
-    
-    # Pattern 15: NOT (SKU1 AND ManufacturerX) - handle this special case
-    if result['negation'] and result['negation_type'] == 'and':
-        and_manufacturer_match = re.search(r'^([A-Z0-9_-]+)\s+AND\s+([A-Z0-9\s_-]+)$', query)
-        if and_manufacturer_match:
-            sku = and_manufacturer_match.group(1)
-            manufacturer = and_manufacturer_match.group(2).strip()
-            # For NOT (SKU1 AND ManufacturerX), we want records where NOT (sku=SKU1 AND manufacturer=ManufacturerX)
-            # This means: sku!=SKU1 OR manufacturer!=ManufacturerX
-            result['sku_conditions'] = [{'operator': '!=', 'values': [sku]}]
-            result['manufacturer_conditions'] = [{'operator': '!=', 'values': [manufacturer]}]
-            result['logical_operator'] = 'OR'  # Important: OR for negated AND
-            return result
-    
-    # If no pattern matches, treat as simple text search
-    result['text_search'] = original_query
-    return result
+    return compile_logical_query(normalize_query(query))
 
 def apply_logical_filters(query, conditions: dict):
     """
@@ -220,6 +145,10 @@ def apply_logical_filters(query, conditions: dict):
     # Handle text search
     if 'text_search' in conditions:
         search_term = conditions['text_search']
+        # Answer from the in-memory index when it can, otherwise scan with ILIKE
+        product_ids = product_text_index.search(search_term, db=query.session)
+        if product_ids is not None:
+            return query.filter(models.Product.product_id.in_(product_ids))
         query = query.filter(
             or_(
                 models.Product.name.ilike(f"%{search_term}%"),
@@ -239,75 +168,100 @@ def apply_logical_filters(query, conditions: dict):
         )
         return query
     
-    # Build filter conditions
-    sku_filters = []
-    manufacturer_filters = []
-    
-    # Process SKU conditions
-    for condition in conditions.get('sku_conditions', []):
-        operator = condition['operator']
-        values = condition['values']
-        
-        if operator == '=':
-            sku_filters.append(models.Product.sku_name == values[0])
-        elif operator == '!=':
-            sku_filters.append(models.Product.sku_name != values[0])
-        elif operator == 'IN':
-            sku_filters.append(models.Product.sku_name.in_(values))
-        elif operator == 'NOT_IN':
-            sku_filters.append(~models.Product.sku_name.in_(values))
-        elif operator == 'OR':
-            or_conditions = [models.Product.sku_name == value for value in values]
-            sku_filters.append(or_(*or_conditions))
-    
-    # Process manufacturer conditions
-    for condition in conditions.get('manufacturer_conditions', []):
-        operator = condition['operator']
-        values = condition['values']
-        
-        if operator == '=':
-            manufacturer_filters.append(models.Product.c_manufacturer == values[0])
-        elif operator == '!=':
-            manufacturer_filters.append(models.Product.c_manufacturer != values[0])
-        elif operator == 'IN':
-            manufacturer_filters.append(models.Product.c_manufacturer.in_(values))
-        elif operator == 'NOT_IN':
-            manufacturer_filters.append(~models.Product.c_manufacturer.in_(values))
-    
-    # Apply filters based on logical operator
-    if conditions.get('logical_operator') == 'OR':
-        if len(sku_filters) == 2 and len(manufacturer_filters) == 2:
-            # Pattern 10: (SKU1 AND Manufacturer1) OR (SKU2 AND Manufacturer2)
-            combined_filters = [
-                and_(sku_filters[0], manufacturer_filters[0]),
-                and_(sku_filters[1], manufacturer_filters[1])
-            ]
-            query = query.filter(or_(*combined_filters))
-        elif len(sku_filters) == 1 and len(manufacturer_filters) == 1:
-            # Pattern 15: NOT (SKU1 AND ManufacturerX) = (sku!=SKU1 OR manufacturer!=ManufacturerX)
-            query = query.filter(or_(sku_filters[0], manufacturer_filters[0]))
-        else:
-            # Simple OR for SKUs or manufacturers
-            all_filters = sku_filters + manufacturer_filters
-            if all_filters:
-                query = query.filter(or_(*all_filters))
-    else:
-        # Default AND operation
-        all_filters = sku_filters + manufacturer_filters
-        if all_filters:
-            query = query.filter(and_(*all_filters))
+    clause = conditions.get('clause')
+    if clause is not None:
+        query = query.filter(clause)
     
     return query
 
+PRODUCT_PAGE_MAX = 1000
+STREAM_BATCH_SIZE = 500
+
+# Text searches whose filters match at most this many products rank the matches directly
+RANK_CANDIDATES_MAX = 5000
+# Largest batch of ranked ids checked against the search filters in one IN query
+RANK_FILTER_BATCH_MAX = 5000
+# Unpaged structured searches matching more products than this are scanned in SQL
+# instead of loaded by id from the columnar snapshot
+SNAPSHOT_UNPAGED_MAX = 5000
+
+def stream_products_ndjson(cursor: Optional[int] = None):
+    """
+    Yield listed products as newline-delimited JSON in product_id order.
+    Rows are fed by yield_per so only one batch is held in memory at a time;
+    images for each batch come from a single IN query on a second session so
+    the streaming cursor is never interleaved with lazy loads.
+    """
+    db = SessionLocal()
+    image_db = SessionLocal()
+    try:
+        query = (
+            db.query(models.Product)
+            .options(noload(models.Product.images))
+            .filter(
+                and_(
+                    models.Product.inactive == 0,
+                    models.Product.show_in_store == 1,
+                    models.Product.if_sellable == 1
+                )
+            )
+        )
+        if cursor is not None:
+            query = query.filter(models.Product.product_id > cursor)
+        result = db.execute(
+            query.order_by(models.Product.product_id)
+            .statement
+            .execution_options(yield_per=STREAM_BATCH_SIZE)
+        ).scalars()
+        for batch in result.partitions():
+            images_by_product = {}
+            for image in (
+                image_db.query(models.ProductImage)
+                .filter(models.ProductImage.product_id.in_([p.product_id for p in batch]))
+                .order_by(models.ProductImage.image_sort)
+            ):
+                images_by_product.setdefault(image.product_id, []).append(schemas.ProductImage.model_validate(image))
+            for product in batch:
+                item = schemas.Product.model_validate(product)
+                item.images = images_by_product.get(product.product_id, [])
+                yield item.model_dump_json() + "\n"
+            image_db.expunge_all()
+    finally:
+        image_db.close()
+        db.close()
+
 @router.get("/", response_model=dict)
 def get_all_products(
+    request: Request,
+    response: Response,
+    cursor: Optional[int] = Query(None, description="Return products with product_id greater than this value"),
+    limit: Optional[int] = Query(None, ge=1, le=PRODUCT_PAGE_MAX, description="Page size for keyset pagination"),
+    stream: bool = Query(False, description="Stream every product as NDJSON instead of a JSON document"),
     db: Session = Depends(get_db)
 ):
     """
-    Get all active, sellable products that are shown in store
+    Get all active, sellable products that are shown in store.
+
+    - With ``limit`` the result is one keyset page ordered by product_id; pass the
+      returned ``next_cursor`` back as ``cursor`` to fetch the following page.
+    - With ``stream=true`` products are streamed as application/x-ndjson, one
+      product per line, starting after ``cursor`` if given.
+    - With neither, the whole catalog is returned as before.
+
+    JSON responses carry an ETag; a matching If-None-Match gets a 304.
     """
-    products = (
+    if stream:
+        return StreamingResponse(stream_products_ndjson(cursor), media_type="application/x-ndjson")
+
+    etag = make_etag("products", cursor, limit, catalog_fingerprint(db))
+    unchanged = not_modified(request, etag, "products")
+    if unchanged is not None:
+        return unchanged
+    response.headers.update(cache_headers(etag, "products"))
+
+    query = (
         db.query(models.Product)
+        .options(selectinload(models.Product.images))
         .filter(
             and_(
                 models.Product.inactive == 0,
@@ -315,129 +269,99 @@ def get_all_products(
                 models.Product.if_sellable == 1
             )
         )
-        .all()
     )
+    if cursor is not None:
+        query = query.filter(models.Product.product_id > cursor)
+
+    if limit is None:
+        products = query.all()
+        total_results = len(products)
+        message = f"Found {total_results} products."
+        products_data = [schemas.Product.model_validate(p).model_dump() for p in products]
+        return {"products": products_data, "total_results": total_results, "message": message}
+
+    products = query.order_by(models.Product.product_id).limit(limit).all()
     total_results = len(products)
+    next_cursor = products[-1].product_id if total_results == limit else None
     message = f"Found {total_results} products."
     products_data = [schemas.Product.model_validate(p).model_dump() for p in products]
-    return {"products": products_data, "total_results": total_results, "message": message}
-
-@router.get("/recently-purchased", response_model=List[schemas.Product])
-def get_recently_purchased(db: Session = Depends(get_db)):
-    """
-    Get products that were purchased in the last 7 days
-    """
-    # Calculate timestamp for 7 days ago
-    seven_days_ago = int(time.time()) - (7 * 24 * 60 * 60)
+    return {
+        "products": products_data,
+        "total_results": total_results,
+        "next_cursor": next_cursor,
+        "message": message
+    }
 
-    # Get products with recent orders
-    recent_products = (
-        db.query(models.Product)
-        .join(models.OrderProduct, models.Product.product_id == models.OrderProduct.product_id)
-        .filter(
-            and_(
-                models.Product.inactive == 0,
-                models.Product.show_in_store == 1,
-                models.Product.if_sellable == 1,
-                models.OrderProduct.created_at >= seven_days_ago
+def listed_rows_in_order(db: Session, product_ids: List[int]):
+    """Projected rows of the listed products among ``product_ids``, in that order"""
+    rows = []
+    for batch in id_batches(product_ids):
+        rows.extend(
+            db.query(*PRODUCT_COLUMNS)
+            .filter(
+                and_(
+                    models.Product.product_id.in_(batch),
+                    models.Product.inactive == 0,
+                    models.Product.show_in_store == 1,
+                    models.Product.if_sellable == 1
+                )
             )
         )
-        .group_by(models.Product.product_id)
-        .order_by(desc(func.max(models.OrderProduct.created_at)))
-        .all()
-    )
-
-    return recent_products
+    position = {product_id: index for index, product_id in enumerate(product_ids)}
+    rows.sort(key=lambda row: position[row.product_id])
+    return rows
 
-@router.get("/recently-shipped", response_model=List[schemas.Product])
-def get_recently_shipped(db: Session = Depends(get_db)):
+@router.get("/recently-purchased", response_model=List[schemas.Product], response_class=ProductJSONResponse)
+def get_recently_purchased(
+    days: int = Query(7, ge=1, le=ROLLUP_MAX_DAYS, description="Look-back window in days"),
+    db: Session = Depends(get_db)
+):
     """
-    Get products that were shipped in the last 7 days
+    Get products that were purchased in the last ``days`` days (7 by default),
+    most recently purchased first
     """
-    seven_days_ago = int(time.time()) - (7 * 24 * 60 * 60)
+    product_ids = recent_purchases.product_ids(db, days)
+    return ProductJSONResponse(serialize_product_rows(db, listed_rows_in_order(db, product_ids)))
 
-    recent_shipped_products = (
-        db.query(models.Product)
-        .join(models.ShipmentProduct, models.Product.product_id == models.ShipmentProduct.product_id)
-        .filter(
-            and_(
-                models.Product.inactive == 0,
-                models.Product.show_in_store == 1,
-                models.Product.if_sellable == 1,
-                models.ShipmentProduct.created_at >= seven_days_ago
-            )
-        )
-        .group_by(models.Product.product_id)
-        .order_by(desc(func.max(models.ShipmentProduct.created_at)))
-        .all()
-    )
-    return recent_shipped_products
+@router.get("/recently-shipped", response_model=List[schemas.Product], response_class=ProductJSONResponse)
+def get_recently_shipped(
+    days: int = Query(7, ge=1, le=ROLLUP_MAX_DAYS, description="Look-back window in days"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get products that were shipped in the last ``days`` days (7 by default),
+    most recently shipped first
+    """
+    product_ids = recent_shipments.product_ids(db, days)
+    return ProductJSONResponse(serialize_product_rows(db, listed_rows_in_order(db, product_ids)))
 
-@router.get("/best-sellers", response_model=List[schemas.Product])
-def get_best_sellers(db: Session = Depends(get_db)):
+@router.get("/best-sellers", response_model=List[schemas.Product], response_class=ProductJSONResponse)
+def get_best_sellers(request: Request, db: Session = Depends(get_db)):
     """
     Get best selling products for each manufacturer
     """
-    from sqlalchemy import func, desc, text
-    
-    # Use a more reliable approach with window functions
-    query = text("""
-        WITH RankedProducts AS (
-            SELECT 
-                p.*,
-                ROW_NUMBER() OVER (
-                    PARTITION BY p.c_manufacturer 
-                    ORDER BY p.sales DESC, p.product_id ASC
-                ) as rn
-            FROM product p
-            WHERE p.inactive = 0 
-                AND p.show_in_store = 1 
-                AND p.if_sellable = 1 
-                AND p.sales > 0
-                AND p.c_manufacturer IS NOT NULL 
-                AND p.c_manufacturer != ''
-        )
-        SELECT product_id FROM RankedProducts WHERE rn = 1
-        ORDER BY sales DESC
-    """)
-    
-    result = db.execute(query)
-    product_ids = [row[0] for row in result.fetchall()]
-    
-    # Get the complete product objects for these product IDs
-    if product_ids:
-        best_sellers = (
-            db.query(models.Product)
-            .filter(models.Product.product_id.in_(product_ids))
-            .order_by(desc(models.Product.sales))
-            .all()
-        )
-    else:
-        best_sellers = []
-    
-    return best_sellers
+    best_sellers = result_cache.get_or_compute(
+        ("best-sellers",),
+        lambda: serialize_product_rows(db, listed_rows_in_order(db, best_seller_rollup.product_ids(db)))
+    )
 
-@router.get("/search", response_model=List[schemas.Product])
-def search_products(
+    # Sales move without date_modify changing, so tag the rendered body itself
+    response = ProductJSONResponse(best_sellers)
+    etag = body_etag(response.body)
+    return not_modified(request, etag, "best-sellers") or with_cache_headers(response, etag, "best-sellers")
+
+def apply_search_filters(
+    query,
     search: Optional[str] = None,
     category: Optional[str] = None,
     manufacturer: Optional[str] = None,
     type: Optional[str] = None,
     min_price: Optional[Decimal] = None,
-    max_price: Optional[Decimal] = None,
-    db: Session = Depends(get_db),
+    max_price: Optional[Decimal] = None
 ):
-    query = (
-        db.query(models.Product)
-        .filter(
-            and_(
-                models.Product.inactive == 0,
-                models.Product.show_in_store == 1,
-                models.Product.if_sellable == 1
-            )
-        )
-    )
-    
+    """
+    Apply the /products/search filter parameters to any query over the product table
+    """
     if search:
         try:
             # Try to parse as logical query first
@@ -447,6 +371,14 @@ def search_products(
             # Fallback to simple text search
             search_terms = search.split()
             for term in search_terms:
+                product_ids = product_text_index.search(
+                    term,
+                    fields=("name", "sku_name", "c_type", "c_category", "c_manufacturer"),
+                    db=query.session
+                )
+                if product_ids is not None:
+                    query = query.filter(models.Product.product_id.in_(product_ids))
+                    continue
                 query = query.filter(
                     or_(
                         models.Product.name.ilike(f"%{term}%"),
@@ -458,17 +390,192 @@ def search_products(
                 )
     
     if category:
-        query = query.filter(models.Product.c_category.ilike(f"%{category}%"))
+        query = query.filter(contains_predicate(models.Product.c_category, category, query.session))
     if manufacturer:
-        query = query.filter(models.Product.c_manufacturer.ilike(f"%{manufacturer}%"))
+        query = query.filter(contains_predicate(models.Product.c_manufacturer, manufacturer, query.session))
     if type:
-        query = query.filter(models.Product.c_type.ilike(f"%{type}%"))
+        query = query.filter(contains_predicate(models.Product.c_type, type, query.session))
     if min_price is not None:
         query = query.filter(models.Product.price >= min_price)
     if max_price is not None:
         query = query.filter(models.Product.price <= max_price)
     
-    return query.all()
+    return query
+
+def ranked_search_ids(
+    db: Session,
+    search: Optional[str],
+    filter_query,
+    limit: int = PRODUCT_PAGE_MAX,
+    offset: int = 0
+) -> Optional[List[int]]:
+    """
+    One page of the ids matched by ``filter_query`` (a product_id query with the
+    search filters applied), ordered by BM25 relevance to ``search``. Returns
+    None when there is no text to rank by.
+
+    The full match set is never loaded. A filter matching at most
+    RANK_CANDIDATES_MAX products is read and ranked directly. Otherwise the
+    ranking comes from the relevance index's postings for the query terms, and
+    only the best-scored ids are checked against the filters, in batches that
+    start at the page depth and double up to RANK_FILTER_BATCH_MAX, until the
+    page is full. Matches no term scores (substring-only hits) follow in
+    product_id order, read one page deep.
+    """
+    terms = relevance_terms(search)
+    if not terms:
+        return None
+    candidates = [product_id for (product_id,) in filter_query.limit(RANK_CANDIDATES_MAX + 1)]
+    if len(candidates) <= RANK_CANDIDATES_MAX:
+        return product_relevance_index.rank(terms, set(candidates), limit=limit, offset=offset, db=db)
+    ranking = product_relevance_index.iter_ranked(terms, db=db)
+    if ranking is None:
+        return None
+
+    depth = offset + limit
+    matched: List[int] = []
+    batch_size = depth
+    while len(matched) < depth:
+        batch = list(islice(ranking, batch_size))
+        if not batch:
+            break
+        kept = {product_id for (product_id,) in filter_query.filter(models.Product.product_id.in_(batch))}
+        matched.extend(product_id for product_id in batch if product_id in kept)
+        batch_size = min(batch_size * 2, RANK_FILTER_BATCH_MAX)
+
+    if len(matched) < depth:
+        # Every scored match is in ``matched`` now, so one page of ids beyond them is enough
+        scored = set(matched)
+        unscored = filter_query.order_by(models.Product.product_id).limit(depth)
+        matched.extend(product_id for (product_id,) in unscored if product_id not in scored)
+    return matched[offset:depth]
+
+def snapshot_search_ids(
+    db: Session,
+    category: Optional[str] = None,
+    manufacturer: Optional[str] = None,
+    type: Optional[str] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    limit: Optional[int] = None,
+    offset: int = 0
+) -> Optional[List[int]]:
+    """
+    One page of the structured search from the columnar snapshot, or None when
+    the SQL scan should answer it: without ``limit``, a filter matching most of
+    the catalog is cheaper to scan than to load back by id
+    """
+    product_ids = catalog_snapshot.filter_ids(db, category, manufacturer, type, min_price, max_price, limit, offset)
+    if product_ids is not None and limit is None and len(product_ids) > SNAPSHOT_UNPAGED_MAX:
+        return None
+    return product_ids
+
+@router.get("/search", response_model=List[schemas.Product], response_class=ProductJSONResponse)
+def search_products(
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+    manufacturer: Optional[str] = None,
+    type: Optional[str] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PRODUCT_PAGE_MAX, description="Page size of the ranked results"),
+    offset: int = Query(0, ge=0, description="Number of ranked results to skip"),
+    db: Session = Depends(get_db),
+):
+    """
+    Search listed products. Results of a text search are ordered by BM25 relevance,
+    with SKU and part-number matches ranked above name and description matches;
+    other searches are ordered by product_id and filtered on the columnar catalog
+    snapshot. A text search returns at most PRODUCT_PAGE_MAX results when no
+    ``limit`` is given. Only the requested page is loaded.
+    """
+    def listed(*columns):
+        query = db.query(*columns).filter(
+            and_(
+                models.Product.inactive == 0,
+                models.Product.show_in_store == 1,
+                models.Product.if_sellable == 1
+            )
+        )
+        return apply_search_filters(query, search, category, manufacturer, type, min_price, max_price)
+
+    def compute():
+        if search:
+            product_ids = ranked_search_ids(
+                db, search, listed(models.Product.product_id), limit or PRODUCT_PAGE_MAX, offset
+            )
+        else:
+            product_ids = snapshot_search_ids(db, category, manufacturer, type, min_price, max_price, limit, offset)
+        if product_ids is not None:
+            rows = listed_rows_in_order(db, product_ids)
+        else:
+            query = listed(*PRODUCT_COLUMNS).order_by(models.Product.product_id).offset(offset)
+            rows = (query.limit(limit) if limit is not None else query).all()
+        return serialize_product_rows(db, rows)
+
+    cache_key = search_cache_key("search", search, category, manufacturer, type, min_price, max_price) + (limit, offset)
+    return ProductJSONResponse(result_cache.get_or_compute(cache_key, compute))
+
+@router.get("/facets", response_model=dict)
+def get_product_facets(
+    request: Request,
+    response: Response,
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+    manufacturer: Optional[str] = None,
+    type: Optional[str] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Get distinct categories, types and manufacturers with product counts, plus the
+    price range, for the products matching the /products/search filters.
+    Results are cached for a few minutes or until a product write changes the catalog.
+    """
+    cache_key = search_cache_key("facets", search, category, manufacturer, type, min_price, max_price)
+    etag = make_etag(cache_key, catalog_fingerprint(db))
+    unchanged = not_modified(request, etag, "facets")
+    if unchanged is not None:
+        return unchanged
+    response.headers.update(cache_headers(etag, "facets"))
+
+    def listed(*columns):
+        query = db.query(*columns).filter(
+            and_(
+                models.Product.inactive == 0,
+                models.Product.show_in_store == 1,
+                models.Product.if_sellable == 1
+            )
+        )
+        return apply_search_filters(query, search, category, manufacturer, type, min_price, max_price)
+
+    def value_counts(column):
+        rows = (
+            listed(column, func.count(models.Product.product_id))
+            .filter(column.isnot(None), column != '')
+            .group_by(column)
+            .order_by(column)
+            .all()
+        )
+        return [{"value": value, "count": count} for value, count in rows]
+
+    def compute():
+        min_found, max_found, total_results = listed(
+            func.min(models.Product.price),
+            func.max(models.Product.price),
+            func.count(models.Product.product_id)
+        ).one()
+
+        return {
+            "categories": value_counts(models.Product.c_category),
+            "types": value_counts(models.Product.c_type),
+            "manufacturers": value_counts(models.Product.c_manufacturer),
+            "price": {"min": min_found, "max": max_found},
+            "total_results": total_results
+        }
+
+    return result_cache.get_or_compute(cache_key, compute)
 
 @router.get("/suggestions", response_model=List[str])
 def get_product_suggestions(
@@ -482,8 +589,11 @@ def get_product_suggestions(
     try:
         # Parse the logical query
         conditions = parse_logical_query(query)
-        # If the query is a simple keyword (not logical), search all relevant columns
+        # If the query is a simple keyword (not logical), complete it from the prefix index
         if not any(op in query.upper() for op in ["AND", "OR", "IN", "NOT", "(", ")"]):
+            product_ids = product_prefix_index.complete(query, limit=10, db=db)
+            if product_ids is not None:
+                return [product_prefix_index.name_of(product_id) for product_id in product_ids]
             suggestions = (
                 db.query(models.Product.name)
                 .filter(
@@ -563,10 +673,21 @@ def get_detailed_product_suggestions(
     try:
         # Parse the logical query
         conditions = parse_logical_query(query)
-        # If the query is a simple keyword (not logical), search all relevant columns
+        # If the query is a simple keyword (not logical), complete it from the prefix index
         if not any(op in query.upper() for op in ["AND", "OR", "IN", "NOT", "(", ")"]):
+            product_ids = product_prefix_index.complete(query, limit=limit, db=db) if limit else None
+            if product_ids is not None:
+                products = (
+                    db.query(models.Product)
+                    .options(selectinload(models.Product.images))
+                    .filter(models.Product.product_id.in_(product_ids))
+                    .all()
+                )
+                products_by_id = {product.product_id: product for product in products}
+                return [products_by_id[product_id] for product_id in product_ids if product_id in products_by_id]
             suggestions = (
                 db.query(models.Product)
+                .options(selectinload(models.Product.images))
                 .filter(
                     and_(
                         models.Product.inactive == 0,
@@ -590,6 +711,7 @@ def get_detailed_product_suggestions(
         # Otherwise, use logical parsing and filters
         base_query = (
             db.query(models.Product)
+            .options(selectinload(models.Product.images))
             .filter(
                 and_(
                     models.Product.inactive == 0,
@@ -610,6 +732,7 @@ def get_detailed_product_suggestions(
         # Fallback: search all relevant columns
         suggestions = (
             db.query(models.Product)
+            .options(selectinload(models.Product.images))
             .filter(
                 and_(
                     models.Product.inactive == 0,
@@ -631,17 +754,17 @@ def get_detailed_product_suggestions(
         )
         return suggestions
 
-@router.get("/advanced-search", response_model=List[schemas.Product])
+@router.get("/advanced-search", response_model=List[schemas.Product], response_class=ProductJSONResponse)
 def advanced_search_products(
     query: str,
     limit: Optional[int] = 50,
     db: Session = Depends(get_db)
 ):
     """
-    Advanced search endpoint that supports all 15 logical operators.
+    Advanced search endpoint that supports nested AND / OR / NOT / IN expressions.
     Examples:
     - "SKU1" - Find products with specific SKU
-    - "SKU1 AND SKU2" - Find products with either SKU (treated as IN)
+    - "SKU1 AND SKU2 AND SKU3" - Find products with any of the SKUs (treated as IN)
     - "SKU1 OR SKU2" - Find products with either SKU
     - "SKU1 IN ManufacturerX" - Find SKU1 from specific manufacturer
     - "SKU1 NOT IN ManufacturerX" - Find SKU1 not from specific manufacturer
@@ -654,72 +777,158 @@ def advanced_search_products(
     - "SKU1, Manufacturer NOT IN (X,Y)" - SKU1 not from multiple manufacturers
     - "NOT SKU1" - Exclude specific SKU
     - "NOT (SKU1 OR SKU2)" - Exclude multiple SKUs
-    - "NOT (SKU1 AND ManufacturerX)" - Complex negation
+    - "NOT (SKU1 IN ManufacturerX)" - Complex negation
+    - "(SKU1 OR SKU2) AND NOT (SKU3 IN ManufacturerX)" - Arbitrary nesting
     """
-    try:
-        # Parse the logical query
-        conditions = parse_logical_query(query)
+    cache_key = ("advanced-search", normalize_query(query), limit)
+
+    def compute():
+        try:
+            # Parse the logical query
+            conditions = parse_logical_query(query)
         
-        # Start with base query
-        base_query = (
-            db.query(models.Product)
-            .filter(
-                and_(
-                    models.Product.inactive == 0,
-                    models.Product.show_in_store == 1,
-                    models.Product.if_sellable == 1
+            # Start with base query
+            base_query = (
+                db.query(*PRODUCT_COLUMNS)
+                .filter(
+                    and_(
+                        models.Product.inactive == 0,
+                        models.Product.show_in_store == 1,
+                        models.Product.if_sellable == 1
+                    )
                 )
             )
-        )
         
-        # Apply logical filters
-        filtered_query = apply_logical_filters(base_query, conditions)
+            # Apply logical filters
+            filtered_query = apply_logical_filters(base_query, conditions)
         
-        # Get results with ordering and limit
-        products = (
-            filtered_query
-            .order_by(models.Product.sales.desc(), models.Product.name)
-            .limit(limit)
-            .all()
-        )
+            # Get results with ordering and limit
+            products = (
+                filtered_query
+                .order_by(models.Product.sales.desc(), models.Product.name)
+                .limit(limit)
+                .all()
+            )
         
-        return products
+            return serialize_product_rows(db, products)
         
-    except Exception as e:
-        # Fallback to simple text search if parsing fails
-        products = (
-            db.query(models.Product)
-            .filter(
-                and_(
-                    models.Product.inactive == 0,
-                    models.Product.show_in_store == 1,
-                    models.Product.if_sellable == 1,
-                    or_(
-                        models.Product.name.ilike(f"%{query}%"),
-                        models.Product.description.ilike(f"%{query}%"),
-                        models.Product.meta_description.ilike(f"%{query}%"),
-                        models.Product.meta_keyword.ilike(f"%{query}%"),
-                        models.Product.tag.ilike(f"%{query}%"),
-                        models.Product.sku_name.ilike(f"%{query}%")
+        except Exception as e:
+            # Fallback to simple text search if parsing fails
+            products = (
+                db.query(*PRODUCT_COLUMNS)
+                .filter(
+                    and_(
+                        models.Product.inactive == 0,
+                        models.Product.show_in_store == 1,
+                        models.Product.if_sellable == 1,
+                        or_(
+                            models.Product.name.ilike(f"%{query}%"),
+                            models.Product.description.ilike(f"%{query}%"),
+                            models.Product.meta_description.ilike(f"%{query}%"),
+                            models.Product.meta_keyword.ilike(f"%{query}%"),
+                            models.Product.tag.ilike(f"%{query}%"),
+                            models.Product.sku_name.ilike(f"%{query}%")
+                        )
                     )
                 )
+                .order_by(models.Product.sales.desc(), models.Product.name)
+                .limit(limit)
+                .all()
             )
-            .order_by(models.Product.sales.desc(), models.Product.name)
-            .limit(limit)
-            .all()
-        )
-        return products
+            return serialize_product_rows(db, products)
+
+    return ProductJSONResponse(result_cache.get_or_compute(cache_key, compute))
+
+@router.get("/cache-stats", response_model=dict)
+def get_cache_stats():
+    """
+    Hit/miss counters of the search result cache, per endpoint, and how many
+    concurrent misses were coalesced onto an in-flight computation
+    """
+    return result_cache.stats()
+
+BATCH_MAX_IDS = 500
+
+def parse_batch_ids(ids: str) -> List[int]:
+    """Parse a comma-separated id list, dropping duplicates but keeping order"""
+    try:
+        product_ids = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    return list(dict.fromkeys(product_ids))
+
+def get_products_batch(product_ids: List[int], db: Session) -> dict:
+    if len(product_ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_IDS} ids per request")
+    product_ids = list(dict.fromkeys(product_ids))
+    products = serialize_product_rows(db, listed_rows_in_order(db, product_ids))
+    found = {product["product_id"] for product in products}
+    return {
+        "products": products,
+        "missing_ids": [product_id for product_id in product_ids if product_id not in found]
+    }
+
+@router.get("/batch", response_model=schemas.ProductBatchResponse, response_class=ProductJSONResponse)
+def get_products_by_ids(
+    ids: str = Query(..., description="Comma-separated product IDs, e.g. 12,7,40"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get many products by ID in one round trip, in the order requested.
+    IDs that do not exist or are not listed are returned in ``missing_ids``.
+    """
+    return ProductJSONResponse(get_products_batch(parse_batch_ids(ids), db))
+
+@router.post("/batch", response_model=schemas.ProductBatchResponse, response_class=ProductJSONResponse)
+def post_products_by_ids(
+    request: schemas.ProductBatchRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Same as GET /products/batch, for ID lists too long for a query string
+    """
+    return ProductJSONResponse(get_products_batch(request.ids, db))
 
 @router.get("/{product_id}", response_model=schemas.Product)
 def get_product_by_id(
     product_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """
-    Get a specific product by its ID (only if active, sellable, and shown in store)
+    Get a specific product by its ID (only if active, sellable, and shown in store).
+    The ETag follows the product's date_modify and its images, so revalidation
+    costs one primary-key lookup.
     """
+    images = db.query(models.ProductImage.image_id).filter(models.ProductImage.product_id == models.Product.product_id)
+    modified = (
+        db.query(
+            models.Product.date_modify,
+            images.with_entities(func.count(models.ProductImage.image_id)).scalar_subquery(),
+            images.with_entities(func.max(models.ProductImage.image_id)).scalar_subquery()
+        )
+        .filter(
+            and_(
+                models.Product.product_id == product_id,
+                models.Product.inactive == 0,
+                models.Product.show_in_store == 1,
+                models.Product.if_sellable == 1
+            )
+        )
+        .first()
+    )
+    if modified is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    etag = make_etag("product", product_id, tuple(modified))
+    unchanged = not_modified(request, etag, "product")
+    if unchanged is not None:
+        return unchanged
+    response.headers.update(cache_headers(etag, "product"))
+
     product = (
         db.query(models.Product)
+        .options(selectinload(models.Product.images))
         .filter(
             and_(
                 models.Product.product_id == product_id,
@@ -743,9 +952,13 @@ def create_product(
     Create a new product
     """
     db_product = models.Product(**product.model_dump())
+    db_product.date_modify = int(time.time())
+    if db_product.date_added is None:
+        db_product.date_added = db_product.date_modify
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
+    notify_catalog_change(db, product=db_product)
     return db_product
 
 @router.put("/{product_id}", response_model=schemas.Product)
@@ -763,9 +976,11 @@ def update_product(
     
     for key, value in product.model_dump(exclude_unset=True).items():
         setattr(db_product, key, value)
+    db_product.date_modify = int(time.time())
     
     db.commit()
     db.refresh(db_product)
+    notify_catalog_change(db, product=db_product)
     return db_product
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -782,4 +997,5 @@ def delete_product(
     
     db.delete(db_product)
     db.commit()
+    notify_catalog_change(db, product_id=product_id)
     return None
\ No newline at end of file
@@ -0,0 +1,212 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query as ProductQuery, Session
+from sqlalchemy import or_, and_
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, List, Optional
+from decimal import Decimal
+from app import models, schemas
+from app.database import SessionLocal, get_async_db
+from app.routers.products import (
+    PRODUCT_PAGE_MAX,
+    apply_logical_filters,
+    apply_search_filters,
+    parse_logical_query,
+    ranked_search_ids,
+    search_cache_key,
+    snapshot_search_ids,
+)
+from app.query_parser import normalize_query
+from app.result_cache import result_cache
+from app.rollups import ROLLUP_MAX_DAYS, best_seller_rollup, recent_purchases, recent_shipments
+from app.serialization import PRODUCT_COLUMNS, ProductJSONResponse, id_batches, serialize_product_rows_async
+
+# Async twins of the read endpoints in app/routers/products.py. Filters are
+# built with the same helpers on a session-less Query and executed on the
+# async engine, so a slow database no longer pins a threadpool worker per request.
+# Cached endpoints share their result cache entries with the sync router, and
+# concurrent misses on the same key are coalesced onto one computation.
+#
+# Only product and image I/O runs on the AsyncSession. Filter planning, ranking,
+# the columnar snapshot and the rollups can build in-memory structures or wait
+# on locks held by sync requests, so they run in the threadpool on a sync
+# session (see run_off_loop); AsyncSession.run_sync would run them on the loop.
+router = APIRouter(
+    prefix="/async/products",
+    tags=["Product (async)"]
+)
+
+def listed_products_query() -> ProductQuery:
+    """Projected query over active, sellable products that are shown in store"""
+    return (
+        ProductQuery(PRODUCT_COLUMNS)
+        .filter(
+            and_(
+                models.Product.inactive == 0,
+                models.Product.show_in_store == 1,
+                models.Product.if_sellable == 1
+            )
+        )
+    )
+
+async def run_off_loop(fn: Callable, *args):
+    """Call ``fn(session, *args)`` in the threadpool with a sync session of its own"""
+    def call():
+        with SessionLocal() as session:
+            return fn(session, *args)
+    return await run_in_threadpool(call)
+
+async def fetch_products(db: AsyncSession, statement) -> List[dict]:
+    rows = (await db.execute(statement)).all()
+    return await serialize_product_rows_async(db, rows)
+
+@router.get("/", response_model=dict, response_class=ProductJSONResponse)
+async def get_all_products(
+    cursor: Optional[int] = Query(None, description="Return products with product_id greater than this value"),
+    limit: int = Query(100, ge=1, le=PRODUCT_PAGE_MAX, description="Page size for keyset pagination"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    One keyset page of listed products ordered by product_id
+    """
+    query = listed_products_query()
+    if cursor is not None:
+        query = query.filter(models.Product.product_id > cursor)
+    rows = (await db.execute(query.order_by(models.Product.product_id).limit(limit).statement)).all()
+    products = await serialize_product_rows_async(db, rows)
+    total_results = len(products)
+    return ProductJSONResponse({
+        "products": products,
+        "total_results": total_results,
+        "next_cursor": products[-1]["product_id"] if total_results == limit else None,
+        "message": f"Found {total_results} products."
+    })
+
+async def fetch_listed_in_order(db: AsyncSession, product_ids: List[int]) -> List[dict]:
+    """Serialized listed products among ``product_ids``, in that order"""
+    rows = []
+    for batch in id_batches(product_ids):
+        query = listed_products_query().filter(models.Product.product_id.in_(batch))
+        rows.extend((await db.execute(query.statement)).all())
+    position = {product_id: index for index, product_id in enumerate(product_ids)}
+    rows.sort(key=lambda row: position[row.product_id])
+    return await serialize_product_rows_async(db, rows)
+
+@router.get("/recently-purchased", response_model=List[schemas.Product], response_class=ProductJSONResponse)
+async def get_recently_purchased(
+    days: int = Query(7, ge=1, le=ROLLUP_MAX_DAYS, description="Look-back window in days"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get products that were purchased in the last ``days`` days, most recent first
+    """
+    product_ids = await run_off_loop(recent_purchases.product_ids, days)
+    return ProductJSONResponse(await fetch_listed_in_order(db, product_ids))
+
+@router.get("/recently-shipped", response_model=List[schemas.Product], response_class=ProductJSONResponse)
+async def get_recently_shipped(
+    days: int = Query(7, ge=1, le=ROLLUP_MAX_DAYS, description="Look-back window in days"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get products that were shipped in the last ``days`` days, most recent first
+    """
+    product_ids = await run_off_loop(recent_shipments.product_ids, days)
+    return ProductJSONResponse(await fetch_listed_in_order(db, product_ids))
+
+@router.get("/best-sellers", response_model=List[schemas.Product], response_class=ProductJSONResponse)
+async def get_best_sellers(db: AsyncSession = Depends(get_async_db)):
+    """
+    Get best selling products for each manufacturer
+    """
+    async def compute():
+        return await fetch_listed_in_order(db, await run_off_loop(best_seller_rollup.product_ids))
+
+    return ProductJSONResponse(await result_cache.get_or_compute_async(("best-sellers",), compute))
+
+@router.get("/search", response_model=List[schemas.Product], response_class=ProductJSONResponse)
+async def search_products(
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+    manufacturer: Optional[str] = None,
+    type: Optional[str] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PRODUCT_PAGE_MAX, description="Page size of the ranked results"),
+    offset: int = Query(0, ge=0, description="Number of ranked results to skip"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Async variant of /products/search; text searches are ranked by BM25 relevance
+    """
+    def plan(session: Session):
+        """(ranked or snapshot ids, None) or (None, statement to run on the async session)"""
+        # A bound session lets the text index and the planner load on first use
+        query = apply_search_filters(
+            listed_products_query().with_session(session), search, category, manufacturer, type, min_price, max_price
+        )
+        if search:
+            product_ids = ranked_search_ids(
+                session, search, query.with_entities(models.Product.product_id), limit or PRODUCT_PAGE_MAX, offset
+            )
+        else:
+            product_ids = snapshot_search_ids(session, category, manufacturer, type, min_price, max_price, limit, offset)
+        if product_ids is not None:
+            return product_ids, None
+        query = query.order_by(models.Product.product_id).offset(offset)
+        return None, (query.limit(limit) if limit is not None else query).statement
+
+    async def compute():
+        product_ids, statement = await run_off_loop(plan)
+        if product_ids is not None:
+            return await fetch_listed_in_order(db, product_ids)
+        return await fetch_products(db, statement)
+
+    cache_key = search_cache_key("search", search, category, manufacturer, type, min_price, max_price) + (limit, offset)
+    return ProductJSONResponse(await result_cache.get_or_compute_async(cache_key, compute))
+
+@router.get("/advanced-search", response_model=List[schemas.Product], response_class=ProductJSONResponse)
+async def advanced_search_products(
+    query: str,
+    limit: Optional[int] = 50,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Async variant of /products/advanced-search; see that endpoint for the query language
+    """
+    def plan(session: Session):
+        try:
+            filtered_query = apply_logical_filters(listed_products_query().with_session(session), parse_logical_query(query))
+        except Exception:
+            # Fallback to simple text search if parsing fails
+            filtered_query = listed_products_query().filter(
+                or_(
+                    models.Product.name.ilike(f"%{query}%"),
+                    models.Product.description.ilike(f"%{query}%"),
+                    models.Product.meta_description.ilike(f"%{query}%"),
+                    models.Product.meta_keyword.ilike(f"%{query}%"),
+                    models.Product.tag.ilike(f"%{query}%"),
+                    models.Product.sku_name.ilike(f"%{query}%")
+                )
+            )
+        return filtered_query.order_by(models.Product.sales.desc(), models.Product.name).limit(limit).statement
+
+    async def compute():
+        return await fetch_products(db, await run_off_loop(plan))
+
+    cache_key = ("advanced-search", normalize_query(query), limit)
+    return ProductJSONResponse(await result_cache.get_or_compute_async(cache_key, compute))
+
+@router.get("/{product_id}", response_model=schemas.Product, response_class=ProductJSONResponse)
+async def get_product_by_id(
+    product_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get a specific product by its ID (only if active, sellable, and shown in store)
+    """
+    query = listed_products_query().filter(models.Product.product_id == product_id)
+    rows = (await db.execute(query.statement)).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return ProductJSONResponse((await serialize_product_rows_async(db, rows))[0])
@@ -10,7 +10,9 @@ import os
 import re
 from app import models, schemas
 from app.database import SessionLocal
+from app.metrics import track
 from app.routers.products import apply_logical_filters, parse_logical_query
+from app.serialization import PRODUCT_COLUMNS, ProductJSONResponse, serialize_product_rows
 
 router = APIRouter(
     prefix="/voice-search",
@@ -161,13 +163,15 @@ def convert_audio_to_text(audio_file: UploadFile) -> str:
             text = None
             
             try:
-                text = recognizer.recognize_google(audio, language='en-US')
+                with track("google_asr"):
+                    text = recognizer.recognize_google(audio, language='en-US')
                 print(f"Recognized text (first attempt): {text}")
             except sr.UnknownValueError:
                 print("First recognition attempt failed, trying with different settings...")
                 
                 try:
-                    text = recognizer.recognize_google(audio, language='en-US', show_all=True)
+                    with track("google_asr"):
+                        text = recognizer.recognize_google(audio, language='en-US', show_all=True)
                     if text and isinstance(text, dict) and 'alternative' in text:
                         text = text['alternative'][0]['transcript']
                         print(f"Recognized text (second attempt): {text}")
@@ -205,10 +209,11 @@ def convert_audio_to_text(audio_file: UploadFile) -> str:
             detail=f"Error processing audio file: {str(e)}"
         )
 
-def search_products_by_text(db: Session, search_text: str, limit: Optional[int] = 50) -> List[models.Product]:
+def search_products_by_text(db: Session, search_text: str, limit: Optional[int] = 50) -> list:
     """
     Search products using the converted text from voice input
-    Enhanced with better text search and filtering
+    Enhanced with better text search and filtering.
+    Returns rows projected to the schemas.Product columns.
     """
     search_text = search_text.strip().lower()
     print(f"Searching for products with text: '{search_text}'")
@@ -218,7 +223,7 @@ def search_products_by_text(db: Session, search_text: str, limit: Optional[int]
     if has_logical_operators:
         conditions = parse_logical_query(search_text.upper())
         
-        query = db.query(models.Product).filter(
+        query = db.query(*PRODUCT_COLUMNS).filter(
             and_(
                 models.Product.inactive == 0,
                 models.Product.show_in_store == 1,
@@ -229,7 +234,7 @@ def search_products_by_text(db: Session, search_text: str, limit: Optional[int]
         query = apply_logical_filters(query, conditions)
         
     else:
-        query = db.query(models.Product).filter(
+        query = db.query(*PRODUCT_COLUMNS).filter(
             and_(
                 models.Product.inactive == 0,
                 models.Product.show_in_store == 1,
@@ -289,49 +294,19 @@ async def search_products_by_voice(
         
         print(f"Found {len(products)} products for voice search")
         
-        product_schemas = []
-        for product in products:
-            product_schema = schemas.Product(
-                product_id=product.product_id,
-                name=product.name,
-                description=product.description,
-                meta_description=product.meta_description,
-                meta_keyword=product.meta_keyword,
-                tag=product.tag,
-                product_type=product.product_type,
-                price=product.price,
-                sales=product.sales,
-                c_type=product.c_type,
-                c_category=product.c_category,
-                c_manufacturer=product.c_manufacturer,
-                c_product_group=product.c_product_group,
-                if_featured=product.if_featured,
-                if_sellable=product.if_sellable,
-                show_in_store=product.show_in_store,
-                status=product.status,
-                sku_name=product.sku_name,
-                w_description=product.w_description,
-                w_oem=product.w_oem,
-                w_weight=product.w_weight,
-                w_height=product.w_height,
-                w_width=product.w_width,
-                w_depth=product.w_depth,
-                date_added=product.date_added,
-                images=[]
-            )
-            product_schemas.append(product_schema)
+        product_schemas = serialize_product_rows(db, products)
         
         if len(product_schemas) > 0:
             message = f"Found {len(product_schemas)} products matching your voice search: '{search_text}'"
         else:
             message = f"No products found matching your voice search: '{search_text}'. Try different keywords or be more specific."
         
-        return {
+        return ProductJSONResponse({
             "converted_text": search_text,
             "products": product_schemas,
             "total_results": len(product_schemas),
             "message": message
-        }
+        })
         
     except Exception as e:
         print(f"Error in voice search: {e}")
@@ -54,6 +54,13 @@ class Product(ProductBase):
     class Config:
         from_attributes = True
 
+class ProductBatchRequest(BaseModel):
+    ids: List[int]
+
+class ProductBatchResponse(BaseModel):
+    products: List[Product]
+    missing_ids: List[int]
+
 class ChatbotMessageBase(BaseModel):
     message_type: str
     content: str
@@ -0,0 +1,406 @@
+import bisect
+import heapq
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+
+from app import models
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Columns covered by the free-text branch of apply_logical_filters
+TEXT_SEARCH_FIELDS = (
+    "name",
+    "sku_name",
+    "c_manufacturer",
+    "c_category",
+    "c_type",
+    "w_oem",
+    "w_sku_category",
+    "w_primary_category",
+    "w_subcategory",
+    "w_oem_new_pn",
+    "w_oem_repair_pn",
+    "w_freedom_new_pn",
+    "w_freedom_repair_pn",
+)
+
+# Above this many matches an IN list is no cheaper than letting the database scan
+MAX_INDEX_RESULTS = 5000
+
+# Completions kept per cached prefix; requests for more are computed on the fly
+COMPLETION_CACHE_DEPTH = 50
+COMPLETION_CACHE_MAX_ENTRIES = 20000
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    """Split a column value into lowercase alphanumeric tokens"""
+    if not value:
+        return []
+    return TOKEN_PATTERN.findall(value.lower())
+
+
+def trigrams(token: str) -> Set[str]:
+    """Return the character trigrams of a token"""
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+def is_listed(product) -> bool:
+    """Mirror of the inactive/show_in_store/if_sellable gate used by every read endpoint"""
+    return product.inactive == 0 and product.show_in_store == 1 and product.if_sellable == 1
+
+
+class ProductTextIndex:
+    """
+    Tokenized inverted index over the product text columns.
+
+    Answers the same question as OR-ed ``ilike('%term%')`` predicates: which listed
+    products contain ``term`` as a case-insensitive substring of any indexed column.
+    Tokens narrow the candidates (every token of the term is a substring of some
+    column token), a character trigram map over the vocabulary finds those tokens,
+    and the stored lowercase column values confirm the exact substring match.
+    """
+
+    def __init__(self, fields: Sequence[str] = TEXT_SEARCH_FIELDS):
+        self.fields = tuple(fields)
+        self.loaded = False
+        self._lock = threading.RLock()
+        self._documents: Dict[int, tuple] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._fragment_cache: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def build(self, db: Session):
+        """Load every listed product from the database and rebuild the index"""
+        columns = [getattr(models.Product, field) for field in self.fields]
+        rows = (
+            db.query(models.Product.product_id, *columns)
+            .filter(
+                and_(
+                    models.Product.inactive == 0,
+                    models.Product.show_in_store == 1,
+                    models.Product.if_sellable == 1
+                )
+            )
+            .yield_per(5000)
+        )
+        with self._lock:
+            self._documents = {}
+            self._postings = {}
+            self._trigrams = {}
+            self._fragment_cache = {}
+            for row in rows:
+                self._add(row[0], row[1:])
+            self.loaded = True
+        print(f"Text search index built with {len(self._documents)} products")
+
+    def ensure_loaded(self, db: Session):
+        """Build the index on first use"""
+        if self.loaded:
+            return
+        with self._lock:
+            if not self.loaded:
+                self.build(db)
+
+    def upsert(self, product):
+        """Index a created or updated product, dropping it if it is no longer listed"""
+        if not self.loaded:
+            return
+        with self._lock:
+            self._remove(product.product_id)
+            if is_listed(product):
+                self._add(product.product_id, [getattr(product, field) for field in self.fields])
+
+    def remove(self, product_id: int):
+        """Drop a deleted product from the index"""
+        if not self.loaded:
+            return
+        with self._lock:
+            self._remove(product_id)
+
+    def search(
+        self,
+        term: str,
+        fields: Optional[Iterable[str]] = None,
+        db: Optional[Session] = None,
+        max_results: int = MAX_INDEX_RESULTS
+    ) -> Optional[Set[int]]:
+        """
+        Return ids of listed products whose ``fields`` contain ``term``.
+
+        Returns None when the index cannot answer the predicate exactly (LIKE
+        wildcards in the term, no alphanumeric tokens, or too many matches for an
+        IN list to beat a scan) so the caller keeps the SQL ILIKE path.
+        """
+        if db is not None:
+            self.ensure_loaded(db)
+        if not self.loaded:
+            return None
+
+        needle = term.strip().lower()
+        if not needle or "%" in needle or "_" in needle:
+            return None
+        query_tokens = sorted(set(tokenize(needle)), key=len, reverse=True)
+        if not query_tokens:
+            return None
+
+        positions = range(len(self.fields)) if fields is None else [self.fields.index(f) for f in fields]
+
+        with self._lock:
+            candidates: Optional[Set[int]] = None
+            for fragment in query_tokens:
+                matches: Set[int] = set()
+                for token in self._tokens_containing(fragment):
+                    matches |= self._postings[token]
+                candidates = matches if candidates is None else candidates & matches
+                if not candidates:
+                    return set()
+
+            result = set()
+            for product_id in candidates:
+                values = self._documents[product_id]
+                if any(values[i] and needle in values[i] for i in positions):
+                    result.add(product_id)
+                    if len(result) > max_results:
+                        return None
+            return result
+
+    def _tokens_containing(self, fragment: str) -> List[str]:
+        """Vocabulary tokens that contain ``fragment`` as a substring"""
+        cached = self._fragment_cache.get(fragment)
+        if cached is not None:
+            return cached
+        if len(fragment) < 3:
+            tokens = [token for token in self._postings if fragment in token]
+        else:
+            grams = sorted((self._trigrams.get(g, set()) for g in trigrams(fragment)), key=len)
+            shortlist = set.intersection(*grams) if grams else set()
+            tokens = [token for token in shortlist if fragment in token]
+        if len(self._fragment_cache) > 10000:
+            self._fragment_cache.clear()
+        self._fragment_cache[fragment] = tokens
+        return tokens
+
+    def _add(self, product_id: int, values: Sequence[Optional[str]]):
+        lowered = tuple(value.lower() if value else "" for value in values)
+        self._documents[product_id] = lowered
+        for value in lowered:
+            for token in tokenize(value):
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = set()
+                    for gram in trigrams(token):
+                        self._trigrams.setdefault(gram, set()).add(token)
+                    self._fragment_cache.clear()
+                postings.add(product_id)
+
+    def _remove(self, product_id: int):
+        lowered = self._documents.pop(product_id, None)
+        if lowered is None:
+            return
+        for value in lowered:
+            for token in tokenize(value):
+                postings = self._postings.get(token)
+                if postings is None:
+                    continue
+                postings.discard(product_id)
+                if not postings:
+                    del self._postings[token]
+                    for gram in trigrams(token):
+                        bucket = self._trigrams.get(gram)
+                        if bucket is not None:
+                            bucket.discard(token)
+                            if not bucket:
+                                del self._trigrams[gram]
+                    self._fragment_cache.clear()
+
+
+class ProductPrefixIndex:
+    """
+    Sales-weighted prefix index for as-you-type completions.
+
+    Every listed product contributes keys for each word-suffix of its name
+    ("dell gigabit riser", "gigabit riser", "riser"), its SKU (spaced and compact
+    forms) and its tag. A sorted key list answers a prefix with a bisect range;
+    the ranked top ``COMPLETION_CACHE_DEPTH`` ids per prefix are memoized and only
+    the prefixes of keys touched by a write are dropped, so updates stay local.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._lock = threading.RLock()
+        self._products: Dict[int, tuple] = {}
+        self._keys: Dict[str, Set[int]] = {}
+        self._sorted_keys: List[str] = []
+        self._completions: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def build(self, db: Session):
+        """Load every listed product from the database and rebuild the index"""
+        rows = (
+            db.query(
+                models.Product.product_id,
+                models.Product.name,
+                models.Product.sku_name,
+                models.Product.tag,
+                models.Product.sales
+            )
+            .filter(
+                and_(
+                    models.Product.inactive == 0,
+                    models.Product.show_in_store == 1,
+                    models.Product.if_sellable == 1
+                )
+            )
+            .yield_per(5000)
+        )
+        with self._lock:
+            self._products = {}
+            self._keys = {}
+            self._completions = {}
+            for product_id, name, sku_name, tag, sales in rows:
+                keys = self._product_keys(name, sku_name, tag)
+                self._products[product_id] = (name, sales if sales is not None else -1, keys)
+                for key in keys:
+                    self._keys.setdefault(key, set()).add(product_id)
+            self._sorted_keys = sorted(self._keys)
+            self.loaded = True
+        print(f"Suggestion index built with {len(self._products)} products")
+
+    def ensure_loaded(self, db: Session):
+        """Build the index on first use"""
+        if self.loaded:
+            return
+        with self._lock:
+            if not self.loaded:
+                self.build(db)
+
+    def upsert(self, product):
+        """Re-key a created or updated product, dropping it if it is no longer listed"""
+        if not self.loaded:
+            return
+        with self._lock:
+            self._remove(product.product_id)
+            if is_listed(product):
+                keys = self._product_keys(product.name, product.sku_name, product.tag)
+                sales = product.sales if product.sales is not None else -1
+                self._products[product.product_id] = (product.name, sales, keys)
+                for key in keys:
+                    postings = self._keys.get(key)
+                    if postings is None:
+                        postings = self._keys[key] = set()
+                        bisect.insort(self._sorted_keys, key)
+                    postings.add(product.product_id)
+                self._forget_prefixes(keys)
+
+    def remove(self, product_id: int):
+        """Drop a deleted product from the index"""
+        if not self.loaded:
+            return
+        with self._lock:
+            self._remove(product_id)
+
+    def complete(self, prefix: str, limit: int = 10, db: Optional[Session] = None) -> Optional[List[int]]:
+        """
+        Return up to ``limit`` product ids whose name, SKU or tag has a word
+        starting with ``prefix``, ordered by sales then name like the SQL path.
+        Returns None when the index cannot answer so the caller keeps the SQL path.
+        """
+        if db is not None:
+            self.ensure_loaded(db)
+        if not self.loaded:
+            return None
+        spaced = " ".join(tokenize(prefix))
+        if not spaced:
+            return None
+        forms = {spaced, spaced.replace(" ", "")}
+
+        with self._lock:
+            if limit > COMPLETION_CACHE_DEPTH:
+                return self._rank(self._matching(forms), limit)
+            candidates: Set[int] = set()
+            for form in forms:
+                candidates.update(self._cached_completions(form))
+            return self._rank(candidates, limit)
+
+    def name_of(self, product_id: int) -> Optional[str]:
+        entry = self._products.get(product_id)
+        return entry[0] if entry else None
+
+    def _cached_completions(self, prefix: str) -> List[int]:
+        ranked = self._completions.get(prefix)
+        if ranked is None:
+            ranked = self._rank(self._matching([prefix]), COMPLETION_CACHE_DEPTH)
+            if len(self._completions) >= COMPLETION_CACHE_MAX_ENTRIES:
+                self._completions.clear()
+            self._completions[prefix] = ranked
+        return ranked
+
+    def _matching(self, prefixes: Iterable[str]) -> Set[int]:
+        matches: Set[int] = set()
+        for prefix in prefixes:
+            sorted_keys = self._sorted_keys
+            position = bisect.bisect_left(sorted_keys, prefix)
+            while position < len(sorted_keys) and sorted_keys[position].startswith(prefix):
+                matches |= self._keys[sorted_keys[position]]
+                position += 1
+        return matches
+
+    def _rank(self, product_ids: Iterable[int], limit: int) -> List[int]:
+        products = self._products
+        return heapq.nsmallest(
+            limit,
+            product_ids,
+            key=lambda pid: (-products[pid][1], products[pid][0] or "", pid)
+        )
+
+    @staticmethod
+    def _product_keys(name: Optional[str], sku_name: Optional[str], tag: Optional[str]) -> tuple:
+        keys = set()
+        name_tokens = tokenize(name)
+        for i in range(len(name_tokens)):
+            keys.add(" ".join(name_tokens[i:]))
+        for value in (sku_name, tag):
+            value_tokens = tokenize(value)
+            for i in range(len(value_tokens)):
+                keys.add(" ".join(value_tokens[i:]))
+            if value_tokens:
+                keys.add("".join(value_tokens))
+        return tuple(keys)
+
+    def _forget_prefixes(self, keys: Iterable[str]):
+        """Drop memoized completions for every prefix of the given keys"""
+        if not self._completions:
+            return
+        for key in keys:
+            for end in range(1, len(key) + 1):
+                self._completions.pop(key[:end], None)
+
+    def _remove(self, product_id: int):
+        entry = self._products.pop(product_id, None)
+        if entry is None:
+            return
+        keys = entry[2]
+        for key in keys:
+            postings = self._keys.get(key)
+            if postings is None:
+                continue
+            postings.discard(product_id)
+            if not postings:
+                del self._keys[key]
+                position = bisect.bisect_left(self._sorted_keys, key)
+                if position < len(self._sorted_keys) and self._sorted_keys[position] == key:
+                    del self._sorted_keys[position]
+        self._forget_prefixes(keys)
+
+
+product_text_index = ProductTextIndex()
+product_prefix_index = ProductPrefixIndex()
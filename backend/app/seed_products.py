@@ -0,0 +1,173 @@
+"""
+Seed the database with a reproducible synthetic catalog.
+
+Generates products with realistic names, SKUs and part numbers, one or two
+images per product, and order / shipment lines spread over the last
+ACTIVITY_DAYS days. The same ``--seed`` always yields the same rows, so
+benchmark runs against different databases are comparable.
+
+Run from the backend directory against the configured database:
+
+    python -m app.seed_products                 # 500 products
+    python -m app.seed_products --rows 100k
+    python -m app.seed_products --rows 1m --database-url sqlite:///catalog.db
+"""
+import argparse
+import random
+import time
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import create_engine
+
+from app import models
+from app.database import Base
+
+MANUFACTURERS = ["Dell", "HP", "Lenovo", "Cisco", "NetApp", "IBM", "Juniper", "Brocade", "Supermicro", "Fujitsu"]
+CATEGORIES = ["Server", "Storage", "Networking", "Laptop", "Desktop", "Power Supply", "Memory", "Hard Drive"]
+TYPES = ["Part", "System", "Accessory", "Module"]
+WORDS = ["gigabit", "controller", "adapter", "rack", "chassis", "fan", "tray", "caddy", "bezel", "riser",
+         "blade", "switch", "module", "cable", "battery", "sas", "sata", "ssd", "dimm", "ecc"]
+
+# Scale presets accepted by --rows
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+ACTIVITY_DAYS = 120
+ORDERS_PER_PRODUCT = 2
+SHIPMENTS_PER_PRODUCT = 1
+INSERT_BATCH_SIZE = 5000
+
+# Fixed reference time so generated timestamps do not depend on when the seed runs
+EPOCH = 1_760_000_000
+
+
+def parse_rows(value: str) -> int:
+    """Row count from a number or a SCALES preset such as ``100k``"""
+    value = value.strip().lower()
+    return SCALES[value] if value in SCALES else int(value.replace("_", ""))
+
+
+def synthetic_products(count: int, seed: int = 42, detailed: bool = True) -> Iterator[dict]:
+    """Yield product rows with realistic names and part numbers; ``detailed=False`` skips the long description"""
+    rng = random.Random(seed)
+    for product_id in range(1, count + 1):
+        manufacturer = rng.choice(MANUFACTURERS)
+        category = rng.choice(CATEGORIES)
+        part = f"{rng.randint(100, 999)}-{rng.randint(1000, 9999)}"
+        yield {
+            "product_id": product_id,
+            "name": f"{manufacturer} {' '.join(rng.sample(WORDS, 3))} {category}",
+            "sku_name": f"{manufacturer[:3].upper()}{rng.randint(10000, 99999)}",
+            "c_manufacturer": manufacturer,
+            "c_category": category,
+            "c_type": rng.choice(TYPES),
+            "w_oem": manufacturer,
+            "w_sku_category": category,
+            "w_primary_category": category,
+            "w_subcategory": rng.choice(WORDS),
+            "w_oem_new_pn": part,
+            "w_oem_repair_pn": f"{part}-R",
+            "w_freedom_new_pn": f"F{part}",
+            "w_freedom_repair_pn": f"F{part}-R",
+            "tag": rng.choice(WORDS),
+            "description": f"{manufacturer} {category} {part}",
+            "detailed_description": " ".join(rng.choice(WORDS) for _ in range(300)) if detailed else None,
+            "price": round(rng.uniform(5, 5000), 2),
+            "sales": rng.randint(0, 500),
+            "inactive": 0 if rng.random() > 0.05 else 1,
+            "show_in_store": 1,
+            "if_sellable": 1,
+            "date_added": EPOCH - (count - product_id) * 60,
+            "date_modify": EPOCH - (count - product_id) * 30,
+        }
+
+
+def synthetic_images(count: int) -> Iterator[dict]:
+    """Yield one or two image rows per product"""
+    image_id = 0
+    for product_id in range(1, count + 1):
+        for sort in range(1 + product_id % 2):
+            image_id += 1
+            yield {
+                "image_id": image_id,
+                "product_id": product_id,
+                "image_name": f"{product_id}-{sort}.jpg",
+                "image_path": f"https://cdn.example.com/products/{product_id}-{sort}.jpg",
+                "image_sort": sort,
+            }
+
+
+def synthetic_activity(count: int, per_product: int, group_column: str, seed: int, now: Optional[int] = None) -> Iterator[dict]:
+    """
+    Yield order_product / shipment_product lines: ``per_product`` lines per
+    product on average, skewed toward low product ids so some products sell far
+    more than others, with created_at spread over the last ACTIVITY_DAYS days
+    """
+    rng = random.Random(seed)
+    now = now if now is not None else int(time.time())
+    window = ACTIVITY_DAYS * 24 * 60 * 60
+    for line_id in range(1, count * per_product + 1):
+        yield {
+            "id": line_id,
+            "product_id": min(count, int(rng.paretovariate(1.2))) if rng.random() < 0.2 else rng.randint(1, count),
+            group_column: (line_id + 1) // 2,
+            "quantity": rng.randint(1, 4),
+            "created_at": now - rng.randint(0, window),
+        }
+
+
+def insert_batches(conn, table, rows: Iterable[dict], batch_size: int = INSERT_BATCH_SIZE) -> int:
+    """Insert ``rows`` in executemany batches, returning the number inserted"""
+    rows = iter(rows)
+    inserted = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return inserted
+        conn.execute(table.insert(), batch)
+        inserted += len(batch)
+
+
+def seed_catalog(engine, count: int, seed: int = 42, detailed: bool = True, activity: bool = True):
+    """Create the tables on ``engine`` and fill them with ``count`` synthetic products"""
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        products = insert_batches(conn, models.Product.__table__, synthetic_products(count, seed, detailed))
+        images = insert_batches(conn, models.ProductImage.__table__, synthetic_images(count))
+        orders = shipments = 0
+        if activity:
+            orders = insert_batches(
+                conn,
+                models.OrderProduct.__table__,
+                synthetic_activity(count, ORDERS_PER_PRODUCT, "order_id", seed + 1)
+            )
+            shipments = insert_batches(
+                conn,
+                models.ShipmentProduct.__table__,
+                synthetic_activity(count, SHIPMENTS_PER_PRODUCT, "shipment_id", seed + 2)
+            )
+    return {"products": products, "images": images, "orders": orders, "shipments": shipments}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=parse_rows, default=500, help="Product count, or one of 10k / 100k / 1m")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", default=None, help="Defaults to DATABASE_URL / the MySQL settings in .env")
+    parser.add_argument("--lean", action="store_true", help="Skip detailed_description to keep large catalogs small")
+    parser.add_argument("--no-activity", action="store_true", help="Skip order_product and shipment_product")
+    args = parser.parse_args()
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        from app.database import engine
+
+    start = time.perf_counter()
+    counts = seed_catalog(engine, args.rows, args.seed, detailed=not args.lean, activity=not args.no_activity)
+    summary = ", ".join(f"{value} {name}" for name, value in counts.items())
+    print(f"Inserted {summary} in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
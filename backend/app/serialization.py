@@ -0,0 +1,99 @@
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import orjson
+from fastapi.responses import Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+
+# Columns exposed by schemas.Product, in the order pydantic emits them
+PRODUCT_FIELDS = tuple(schemas.ProductBase.model_fields) + ("product_id",)
+PRODUCT_COLUMNS = tuple(getattr(models.Product, field) for field in PRODUCT_FIELDS)
+BOOLEAN_FIELDS = frozenset(
+    field for field, info in schemas.ProductBase.model_fields.items()
+    if info.annotation == Optional[bool]
+)
+
+# Longest id list sent in one IN query; larger sets are looked up in batches
+ID_BATCH_SIZE = 5000
+
+IMAGE_FIELDS = ("image_name", "image_path", "image_sort", "image_id", "product_id")
+IMAGE_COLUMNS = tuple(getattr(models.ProductImage, field) for field in IMAGE_FIELDS)
+
+
+def _default(value):
+    # Pydantic serializes Decimal as a string in JSON mode; keep the wire format identical
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ProductJSONResponse(Response):
+    """JSON response rendered with orjson"""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default)
+
+
+def id_batches(product_ids: List[int]) -> Iterator[List[int]]:
+    for start in range(0, len(product_ids), ID_BATCH_SIZE):
+        yield product_ids[start:start + ID_BATCH_SIZE]
+
+
+def image_query(product_ids: List[int]):
+    return (
+        select(*IMAGE_COLUMNS)
+        .where(models.ProductImage.product_id.in_(product_ids))
+        .order_by(models.ProductImage.image_sort, models.ProductImage.image_id)
+    )
+
+
+def group_images(rows, images: Optional[Dict[int, List[dict]]] = None) -> Dict[int, List[dict]]:
+    images = {} if images is None else images
+    for row in rows:
+        images.setdefault(row.product_id, []).append(dict(zip(IMAGE_FIELDS, row)))
+    return images
+
+
+def load_images(db: Session, product_ids: Iterable[int]) -> Dict[int, List[dict]]:
+    """Fetch the images of many products with one IN query per ID_BATCH_SIZE products"""
+    images: Dict[int, List[dict]] = {}
+    for batch in id_batches(list(product_ids)):
+        group_images(db.execute(image_query(batch)), images)
+    return images
+
+
+async def load_images_async(db: AsyncSession, product_ids: Iterable[int]) -> Dict[int, List[dict]]:
+    """Async variant of load_images"""
+    images: Dict[int, List[dict]] = {}
+    for batch in id_batches(list(product_ids)):
+        group_images(await db.execute(image_query(batch)), images)
+    return images
+
+
+def product_row_to_dict(row, images: List[dict]) -> dict:
+    """Build the schemas.Product payload straight from a projected row"""
+    product = dict(zip(PRODUCT_FIELDS, row))
+    for field in BOOLEAN_FIELDS:
+        if product[field] is not None:
+            product[field] = bool(product[field])
+    product["images"] = images
+    return product
+
+
+def serialize_product_rows(db: Session, rows) -> List[dict]:
+    """Serialize rows selected with PRODUCT_COLUMNS, attaching their images"""
+    rows = list(rows)
+    images = load_images(db, (row.product_id for row in rows))
+    return [product_row_to_dict(row, images.get(row.product_id, [])) for row in rows]
+
+
+async def serialize_product_rows_async(db: AsyncSession, rows) -> List[dict]:
+    """Async variant of serialize_product_rows"""
+    rows = list(rows)
+    images = await load_images_async(db, (row.product_id for row in rows))
+    return [product_row_to_dict(row, images.get(row.product_id, [])) for row in rows]
@@ -0,0 +1,191 @@
+"""
+Slow query log.
+
+Cursor events time every statement on the instrumented engines. Statements
+slower than SLOW_QUERY_THRESHOLD_MS are kept, with the request path that issued
+them (and their bound parameters only when SLOW_QUERY_LOG_PARAMETERS=1, as they
+can carry customer data), in a ring buffer of the last
+SLOW_QUERY_LOG_SIZE entries. A worker thread then runs ``EXPLAIN`` (``EXPLAIN
+QUERY PLAN`` on SQLite) for each SELECT on a separate connection and attaches
+the plan to the entry. The statement's own connection may still have unread
+rows at that point, so the plan cannot be taken inline.
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+from app.metrics import current_request_path
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "100"))
+# Bound parameter values are redacted from entries unless this is set to 1
+SLOW_QUERY_LOG_PARAMETERS = os.getenv("SLOW_QUERY_LOG_PARAMETERS", "0") == "1"
+
+# Longest rendering kept for one bound parameter; feature blobs and the like are cut
+MAX_PARAMETER_LENGTH = 200
+
+# Marks the worker's EXPLAIN connections so their statements are not logged
+EXPLAIN_CONNECTION_KEY = "slow_query_explain"
+
+
+def describe_parameter(value):
+    """JSON-friendly, bounded rendering of one bound parameter"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, Decimal):
+        return str(value)
+    text = str(value)
+    return text if len(text) <= MAX_PARAMETER_LENGTH else text[:MAX_PARAMETER_LENGTH] + "..."
+
+
+def describe_parameters(parameters):
+    if isinstance(parameters, dict):
+        return {key: describe_parameter(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [describe_parameter(value) for value in parameters]
+    return describe_parameter(parameters)
+
+
+def redact_parameters(parameters):
+    """Parameter names, or the count of positional ones, without their values"""
+    if isinstance(parameters, dict):
+        return {key: "<redacted>" for key in parameters}
+    if isinstance(parameters, (list, tuple)):
+        return f"<{len(parameters)} parameters redacted>"
+    return "<redacted>"
+
+
+class SlowQueryLog:
+    """Ring buffer of slow statements with their plans"""
+
+    def __init__(
+        self,
+        threshold_ms: float = SLOW_QUERY_THRESHOLD_MS,
+        size: int = SLOW_QUERY_LOG_SIZE,
+        log_parameters: bool = SLOW_QUERY_LOG_PARAMETERS
+    ):
+        self.threshold_ms = threshold_ms
+        self.log_parameters = log_parameters
+        self._entries: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self.recorded = 0
+        self._pending: "queue.Queue" = queue.Queue(maxsize=size)
+        self._worker: Optional[threading.Thread] = None
+
+    @property
+    def size(self) -> int:
+        return self._entries.maxlen
+
+    def _describe(self, parameters):
+        return describe_parameters(parameters) if self.log_parameters else redact_parameters(parameters)
+
+    def record(self, engine, statement: str, parameters, executemany: bool, duration_ms: float):
+        """Keep one slow statement and queue it for EXPLAIN"""
+        entry = {
+            "id": None,
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(duration_ms, 2),
+            "path": current_request_path(),
+            "statement": statement,
+            "parameters": self._describe(parameters) if not executemany else f"<{len(parameters)} parameter sets>",
+            "plan": None,
+            "plan_error": None,
+        }
+        with self._lock:
+            entry["id"] = self._next_id
+            self._next_id += 1
+            self.recorded += 1
+            self._entries.append(entry)
+        if executemany or not is_explainable(statement):
+            entry["plan_error"] = "EXPLAIN is only captured for single SELECT statements"
+            return
+        self._ensure_worker()
+        try:
+            self._pending.put_nowait((engine, entry, statement, parameters))
+        except queue.Full:
+            entry["plan_error"] = "EXPLAIN queue full"
+
+    def entries(self, limit: Optional[int] = None) -> List[Dict]:
+        """Most recent entries first"""
+        with self._lock:
+            entries = list(reversed(self._entries))
+        return entries if limit is None else entries[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._explain_forever, name="slow-query-explain", daemon=True)
+                self._worker.start()
+
+    def _explain_forever(self):
+        while True:
+            engine, entry, statement, parameters = self._pending.get()
+            try:
+                entry["plan"] = explain(engine, statement, parameters)
+            except Exception as e:
+                entry["plan_error"] = str(e)
+
+
+def is_explainable(statement: str) -> bool:
+    words = statement.split(None, 1)
+    return bool(words) and words[0].upper() in ("SELECT", "WITH")
+
+
+def explain(engine, statement: str, parameters) -> List[Dict]:
+    """Plan rows of ``statement`` as dictionaries"""
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with engine.connect() as conn:
+        conn.info[EXPLAIN_CONNECTION_KEY] = True
+        try:
+            result = conn.exec_driver_sql(prefix + statement, parameters)
+            return [{key: describe_parameter(value) for key, value in row._mapping.items()} for row in result]
+        finally:
+            conn.info.pop(EXPLAIN_CONNECTION_KEY, None)
+
+
+slow_query_log = SlowQueryLog()
+
+
+def instrument_engine(engine, explain_engine=None, log: SlowQueryLog = slow_query_log):
+    """
+    Record statements on ``engine`` slower than the threshold. For an AsyncEngine's
+    sync_engine pass a sync ``explain_engine`` on the same database, since the
+    worker thread cannot drive the async driver.
+    """
+    explain_engine = explain_engine or engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("slow_query_start")
+        if not starts:
+            return
+        duration_ms = (time.perf_counter() - starts.pop()) * 1000
+        if duration_ms >= log.threshold_ms and not conn.info.get(EXPLAIN_CONNECTION_KEY):
+            log.record(explain_engine, statement, parameters, executemany, duration_ms)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        starts = connection.info.get("slow_query_start") if connection is not None else None
+        if starts:
+            starts.pop()
@@ -0,0 +1,197 @@
+"""
+Cache of natural-language to SQL translations for the chat endpoint.
+
+Most chat messages repeat ("featured products", "Dell laptops under 1000"), and
+each OpenAI round trip costs seconds and money. Translations are keyed by the
+normalized message and kept in two tiers: an in-memory LRU of
+SQL_TRANSLATION_MEMORY_ENTRIES, and the ``chat_sql_translation`` table, which
+survives restarts and is shared by every worker. Both expire entries after
+SQL_TRANSLATION_TTL_SECONDS. Lookups are counted per tier on /metrics; hits
+per entry are summed in memory and written to the table in batches, so a hit
+never costs a write of its own.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from app import models
+from app.database import SessionLocal
+from app.metrics import metrics
+
+SQL_TRANSLATION_TTL_SECONDS = int(os.getenv("SQL_TRANSLATION_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+SQL_TRANSLATION_MEMORY_ENTRIES = int(os.getenv("SQL_TRANSLATION_MEMORY_ENTRIES", "1024"))
+
+# Bump when the generation prompt changes so translations made with the old one are not reused
+TRANSLATION_PROMPT_VERSION = 1
+
+# Seconds between deletes of expired rows from the persistent tier
+PURGE_INTERVAL_SECONDS = 3600
+# Seconds between writes of the hit counts accumulated in memory to the persistent tier
+HIT_FLUSH_INTERVAL_SECONDS = 60
+
+MEMORY_TIER = "memory"
+PERSISTENT_TIER = "persistent"
+
+
+def normalize_message(message: str) -> str:
+    """Lower-case, collapse whitespace and drop trailing punctuation so rephrasings share an entry"""
+    return " ".join(message.lower().split()).rstrip("?!. ")
+
+
+def message_key(message: str) -> str:
+    normalized = normalize_message(message)
+    return hashlib.sha256(f"{TRANSLATION_PROMPT_VERSION}:{normalized}".encode("utf-8")).hexdigest()
+
+
+class SqlTranslationCache:
+    """Two-tier TTL cache from user messages to generated SQL"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = SessionLocal,
+        ttl_seconds: int = SQL_TRANSLATION_TTL_SECONDS,
+        max_entries: int = SQL_TRANSLATION_MEMORY_ENTRIES,
+        clock: Callable[[], float] = time.time
+    ):
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {
+            MEMORY_TIER: {"hits": 0, "misses": 0},
+            PERSISTENT_TIER: {"hits": 0, "misses": 0},
+        }
+        self._purged_at = 0.0
+        self._pending_hits: Dict[str, int] = {}
+        self._hits_flushed_at = clock()
+
+    def _count(self, tier: str, hit: bool):
+        with self._lock:
+            self._counters[tier]["hits" if hit else "misses"] += 1
+        metrics.record_translation_lookup(tier, "hit" if hit else "miss")
+
+    def get(self, message: str) -> Optional[str]:
+        """Cached SQL for ``message``, or None when the LLM has to be asked"""
+        key = message_key(message)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._pending_hits[key] = self._pending_hits.get(key, 0) + 1
+        if entry is not None:
+            self._count(MEMORY_TIER, True)
+            self._flush_hits(now)
+            return entry[1]
+        self._count(MEMORY_TIER, False)
+
+        if self.session_factory is None:
+            return None
+        try:
+            with self.session_factory() as db:
+                row = db.get(models.SqlTranslation, key)
+                if row is None or row.expires_at <= now:
+                    self._count(PERSISTENT_TIER, False)
+                    return None
+                expires_at, sql_query = row.expires_at, row.sql_query
+        except Exception as e:
+            print(f"SQL translation cache read error: {e}")
+            return None
+        self._count(PERSISTENT_TIER, True)
+        self._remember(key, expires_at, sql_query)
+        with self._lock:
+            self._pending_hits[key] = self._pending_hits.get(key, 0) + 1
+        self._flush_hits(now)
+        return sql_query
+
+    def put(self, message: str, sql_query: str):
+        key = message_key(message)
+        now = self.clock()
+        expires_at = now + self.ttl_seconds
+        self._remember(key, expires_at, sql_query)
+
+        if self.session_factory is None:
+            return
+        try:
+            with self.session_factory() as db:
+                db.merge(models.SqlTranslation(
+                    message_key=key,
+                    message=normalize_message(message),
+                    sql_query=sql_query,
+                    created_at=int(now),
+                    expires_at=int(expires_at),
+                    hits=0
+                ))
+                if now - self._purged_at >= PURGE_INTERVAL_SECONDS:
+                    db.query(models.SqlTranslation).filter(models.SqlTranslation.expires_at <= int(now)).delete()
+                    self._purged_at = now
+                db.commit()
+        except Exception as e:
+            print(f"SQL translation cache write error: {e}")
+
+    def _flush_hits(self, now: float):
+        """Add the accumulated hit counts to the table, at most every HIT_FLUSH_INTERVAL_SECONDS"""
+        with self._lock:
+            if not self._pending_hits or now - self._hits_flushed_at < HIT_FLUSH_INTERVAL_SECONDS:
+                return
+            pending, self._pending_hits = self._pending_hits, {}
+            self._hits_flushed_at = now
+        if self.session_factory is None:
+            return
+        try:
+            with self.session_factory() as db:
+                for key, count in pending.items():
+                    db.query(models.SqlTranslation).filter(models.SqlTranslation.message_key == key).update(
+                        {models.SqlTranslation.hits: models.SqlTranslation.hits + count}, synchronize_session=False
+                    )
+                db.commit()
+        except Exception as e:
+            print(f"SQL translation cache hit count error: {e}")
+
+    def _remember(self, key: str, expires_at: float, sql_query: str):
+        with self._lock:
+            self._entries[key] = (expires_at, sql_query)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Forget every translation in both tiers"""
+        with self._lock:
+            self._entries.clear()
+            self._pending_hits.clear()
+        if self.session_factory is None:
+            return
+        try:
+            with self.session_factory() as db:
+                db.query(models.SqlTranslation).delete()
+                db.commit()
+        except Exception as e:
+            print(f"SQL translation cache clear error: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            tiers = {}
+            for tier, counters in self._counters.items():
+                lookups = counters["hits"] + counters["misses"]
+                tiers[tier] = {**counters, "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0}
+            memory_lookups = self._counters[MEMORY_TIER]["hits"] + self._counters[MEMORY_TIER]["misses"]
+            hits = self._counters[MEMORY_TIER]["hits"] + self._counters[PERSISTENT_TIER]["hits"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": round(hits / memory_lookups, 4) if memory_lookups else 0.0,
+                "tiers": tiers,
+            }
+
+
+sql_translation_cache = SqlTranslationCache()
@@ -0,0 +1,168 @@
+"""
+Reproducible benchmarks of the request hot paths.
+
+External services are stubbed so only our own code and the database are timed:
+the OpenAI call returns a fixed SQL statement (measured with the translation
+cache missing and hitting), image search runs on a random feature matrix
+instead of ResNet output, and voice search starts from the text Google ASR
+would return.
+
+Run from the backend directory after `pip install -r requirements-dev.txt`:
+
+    python -m pytest benchmarks/bench_hot_paths.py
+    BENCH_ROWS=100k python -m pytest benchmarks/bench_hot_paths.py --benchmark-json=hot_paths.json
+"""
+import asyncio
+import os
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from fastapi import Request, Response
+
+from app.routers import llm, products
+from app.sql_translation_cache import SqlTranslationCache
+
+# Feature rows for the image-search benchmark; ResNet-50 logits are 1000 wide
+IMAGE_ROWS = int(os.getenv("BENCH_IMAGE_ROWS", "20000"))
+FEATURE_WIDTH = 1000
+
+STUB_SQL = "SELECT * FROM product WHERE c_manufacturer LIKE '%Dell%' AND price <= 500 LIMIT 50"
+
+
+def plain_request() -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+
+
+@pytest.fixture(scope="module", autouse=True)
+def warm_indexes(catalog):
+    """Build the in-memory indexes once, outside the measured calls"""
+    db = catalog[0]()
+    products.product_text_index.ensure_loaded(db)
+    products.product_prefix_index.ensure_loaded(db)
+    products.product_relevance_index.ensure_loaded(db)
+    products.catalog_snapshot.refresh(db)
+    db.close()
+
+
+def test_products_text_search(measure, db):
+    measure(
+        products.search_products,
+        search="gigabit controller", category=None, manufacturer=None, type=None,
+        min_price=None, max_price=None, limit=50, offset=0, db=db
+    )
+
+
+def test_products_structured_search(measure, db):
+    measure(
+        products.search_products,
+        search=None, category="server", manufacturer="dell", type=None,
+        min_price=Decimal("100"), max_price=Decimal("2500"), limit=50, offset=0, db=db
+    )
+
+
+def test_products_advanced_search(measure, db, catalog):
+    sku = catalog[1][len(catalog[1]) // 2]["sku_name"]
+    measure(products.advanced_search_products, query=f"{sku} OR riser", limit=50, db=db)
+
+
+def test_products_suggestions(measure, db):
+    measure(products.get_product_suggestions, query="dell ri", db=db)
+
+
+def test_products_keyset_page(measure, db):
+    measure(
+        lambda: products.get_all_products(
+            request=plain_request(), response=Response(), cursor=None, limit=100, stream=False, db=db
+        )
+    )
+
+
+def test_products_batch(measure, db):
+    measure(products.get_products_batch, list(range(1, 201, 2)), db)
+
+
+@pytest.fixture
+def stub_model(monkeypatch):
+    async def complete(messages, **params):
+        return STUB_SQL
+
+    monkeypatch.setattr(llm, "chat_completion_client", SimpleNamespace(complete=complete))
+
+
+def chat(message: str, db):
+    return asyncio.run(llm.chat_with_bot(llm.ChatRequest(message=message), db))
+
+
+def test_llm_chat_translation_miss(measure, db, catalog, stub_model, monkeypatch):
+    # A zero TTL makes every lookup miss while still paying for the persistent write
+    monkeypatch.setattr(llm, "sql_translation_cache", SqlTranslationCache(session_factory=catalog[0], ttl_seconds=0))
+    response = measure(chat, "dell parts under $500", db)
+    assert response.generated_sql == STUB_SQL
+
+
+def test_llm_chat_translation_hit(measure, db, catalog, stub_model, monkeypatch):
+    monkeypatch.setattr(llm, "sql_translation_cache", SqlTranslationCache(session_factory=catalog[0]))
+    llm.sql_translation_cache.put("dell parts under $500", STUB_SQL)
+    response = measure(chat, "Dell parts under $500?", db)
+    assert response.generated_sql == STUB_SQL
+
+
+def test_llm_chat_fast_path(measure, db, catalog, monkeypatch):
+    async def complete(messages, **params):
+        raise AssertionError("a structured message must not reach the model")
+
+    monkeypatch.setattr(llm, "chat_completion_client", SimpleNamespace(complete=complete))
+    response = measure(chat, "dell servers under $500", db)
+    assert "LIMIT" in response.generated_sql
+    assert all(product.price <= 500 for product in response.products)
+
+
+def test_llm_chat_stream(measure, catalog, stub_model, monkeypatch, benchmark):
+    monkeypatch.setattr(llm, "sql_translation_cache", SqlTranslationCache(session_factory=None))
+    monkeypatch.setattr(llm, "SessionLocal", catalog[0])
+    first_products = []
+
+    async def consume():
+        start = time.perf_counter()
+        events = []
+        async for event in llm.chat_event_stream("dell parts under $500"):
+            if event.startswith("event: products") and len(events) == 1:
+                # Right after the sql event: the time to the first products
+                first_products.append(time.perf_counter() - start)
+            events.append(event)
+        return events
+
+    events = measure(lambda: asyncio.run(consume()))
+    assert events[0].startswith("event: sql") and events[-1].startswith("event: summary")
+    benchmark.extra_info["first_products_p50_ms"] = round(sorted(first_products)[len(first_products) // 2] * 1000, 3)
+
+
+def test_image_search_similarity(measure, monkeypatch):
+    image_search = pytest.importorskip("app.routers.image_search")
+    rng = np.random.default_rng(42)
+    features = rng.standard_normal((IMAGE_ROWS, FEATURE_WIDTH), dtype=np.float32)
+    info = [
+        {
+            "image_id": row + 1, "product_id": row // 2 + 1, "product_name": f"product {row // 2 + 1}",
+            "brand": "Dell", "price": 10.0, "image_path": f"https://cdn.example.com/{row}.jpg",
+        }
+        for row in range(IMAGE_ROWS)
+    ]
+    monkeypatch.setattr(image_search, "image_features", features)
+    monkeypatch.setattr(image_search, "product_info", info)
+    query = features[IMAGE_ROWS // 3] + rng.standard_normal(FEATURE_WIDTH, dtype=np.float32) * 0.05
+    results = measure(image_search.find_similar_images, query)
+    assert results and results[0]["product_id"] == info[IMAGE_ROWS // 3]["product_id"]
+
+
+def test_voice_search_after_asr(measure, db):
+    voice_search = pytest.importorskip("app.routers.voice_search")
+
+    def search(text):
+        rows = voice_search.search_products_by_text(db, text, limit=50)
+        return voice_search.serialize_product_rows(db, rows)
+
+    measure(search, "dell riser")
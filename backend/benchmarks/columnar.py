@@ -0,0 +1,79 @@
+"""
+Compare SQL evaluation of the /products/search structured filters with the
+columnar catalog snapshot.
+
+Run from the backend directory:
+
+    python -m benchmarks.columnar --rows 1000000
+"""
+import argparse
+import time
+from decimal import Decimal
+
+from sqlalchemy import and_
+
+from app import models
+from app.columnar import CatalogSnapshot
+from benchmarks.common import sqlite_catalog, timed
+
+FILTERS = [
+    {"category": "server"},
+    {"manufacturer": "dell", "type": "part"},
+    {"min_price": Decimal("100"), "max_price": Decimal("250.50")},
+    {"category": "storage", "manufacturer": "netapp", "max_price": Decimal("1000")},
+    {"manufacturer": "o"},
+]
+
+
+def sql_filter_ids(session, limit, category=None, manufacturer=None, type=None, min_price=None, max_price=None):
+    query = session.query(models.Product.product_id).filter(
+        and_(
+            models.Product.inactive == 0,
+            models.Product.show_in_store == 1,
+            models.Product.if_sellable == 1
+        )
+    )
+    if category:
+        query = query.filter(models.Product.c_category.ilike(f"%{category}%"))
+    if manufacturer:
+        query = query.filter(models.Product.c_manufacturer.ilike(f"%{manufacturer}%"))
+    if type:
+        query = query.filter(models.Product.c_type.ilike(f"%{type}%"))
+    if min_price is not None:
+        query = query.filter(models.Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(models.Product.price <= max_price)
+    query = query.order_by(models.Product.product_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return [product_id for (product_id,) in query]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=None, help="Page size; all matches when omitted")
+    args = parser.parse_args()
+
+    Session, _ = sqlite_catalog(args.rows, detailed=False)
+    session = Session()
+
+    snapshot = CatalogSnapshot()
+    start = time.perf_counter()
+    snapshot.build(session)
+    print(f"Snapshot build: {(time.perf_counter() - start) * 1000:.0f} ms for {len(snapshot)} products")
+
+    print(f"{'filters':<58}{'matches':>9}{'sql ms':>10}{'snapshot ms':>13}{'speedup':>9}")
+    for filters in FILTERS:
+        sql_ms, expected = timed(lambda: sql_filter_ids(session, args.limit, **filters), args.repeat)
+        snapshot_ms, actual = timed(lambda: snapshot.filter_ids(session, limit=args.limit, **filters), args.repeat)
+        assert actual == expected, f"snapshot and SQL disagree for {filters!r}"
+        label = ", ".join(f"{key}={value}" for key, value in filters.items())
+        print(f"{label:<58}{len(expected):>9}{sql_ms:>10.2f}{snapshot_ms:>13.2f}{sql_ms / snapshot_ms:>8.1f}x")
+
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
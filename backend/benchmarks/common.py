@@ -0,0 +1,34 @@
+"""Shared fixtures for the benchmark scripts"""
+import os
+import statistics
+import tempfile
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.seed_products import seed_catalog, synthetic_products
+
+
+def sqlite_catalog(count: int, path: Optional[str] = None, detailed: bool = True, activity: bool = False):
+    """
+    Create a throwaway SQLite catalog holding ``count`` synthetic products and
+    their images (plus order and shipment lines with ``activity``), seeded by
+    app.seed_products
+    """
+    path = path or os.path.join(tempfile.mkdtemp(), "catalog.db")
+    engine = create_engine(f"sqlite:///{path}")
+    seed_catalog(engine, count, detailed=detailed, activity=activity)
+    return sessionmaker(bind=engine), list(synthetic_products(count, detailed=detailed))
+
+
+def timed(fn, repeat):
+    """Median wall time of ``fn`` in milliseconds and its last result"""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
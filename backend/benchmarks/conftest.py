@@ -0,0 +1,78 @@
+"""
+Fixtures and reporting for the pytest-benchmark suite in bench_hot_paths.py.
+
+The catalog is a throwaway SQLite database seeded by app.seed_products with
+BENCH_ROWS products (10k by default; 100k and 1m are accepted). Every benchmark
+reports p50 / p99 latency and the peak traced allocation of one call, both in
+``extra_info`` (visible with --benchmark-json) and in a table at the end of the run.
+"""
+import math
+import os
+import tracemalloc
+
+import pytest
+
+from app.result_cache import result_cache
+from app.seed_products import parse_rows
+from benchmarks.common import sqlite_catalog
+
+BENCH_ROWS = parse_rows(os.getenv("BENCH_ROWS", "10k"))
+BENCH_ROUNDS = int(os.getenv("BENCH_ROUNDS", "50"))
+
+_report = []
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+@pytest.fixture(scope="session")
+def catalog():
+    """(sessionmaker, product rows) of the seeded benchmark catalog"""
+    return sqlite_catalog(BENCH_ROWS, detailed=False, activity=True)
+
+
+@pytest.fixture
+def db(catalog):
+    session = catalog[0]()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def measure(benchmark):
+    """
+    ``measure(fn, *args)`` benchmarks ``fn`` for BENCH_ROUNDS rounds with the
+    result cache cleared before each one, so the hot path itself is timed, then
+    traces the allocations of one more call
+    """
+    def run(fn, *args, **kwargs):
+        result = benchmark.pedantic(fn, args=args, kwargs=kwargs, setup=result_cache.invalidate, rounds=BENCH_ROUNDS)
+
+        result_cache.invalidate()
+        tracemalloc.start()
+        fn(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        stats = getattr(benchmark, "stats", None)
+        samples = stats.stats.data if stats is not None else []
+        if samples:
+            benchmark.extra_info["p50_ms"] = round(percentile(samples, 0.50) * 1000, 3)
+            benchmark.extra_info["p99_ms"] = round(percentile(samples, 0.99) * 1000, 3)
+        benchmark.extra_info["peak_alloc_kib"] = round(peak / 1024, 1)
+        _report.append((benchmark.name, benchmark.extra_info.get("p50_ms"), benchmark.extra_info.get("p99_ms"), peak))
+        return result
+    return run
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _report:
+        return
+    terminalreporter.section(f"hot paths ({BENCH_ROWS} products)")
+    terminalreporter.write_line(f"{'benchmark':<48}{'p50 ms':>10}{'p99 ms':>10}{'peak KiB':>12}")
+    for name, p50, p99, peak in _report:
+        p50_text = f"{p50:.3f}" if p50 is not None else "-"
+        p99_text = f"{p99:.3f}" if p99 is not None else "-"
+        terminalreporter.write_line(f"{name:<48}{p50_text:>10}{p99_text:>10}{peak / 1024:>12.1f}")
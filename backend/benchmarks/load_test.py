@@ -0,0 +1,114 @@
+"""
+Compare the sync /products endpoints with their /async/products twins under
+concurrent load. Both routers are served by one uvicorn process over the same
+SQLite catalog (sqlite:// for the sync engine, sqlite+aiosqlite:// for the
+async one) and hammered by ``--clients`` concurrent HTTP clients.
+
+Run from the backend directory:
+
+    python -m benchmarks.load_test --rows 20000 --clients 200 --requests 2000
+
+Point DATABASE_URL / ASYNC_DATABASE_URL at MySQL and pass --no-seed to measure
+against a real catalog instead.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+
+SEARCHES = ["dell rack", "sas controller", "hp chassis", "cisco switch", "lenovo riser", "DEL12345"]
+
+
+def build_app():
+    from fastapi import FastAPI
+
+    from app.routers import products, products_async
+
+    app = FastAPI()
+    app.include_router(products.router)
+    app.include_router(products_async.router)
+    return app
+
+
+def start_server(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", timeout_keep_alive=120))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run_load(base_url: str, prefix: str, clients: int, total: int):
+    """Fire ``total`` search requests from ``clients`` concurrent workers"""
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def worker():
+            nonlocal errors
+            for index in counter:
+                params = {"search": SEARCHES[index % len(SEARCHES)], "max_price": 100}
+                start = time.perf_counter()
+                try:
+                    response = await client.get(f"{prefix}/search", params=params)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append((time.perf_counter() - start) * 1000)
+                if not ok:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "throughput": total / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--no-seed", action="store_true", help="Use DATABASE_URL / ASYNC_DATABASE_URL as they are")
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        path = os.path.join(tempfile.mkdtemp(), "catalog.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+        os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+        from benchmarks.common import sqlite_catalog
+        sqlite_catalog(args.rows, path)
+
+    server = start_server(build_app(), args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        print(f"{args.clients} clients, {args.requests} requests, {args.rows} products")
+        for label, prefix in (("sync", "/products"), ("async", "/async/products")):
+            asyncio.run(run_load(base_url, prefix, args.clients, min(args.requests, 50)))  # warm up
+            stats = asyncio.run(run_load(base_url, prefix, args.clients, args.requests))
+            print(
+                f"{label:>5}: {stats['throughput']:8.1f} req/s  p50 {stats['p50']:8.1f} ms  "
+                f"p99 {stats['p99']:8.1f} ms  errors {stats['errors']}"
+            )
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
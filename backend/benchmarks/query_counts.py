@@ -0,0 +1,123 @@
+"""
+Count the SQL statements each product-returning endpoint issues and fail if any
+grows with the number of products returned (the N+1 image loading pattern).
+
+Run from the backend directory:
+
+    python -m benchmarks.query_counts --rows 2000
+
+tests/test_query_counts.py asserts the same bound under pytest.
+"""
+import argparse
+import json
+import sys
+from typing import Callable, Dict, List, Tuple
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import event
+
+from app import schemas
+from app.rollups import best_seller_rollup, recent_purchases, recent_shipments
+from app.routers import products
+from benchmarks.common import sqlite_catalog
+
+# Main query, one image IN query, and the id lookup some endpoints run first
+MAX_QUERIES_PER_REQUEST = 3
+# selectinload and the batched loaders issue one IN query per this many parents
+IN_BATCH_SIZE = 500
+
+response_adapter = TypeAdapter(List[schemas.Product])
+
+
+def plain_request() -> Request:
+    """A GET without conditional headers, for endpoints that read If-None-Match"""
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+
+
+def render(result) -> int:
+    """Serialize like FastAPI so lazy relationship loads fire; return the product count"""
+    if isinstance(result, list):
+        return len(response_adapter.dump_python(response_adapter.validate_python(result, from_attributes=True)))
+    if isinstance(result, dict):
+        return len(result["products"])
+    if hasattr(result, "body"):
+        return len(json.loads(result.body))
+    schemas.Product.model_validate(result).model_dump()
+    return 1
+
+
+def product_requests(sku: str) -> Dict[str, Callable]:
+    """Each product-returning endpoint, called directly with a session ``db``; ``sku`` is searched for"""
+    return {
+        "GET /products/?limit=200": lambda db: products.get_all_products(
+            request=plain_request(), response=Response(), cursor=None, limit=200, stream=False, db=db
+        ),
+        "GET /products/": lambda db: products.get_all_products(
+            request=plain_request(), response=Response(), cursor=None, limit=None, stream=False, db=db
+        ),
+        "GET /products/search": lambda db: products.search_products(search="gigabit controller", limit=None, offset=0, db=db),
+        "GET /products/advanced-search": lambda db: products.advanced_search_products(query=f"{sku} OR RISER", limit=50, db=db),
+        "GET /products/suggestions-detailed": lambda db: products.get_detailed_product_suggestions(query="dell", limit=10, db=db),
+        "GET /products/best-sellers": lambda db: products.get_best_sellers(request=plain_request(), db=db),
+        "GET /products/recently-purchased": lambda db: products.get_recently_purchased(days=7, db=db),
+        "GET /products/recently-shipped": lambda db: products.get_recently_shipped(days=7, db=db),
+        "GET /products/{id}": lambda db: products.get_product_by_id(
+            product_id=1, request=plain_request(), response=Response(), db=db
+        ),
+    }
+
+
+def warm(Session):
+    """Build the in-memory indexes and rollups outside the measured requests"""
+    db = Session()
+    products.product_text_index.ensure_loaded(db)
+    products.product_prefix_index.ensure_loaded(db)
+    products.product_relevance_index.ensure_loaded(db)
+    best_seller_rollup.refresh(db)
+    recent_purchases.refresh(db, force=True)
+    recent_shipments.refresh(db, force=True)
+    db.close()
+
+
+def allowed_queries(returned: int) -> int:
+    return MAX_QUERIES_PER_REQUEST + returned // IN_BATCH_SIZE
+
+
+def count_queries(Session, statements: list, request) -> Tuple[int, int]:
+    """(products returned, statements issued) for one request on a fresh session"""
+    db = Session()
+    statements.clear()
+    returned = render(request(db))
+    db.close()
+    return returned, len(statements)
+
+
+def record_statements(Session) -> list:
+    """List that collects every statement run on the catalog's engine"""
+    statements = []
+    event.listen(Session.kw["bind"], "before_cursor_execute", lambda *a: statements.append(a[2]))
+    return statements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    Session, rows = sqlite_catalog(args.rows, activity=True)
+    statements = record_statements(Session)
+    warm(Session)
+
+    failures = 0
+    for name, request in product_requests(rows[0]["sku_name"]).items():
+        returned, issued = count_queries(Session, statements, request)
+        status = "ok" if issued <= allowed_queries(returned) else "TOO MANY"
+        failures += status != "ok"
+        print(f"{name:<40}{returned:>7} products {issued:>5} queries  {status}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
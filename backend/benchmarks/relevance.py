@@ -0,0 +1,52 @@
+"""
+Time BM25 top-k ranking against ranking the full match set.
+
+Run from the backend directory:
+
+    python -m benchmarks.relevance --rows 100000
+"""
+import argparse
+import time
+
+from app.relevance import ProductRelevanceIndex, relevance_terms
+from benchmarks.common import sqlite_catalog, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    Session, rows = sqlite_catalog(args.rows)
+    session = Session()
+
+    index = ProductRelevanceIndex()
+    start = time.perf_counter()
+    index.build(session)
+    print(f"Index build: {(time.perf_counter() - start) * 1000:.0f} ms for {len(index)} listed products")
+
+    sample = rows[len(rows) // 2]
+    queries = [
+        sample["sku_name"],
+        sample["w_oem_new_pn"],
+        sample["w_oem_new_pn"][:3],
+        "gigabit controller",
+        "dell riser",
+        "power supply",
+    ]
+
+    print(f"{'query':<22}{'top1 is sample':>15}{'top-k ms':>10}{'full ms':>10}")
+    for query in queries:
+        terms = relevance_terms(query)
+        top_ms, top = timed(lambda: index.rank(terms, limit=args.limit), args.repeat)
+        full_ms, ranked = timed(lambda: index.rank(terms), args.repeat)
+        assert top == ranked[:args.limit], f"top-k and full ranking disagree for {query!r}"
+        print(f"{query:<22}{str(bool(top) and top[0] == sample['product_id']):>15}{top_ms:>10.2f}{full_ms:>10.2f}")
+
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compare full-ORM + pydantic serialization of product lists with projected
+rows + orjson, as used by /products/search and the other list endpoints.
+
+Run from the backend directory:
+
+    python -m benchmarks.serialization --rows 20000
+"""
+import argparse
+import json
+import tracemalloc
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import and_
+
+from app import models, schemas
+from app.serialization import PRODUCT_COLUMNS, ProductJSONResponse, serialize_product_rows
+from benchmarks.common import sqlite_catalog, timed
+
+LISTED = and_(
+    models.Product.inactive == 0,
+    models.Product.show_in_store == 1,
+    models.Product.if_sellable == 1
+)
+
+response_adapter = TypeAdapter(List[schemas.Product])
+
+
+def orm_response(Session, size):
+    """What FastAPI does for response_model=List[schemas.Product] over ORM rows"""
+    db = Session()
+    try:
+        products = db.query(models.Product).filter(LISTED).limit(size).all()
+        validated = response_adapter.validate_python(products, from_attributes=True)
+        return json.dumps(response_adapter.dump_python(validated, mode="json")).encode()
+    finally:
+        db.close()
+
+
+def projected_response(Session, size):
+    db = Session()
+    try:
+        rows = db.query(*PRODUCT_COLUMNS).filter(LISTED).limit(size).all()
+        return ProductJSONResponse(serialize_product_rows(db, rows)).body
+    finally:
+        db.close()
+
+
+def peak_kib(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    Session, _ = sqlite_catalog(args.rows)
+
+    print(f"{'rows':>6}{'orm ms':>10}{'lean ms':>10}{'orm KiB':>11}{'lean KiB':>11}")
+    for size in (50, 500, 5000):
+        before = orm_response(Session, size)
+        after = projected_response(Session, size)
+        assert json.loads(before) == json.loads(after), "payloads differ"
+        orm_ms, _ = timed(lambda: orm_response(Session, size), args.repeat)
+        lean_ms, _ = timed(lambda: projected_response(Session, size), args.repeat)
+        orm_kib = peak_kib(lambda: orm_response(Session, size))
+        lean_kib = peak_kib(lambda: projected_response(Session, size))
+        print(f"{size:>6}{orm_ms:>10.1f}{lean_ms:>10.1f}{orm_kib:>11.0f}{lean_kib:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compare the ILIKE suggestion query with the sales-weighted prefix index.
+
+Run from the backend directory:
+
+    python -m benchmarks.suggestions --rows 100000
+"""
+import argparse
+import time
+
+from sqlalchemy import and_, or_
+
+from app import models
+from app.search_index import ProductPrefixIndex
+from benchmarks.common import sqlite_catalog, timed
+
+
+def ilike_suggestions(session, query):
+    rows = (
+        session.query(models.Product.name)
+        .filter(
+            and_(
+                models.Product.inactive == 0,
+                models.Product.show_in_store == 1,
+                models.Product.if_sellable == 1,
+                or_(
+                    models.Product.name.ilike(f"%{query}%"),
+                    models.Product.description.ilike(f"%{query}%"),
+                    models.Product.meta_description.ilike(f"%{query}%"),
+                    models.Product.meta_keyword.ilike(f"%{query}%"),
+                    models.Product.tag.ilike(f"%{query}%"),
+                    models.Product.sku_name.ilike(f"%{query}%")
+                )
+            )
+        )
+        .order_by(models.Product.sales.desc(), models.Product.name)
+        .limit(10)
+        .all()
+    )
+    return [name for (name,) in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    Session, rows = sqlite_catalog(args.rows)
+    session = Session()
+
+    index = ProductPrefixIndex()
+    start = time.perf_counter()
+    index.build(session)
+    print(f"Index build: {(time.perf_counter() - start) * 1000:.0f} ms for {len(index)} listed products")
+
+    sku = rows[len(rows) // 2]["sku_name"]
+    prefixes = ["d", "de", "del", "dell gig", "ris", sku[:4], sku]
+
+    print(f"{'prefix':<14}{'ilike ms':>11}{'cold index us':>15}{'warm index us':>15}")
+    for prefix in prefixes:
+        ilike_ms, _ = timed(lambda: ilike_suggestions(session, prefix), 3)
+        index._completions.clear()
+        cold_ms, _ = timed(lambda: index.complete(prefix), 1)
+        warm_ms, _ = timed(lambda: index.complete(prefix), args.repeat)
+        print(f"{prefix:<14}{ilike_ms:>11.2f}{cold_ms * 1000:>15.1f}{warm_ms * 1000:>15.1f}")
+
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
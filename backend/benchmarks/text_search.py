@@ -0,0 +1,76 @@
+"""
+Compare the ILIKE text-search path with the in-memory inverted index.
+
+Run from the backend directory:
+
+    python -m benchmarks.text_search --rows 100000
+"""
+import argparse
+import time
+
+from sqlalchemy import and_, or_
+
+from app import models
+from app.search_index import TEXT_SEARCH_FIELDS, ProductTextIndex
+from benchmarks.common import sqlite_catalog, timed
+
+
+def listed_ids(session):
+    return session.query(models.Product.product_id).filter(
+        and_(
+            models.Product.inactive == 0,
+            models.Product.show_in_store == 1,
+            models.Product.if_sellable == 1
+        )
+    )
+
+
+def ilike_search(session, term):
+    predicates = [getattr(models.Product, field).ilike(f"%{term}%") for field in TEXT_SEARCH_FIELDS]
+    return {row[0] for row in listed_ids(session).filter(or_(*predicates)).all()}
+
+
+def index_search(session, index, term):
+    product_ids = index.search(term)
+    if product_ids is None:
+        return ilike_search(session, term)
+    return {row[0] for row in listed_ids(session).filter(models.Product.product_id.in_(product_ids)).all()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    Session, rows = sqlite_catalog(args.rows)
+    session = Session()
+
+    index = ProductTextIndex()
+    start = time.perf_counter()
+    index.build(session)
+    print(f"Index build: {(time.perf_counter() - start) * 1000:.0f} ms for {len(index)} listed products")
+
+    sample = rows[len(rows) // 2]
+    terms = [
+        sample["sku_name"],
+        sample["w_oem_new_pn"],
+        sample["w_oem_new_pn"][:5],
+        "gigabit controller",
+        "supermicro",
+        "riser",
+        "power supply",
+    ]
+
+    print(f"{'term':<22}{'matches':>9}{'ilike ms':>11}{'index ms':>11}{'speedup':>9}")
+    for term in terms:
+        ilike_ms, expected = timed(lambda: ilike_search(session, term), args.repeat)
+        index_ms, actual = timed(lambda: index_search(session, index, term), args.repeat)
+        assert actual == expected, f"index and ILIKE disagree for {term!r}"
+        print(f"{term:<22}{len(expected):>9}{ilike_ms:>11.2f}{index_ms:>11.2f}{ilike_ms / index_ms:>8.1f}x")
+
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
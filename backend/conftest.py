@@ -0,0 +1,11 @@
+"""
+Shared pytest setup for tests/ and benchmarks/: point the app's engines at a
+throwaway SQLite file unless DATABASE_URL is set, so importing app.database
+needs no MySQL server. Each suite seeds its own catalog.
+"""
+import os
+import tempfile
+
+_default_db = os.path.join(tempfile.mkdtemp(), "app.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_default_db}")
+os.environ.setdefault("ASYNC_DATABASE_URL", f"sqlite+aiosqlite:///{_default_db}")
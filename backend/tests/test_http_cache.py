@@ -0,0 +1,46 @@
+"""
+The catalog fingerprint behind the list and facets ETags moves on writes made
+outside the API: image rows the list responses embed, and edits to rows other
+than the most recently modified one.
+"""
+import pytest
+from sqlalchemy import text
+
+from app.http_cache import catalog_fingerprint, catalog_version
+from benchmarks.common import sqlite_catalog
+
+
+@pytest.fixture
+def db():
+    Session, _ = sqlite_catalog(50)
+    session = Session()
+    yield session
+    session.close()
+
+
+def fingerprint_after(db, statement: str) -> tuple:
+    before = catalog_fingerprint(db)
+    db.execute(text(statement))
+    db.commit()
+    # External writes are only seen once the cached fingerprint expires
+    catalog_version.bump()
+    after = catalog_fingerprint(db)
+    assert after != before, statement
+    return after
+
+
+def test_image_writes_change_the_fingerprint(db):
+    fingerprint_after(
+        db,
+        "INSERT INTO product_image (product_id, image_name, image_path, image_sort) "
+        "VALUES (1, 'extra.jpg', 'https://cdn.example.com/extra.jpg', 9)"
+    )
+    fingerprint_after(db, "DELETE FROM product_image WHERE image_id = (SELECT MIN(image_id) FROM product_image)")
+
+
+def test_older_row_edit_changes_the_fingerprint(db):
+    fingerprint_after(
+        db,
+        "UPDATE product SET date_modify = date_modify - 1 "
+        "WHERE product_id = (SELECT product_id FROM product ORDER BY date_modify LIMIT 1)"
+    )
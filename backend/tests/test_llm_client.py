@@ -0,0 +1,187 @@
+"""
+app.llm_client against a local stub of the OpenAI chat completions API: a slow
+or failing upstream must not stall callers, and the circuit breaker opens,
+half-opens with a single probe and closes again.
+
+The stub serves POST /v1/chat/completions on 127.0.0.1 with a configurable
+delay and error status, so no OpenAI key or network is needed.
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.llm_client import CLOSED, HALF_OPEN, OPEN, ChatCompletionClient, CircuitBreaker, LLMUnavailable
+from app.metrics import metrics
+
+STUB_SQL = "SELECT * FROM product WHERE if_featured = 1 LIMIT 50"
+
+TIMEOUT = 0.5
+CONCURRENCY = 4
+QUEUE_TIMEOUT = 0.1
+FAILURES = 3
+RESET_SECONDS = 30
+
+
+class StubState:
+    delay = 0.0
+    status = 200
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(StubState.delay)
+        if StubState.status != 200:
+            body = {"error": {"message": "stub failure", "type": "server_error"}}
+        else:
+            body = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "gpt-3.5-turbo",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": STUB_SQL}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }
+        payload = json.dumps(body).encode("utf-8")
+        try:
+            self.send_response(StubState.status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up at its deadline
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+
+
+@pytest.fixture
+def clock():
+    """Manual clock for the breaker, so the reset interval passes without sleeping"""
+    return [0.0]
+
+
+@pytest.fixture
+def client(stub_url, clock):
+    StubState.delay, StubState.status = 0.02, 200
+    return ChatCompletionClient(
+        api_key="stub",
+        base_url=stub_url,
+        timeout=TIMEOUT,
+        max_concurrency=CONCURRENCY,
+        queue_timeout=QUEUE_TIMEOUT,
+        breaker=CircuitBreaker(failure_threshold=FAILURES, reset_seconds=RESET_SECONDS, clock=lambda: clock[0]),
+    )
+
+
+async def call(client: ChatCompletionClient) -> str:
+    """"ok", or the reason the call was refused or failed"""
+    try:
+        await client.complete(messages=[{"role": "user", "content": "featured products"}], model="gpt-3.5-turbo")
+        return "ok"
+    except LLMUnavailable as e:
+        return str(e)
+
+
+def fire(client: ChatCompletionClient, calls: int):
+    async def run():
+        return await asyncio.gather(*(call(client) for _ in range(calls)))
+    return asyncio.run(run())
+
+
+def llm_calls(outcome: str) -> float:
+    return metrics.llm_calls.value((outcome,))
+
+
+def open_breaker(client: ChatCompletionClient):
+    for _ in range(FAILURES):
+        client.breaker.record_failure()
+    assert client.breaker.state == OPEN
+
+
+def test_healthy(client):
+    before = llm_calls("ok")
+    assert fire(client, CONCURRENCY) == ["ok"] * CONCURRENCY
+    assert llm_calls("ok") - before == CONCURRENCY
+    assert client.breaker.state == CLOSED
+
+
+def test_saturated_calls_are_refused_after_the_queue_timeout(client):
+    # Each call holds its slot longer than the queue timeout, so only the first wave gets one
+    StubState.delay = QUEUE_TIMEOUT * 3
+    before = llm_calls("saturated")
+    outcomes = fire(client, CONCURRENCY * 3)
+    assert outcomes.count("ok") == CONCURRENCY
+    assert outcomes.count(f"{CONCURRENCY} LLM calls already in flight") == CONCURRENCY * 2
+    assert llm_calls("saturated") - before == CONCURRENCY * 2
+    assert client.breaker.state == CLOSED
+
+
+def test_slow_upstream_opens_the_breaker(client):
+    StubState.delay = TIMEOUT * 4
+    timeouts, refused = llm_calls("timeout"), llm_calls("circuit_open")
+    assert fire(client, FAILURES) == [f"no completion within {TIMEOUT} s"] * FAILURES
+    assert client.breaker.state == OPEN
+    assert llm_calls("timeout") - timeouts == FAILURES
+
+    start = time.perf_counter()
+    assert fire(client, CONCURRENCY) == ["circuit breaker open"] * CONCURRENCY
+    assert time.perf_counter() - start < TIMEOUT
+    assert llm_calls("circuit_open") - refused == CONCURRENCY
+
+
+def test_half_open_admits_a_single_probe(client, clock):
+    open_breaker(client)
+    clock[0] += RESET_SECONDS
+    assert client.breaker.state == HALF_OPEN
+
+    StubState.delay = 0.1
+    outcomes = fire(client, CONCURRENCY)
+    assert outcomes.count("ok") == 1
+    assert outcomes.count("circuit breaker open") == CONCURRENCY - 1
+    assert client.breaker.state == CLOSED
+    assert fire(client, CONCURRENCY) == ["ok"] * CONCURRENCY
+
+
+def test_failed_probe_reopens_the_breaker(client, clock):
+    open_breaker(client)
+    clock[0] += RESET_SECONDS
+    StubState.status = 500
+    errors = llm_calls("error")
+    outcome, = fire(client, 1)
+    assert "stub failure" in outcome
+    assert client.breaker.state == OPEN
+    assert llm_calls("error") - errors == 1
+
+
+def test_saturated_call_does_not_hold_the_probe(client, clock):
+    open_breaker(client)
+    clock[0] += RESET_SECONDS
+
+    async def run():
+        for _ in range(CONCURRENCY):
+            await client._semaphore.acquire()
+        refused = await call(client)
+        for _ in range(CONCURRENCY):
+            client._semaphore.release()
+        return refused, await call(client)
+
+    refused, probe = asyncio.run(run())
+    assert refused == f"{CONCURRENCY} LLM calls already in flight"
+    assert probe == "ok"
+    assert client.breaker.state == CLOSED
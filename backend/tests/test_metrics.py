@@ -0,0 +1,60 @@
+"""
+MetricsMiddleware attributes a streamed response's statements and time to its
+route, though they all happen after the endpoint has returned.
+"""
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.metrics import MetricsMiddleware, instrument_engine, metrics
+
+ROWS = 5
+ROW_DELAY = 0.02
+
+
+@pytest.fixture(scope="module")
+def client():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics-test/stream/{name}")
+    def stream(name: str):
+        def rows():
+            for _ in range(ROWS):
+                time.sleep(ROW_DELAY)
+                with engine.connect() as conn:
+                    yield f"{conn.execute(text('SELECT 1')).scalar()}\n"
+        return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+    @app.get("/metrics-test/fail")
+    def fail():
+        raise RuntimeError("boom")
+
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_streamed_statements_count_against_the_route(client):
+    route = "/metrics-test/stream/{name}"
+    queries = metrics.db_queries.value((route,))
+    requests = metrics.requests.value(("GET", route, "200"))
+
+    response = client.get("/metrics-test/stream/a")
+    assert response.text == "1\n" * ROWS
+    assert metrics.db_queries.value((route,)) - queries == ROWS
+    assert metrics.requests.value(("GET", route, "200")) - requests == 1
+    # The body took ROWS * ROW_DELAY to produce, and the recorded latency includes it
+    latency_sum = metrics.request_latency._series[("GET", route)][-1]
+    assert latency_sum >= ROWS * ROW_DELAY
+
+
+def test_failed_request_is_recorded_once(client):
+    route = "/metrics-test/fail"
+    before = metrics.requests.value(("GET", route, "500"))
+    assert client.get(route).status_code == 500
+    assert metrics.requests.value(("GET", route, "500")) - before == 1
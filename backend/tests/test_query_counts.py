@@ -0,0 +1,30 @@
+"""
+Every product-returning endpoint issues a bounded number of SQL statements: at
+most MAX_QUERIES_PER_REQUEST plus one per IN_BATCH_SIZE products returned, so
+loading images never degrades into one query per product.
+"""
+import pytest
+
+from benchmarks.common import sqlite_catalog
+from benchmarks.query_counts import (
+    allowed_queries, count_queries, product_requests, record_statements, warm
+)
+
+CATALOG_ROWS = 2000
+
+REQUESTS = list(product_requests(sku=""))
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    Session, rows = sqlite_catalog(CATALOG_ROWS, activity=True)
+    statements = record_statements(Session)
+    warm(Session)
+    return Session, rows, statements
+
+
+@pytest.mark.parametrize("name", REQUESTS)
+def test_bounded_query_count(catalog, name):
+    Session, rows, statements = catalog
+    returned, issued = count_queries(Session, statements, product_requests(rows[0]["sku_name"])[name])
+    assert issued <= allowed_queries(returned), f"{name}: {issued} queries for {returned} products"
@@ -0,0 +1,89 @@
+"""
+The rollups build once under concurrent cold requests, and incremental updates
+keep the best-seller leaders identical to a full rebuild.
+"""
+import threading
+
+import pytest
+from sqlalchemy import event
+
+from app.rollups import BestSellerRollup, RecentActivityRollup
+from app import models
+from benchmarks.common import sqlite_catalog
+
+THREADS = 16
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    Session, _ = sqlite_catalog(500, activity=True)
+    return Session
+
+
+def concurrently(fn):
+    barrier = threading.Barrier(THREADS)
+
+    def run():
+        barrier.wait()
+        fn()
+
+    threads = [threading.Thread(target=run) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_recent_activity_refreshes_once_when_cold(catalog):
+    rollup = RecentActivityRollup(models.OrderProduct)
+    statements = []
+    engine = catalog.kw["bind"]
+    record = lambda conn, cursor, statement, *args: statements.append(statement) if "order_product" in statement else None
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        def read():
+            db = catalog()
+            try:
+                rollup.product_ids(db, 7)
+            finally:
+                db.close()
+        concurrently(read)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert len(statements) == 1
+
+
+def rebuilt_leaders(db):
+    rollup = BestSellerRollup()
+    rollup.build(db)
+    return rollup.product_ids(db)
+
+
+def test_best_seller_updates_match_a_rebuild_across_manufacturer_case(catalog):
+    db = catalog()
+    try:
+        rollup = BestSellerRollup()
+        rollup.build(db)
+        listed = (
+            db.query(models.Product)
+            .filter(models.Product.inactive == 0, models.Product.show_in_store == 1, models.Product.if_sellable == 1)
+            .order_by(models.Product.product_id)
+            .limit(2)
+            .all()
+        )
+        for product, manufacturer, sales in ((listed[0], "Dell", 10_000), (listed[1], "DELL", 20_000)):
+            product.c_manufacturer, product.sales = manufacturer, sales
+            db.commit()
+            rollup.upsert(product, db)
+            assert rollup.product_ids(db) == rebuilt_leaders(db)
+        # One manufacturer whatever the spelling, so only the DELL product leads it
+        assert listed[1].product_id in rollup.product_ids(db)
+        assert listed[0].product_id not in rollup.product_ids(db)
+
+        # Demoting the leader promotes the next seller of either spelling
+        listed[1].sales = 1
+        db.commit()
+        rollup.upsert(listed[1], db)
+        assert rollup.product_ids(db) == rebuilt_leaders(db)
+    finally:
+        db.close()
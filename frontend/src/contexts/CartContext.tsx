@@ -1,5 +1,6 @@
 import React, { createContext, useContext, useReducer, useEffect, ReactNode } from 'react';
 import { CartItem, Product } from '@/lib/types';
+import { fetchProductsBatch, ProductBatchResponse } from '@/lib/api';
 
 interface CartState {
   items: CartItem[];
@@ -11,7 +12,8 @@ type CartAction =
   | { type: 'ADD_ITEM'; payload: Product }
   | { type: 'REMOVE_ITEM'; payload: number }
   | { type: 'UPDATE_QUANTITY'; payload: { productId: number; quantity: number } }
-  | { type: 'LOAD_CART'; payload: CartState };
+  | { type: 'LOAD_CART'; payload: CartState }
+  | { type: 'HYDRATE_PRODUCTS'; payload: ProductBatchResponse };
 
 const initialState: CartState = {
   items: [],
@@ -88,6 +90,22 @@ const cartReducer = (state: CartState, action: CartAction): CartState => {
       
     case 'LOAD_CART':
       return action.payload;
+
+    case 'HYDRATE_PRODUCTS': {
+      const freshProducts = new Map(action.payload.products.map(product => [product.product_id, product]));
+      const missingIds = new Set(action.payload.missing_ids);
+      const updatedItems = state.items
+        .filter(item => !missingIds.has(item.product.product_id))
+        .map(item => ({ ...item, product: freshProducts.get(item.product.product_id) ?? item.product }));
+
+      const totalItems = updatedItems.reduce((sum, item) => sum + item.quantity, 0);
+      const totalPrice = updatedItems.reduce((sum, item) => {
+        const price = typeof item.product.price === 'string' ? parseFloat(item.product.price) : item.product.price;
+        return sum + (price * item.quantity);
+      }, 0);
+
+      return { items: updatedItems, totalItems, totalPrice };
+    }
       
     default:
       return state;
@@ -133,6 +151,13 @@ export const CartProvider: React.FC<CartProviderProps> = ({ children }) => {
               }
             }
           });
+          // Refresh prices and details from the server in one round trip
+          const productIds = parsedCart.items.map((item: CartItem) => item.product.product_id);
+          fetchProductsBatch(productIds).then(result => {
+            if (result) {
+              dispatch({ type: 'HYDRATE_PRODUCTS', payload: result });
+            }
+          });
         }
       } catch (error) {
         console.error('Error loading cart from localStorage:', error);
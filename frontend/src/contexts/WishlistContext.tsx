@@ -1,5 +1,6 @@
 import React, { createContext, useContext, useReducer, useEffect } from 'react';
 import { Product } from '@/lib/types';
+import { fetchProductsBatch, ProductBatchResponse } from '@/lib/api';
 
 interface WishlistItem {
   product: Product;
@@ -12,6 +13,7 @@ interface WishlistState {
 type WishlistAction =
   | { type: 'ADD_TO_WISHLIST'; payload: Product }
   | { type: 'REMOVE_FROM_WISHLIST'; payload: number }
+  | { type: 'HYDRATE_PRODUCTS'; payload: ProductBatchResponse }
 
 const wishlistReducer = (state: WishlistState, action: WishlistAction): WishlistState => {
   switch (action.type) {
@@ -30,6 +32,17 @@ const wishlistReducer = (state: WishlistState, action: WishlistAction): Wishlist
         ...state,
         items: state.items.filter(item => item.product.product_id !== action.payload)
       };
+
+    case 'HYDRATE_PRODUCTS': {
+      const freshProducts = new Map(action.payload.products.map(product => [product.product_id, product]));
+      const missingIds = new Set(action.payload.missing_ids);
+      return {
+        ...state,
+        items: state.items
+          .filter(item => !missingIds.has(item.product.product_id))
+          .map(item => ({ product: freshProducts.get(item.product.product_id) ?? item.product }))
+      };
+    }
         
     default:
       return state;
@@ -70,6 +83,13 @@ export const WishlistProvider: React.FC<WishlistProviderProps> = ({ children })
           parsedWishlist.items.forEach((item: WishlistItem) => {
             dispatch({ type: 'ADD_TO_WISHLIST', payload: item.product });
           });
+          // Refresh product details from the server in one round trip
+          const productIds = parsedWishlist.items.map((item: WishlistItem) => item.product.product_id);
+          fetchProductsBatch(productIds).then(result => {
+            if (result) {
+              dispatch({ type: 'HYDRATE_PRODUCTS', payload: result });
+            }
+          });
         }
       } catch (error) {
         console.error('Error loading wishlist from localStorage:', error);
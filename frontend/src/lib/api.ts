@@ -68,8 +68,23 @@ export const fetchBestSellers = async (): Promise<Product[]> => {
   }
 };
 
+export interface FacetValue {
+  value: string;
+  count: number;
+}
+
+export interface FacetsResponse {
+  categories: FacetValue[];
+  types: FacetValue[];
+  manufacturers: FacetValue[];
+  price: {
+    min: string | number | null;
+    max: string | number | null;
+  };
+  total_results: number;
+}
+
 let filterDataCache: {
-  products: Product[];
   categories: string[];
   types: string[];
   manufacturers: string[];
@@ -78,29 +93,29 @@ let filterDataCache: {
 
 const FILTER_CACHE_DURATION = 5 * 60 * 1000;
 
-const getFilterData = async (): Promise<Product[]> => {
+export const fetchFacets = async (filters: ProductFilterParams = {}): Promise<FacetsResponse> => {
+  const response = await axios.get<FacetsResponse>(`${API_URL}/products/facets`, { params: filters });
+  return response.data;
+};
+
+const getFilterData = async (): Promise<void> => {
   const now = Date.now();
   
   if (filterDataCache && (now - filterDataCache.timestamp) < FILTER_CACHE_DURATION) {
-    return filterDataCache.products;
+    return;
   }
   
   try {
-    const response = await axios.get<ProductsResponse>(`${API_URL}/products/`);
-    const products = response.data.products;
+    const facets = await fetchFacets();
     
     filterDataCache = {
-      products,
-      categories: [...new Set(products.map(p => p.c_category).filter(Boolean))].sort(),
-      types: [...new Set(products.map(p => p.c_type).filter(Boolean))].sort(),
-      manufacturers: [...new Set(products.map(p => p.c_manufacturer).filter(Boolean))].sort(),
+      categories: facets.categories.map(f => f.value),
+      types: facets.types.map(f => f.value),
+      manufacturers: facets.manufacturers.map(f => f.value),
       timestamp: now
     };
-    
-    return products;
   } catch (error) {
     console.error('Error fetching filter data:', error);
-    return [];
   }
 };
 
@@ -270,6 +285,31 @@ export const fetchProductById = async (productId: number): Promise<Product | nul
   }
 };
 
+export interface ProductBatchResponse {
+  products: Product[];
+  missing_ids: number[];
+}
+
+// Longer id lists go in a POST body to stay clear of URL length limits
+const BATCH_GET_MAX_IDS = 100;
+
+export const fetchProductsBatch = async (productIds: number[]): Promise<ProductBatchResponse | null> => {
+  if (productIds.length === 0) {
+    return { products: [], missing_ids: [] };
+  }
+  try {
+    const response = productIds.length <= BATCH_GET_MAX_IDS
+      ? await axios.get<ProductBatchResponse>(`${API_URL}/products/batch`, {
+          params: { ids: productIds.join(',') }
+        })
+      : await axios.post<ProductBatchResponse>(`${API_URL}/products/batch`, { ids: productIds });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching products batch:', error);
+    return null;
+  }
+};
+
 export const preloadFrequentlyUsedData = async (): Promise<void> => {
   try {
     await Promise.all([